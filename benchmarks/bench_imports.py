@@ -0,0 +1,82 @@
+"""
+Import-time benchmark of the headless processing modules.
+
+Every module is imported in a fresh interpreter (the cost a batch worker pays per
+process). The script reports the median wall time and which heavy GUI/plotting
+packages were loaded, and exits with 1 when a module loads one of them or is slower
+than --max-ms.
+
+    python benchmarks/bench_imports.py --repeat 5 --max-ms 1500
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEADLESS_MODULES = (
+    "olaf.processing.spaced_temp_csv",
+    "olaf.processing.graph_data_csv",
+    "olaf.processing.blank_correction",
+    "olaf.processing.final_file_creation",
+    "olaf.utils.data_handler",
+)
+HEAVY_MODULES = ("matplotlib", "tkinter", "PIL")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"ms": elapsed * 1000, "heavy": heavy}}))
+"""
+
+
+def measure(module, repeat):
+    """Median import time in ms over repeat fresh interpreters, and the heavy modules"""
+    times, heavy = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output)
+        times.append(result["ms"])
+        heavy = result["heavy"]
+    return {"module": module, "median_ms": round(statistics.median(times), 1), "heavy": heavy}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="fail when a module takes longer to import than this",
+    )
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.repeat) for module in HEADLESS_MODULES]
+    print(json.dumps(results, indent=1))
+
+    failed = [
+        r
+        for r in results
+        if r["heavy"] or (args.max_ms is not None and r["median_ms"] > args.max_ms)
+    ]
+    for result in failed:
+        print(
+            f"Regression: {result['module']} ({result['median_ms']} ms, "
+            f"loads {result['heavy'] or 'nothing heavy'})",
+            file=sys.stderr,
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Benchmark of every pipeline stage on synthetic projects of several sizes.
+
+    python -m benchmarks.bench_pipeline run --sizes small medium
+    python -m benchmarks.bench_pipeline set-baseline
+    python -m benchmarks.bench_pipeline compare --threshold 0.2
+
+run generates a project per size (see olaf.utils.synthetic_data, not timed), times
+the stages in pipeline order and appends the result to a JSON history. compare checks
+the latest run against the stored baseline and exits with 1 when a stage got slower
+by more than the threshold.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARK_FOLDER = Path(__file__).parent
+HISTORY_FILE = BENCHMARK_FOLDER / "history.json"
+BASELINE_FILE = BENCHMARK_FOLDER / "baseline.json"
+
+# name: (days, cooling rate in degC/min); a lower rate means longer .dat files
+SIZES = {
+    "small": (2, 0.35),
+    "medium": (10, 0.35),
+    "large": (40, 0.35),
+    "long_runs": (5, 0.035),  # 10x longer runs
+}
+STAGES = (
+    "load_dat",
+    "create_temp_csv",
+    "convert_INPs_L",
+    "average_blanks",
+    "apply_blanks",
+    "create_all_final_files",
+    "find_desired_files",
+    "plot_data",
+)
+# Differences below this (in seconds) are never reported as regressions
+MIN_DIFFERENCE = 0.05
+
+
+def bench_size(days, cooling_rate, seed=0):
+    """Generate a project and time every stage on it. Returns {stage: seconds}"""
+    from olaf.pipeline import experiment_header, load_config
+    from olaf.processing.blank_correction import BlankCorrector
+    from olaf.processing.final_file_creation import FinalFileCreation
+    from olaf.processing.graph_data_csv import GraphDataCSV
+    from olaf.processing.plots import Plots
+    from olaf.processing.spaced_temp_csv import SpacedTempCSV
+    from olaf.utils.data_handler import DataHandler
+    from olaf.utils.synthetic_data import generate_project
+
+    timings = {}
+
+    @contextlib.contextmanager
+    def timed(stage):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+        timings[stage] = round(time.perf_counter() - start, 4)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_folder = Path(tmp)
+        config = load_config(
+            generate_project(project_folder, n_days=days, seed=seed, cooling_rate=cooling_rate)
+        )
+        experiments = config["experiments"]
+
+        with timed("load_dat"):
+            for experiment in experiments:
+                DataHandler(
+                    experiment["folder"],
+                    experiment["num_samples"],
+                    includes=("reviewed",),
+                    excludes=("frozen",),
+                    date_col="Date",
+                )
+        with timed("create_temp_csv"):
+            for experiment in experiments:
+                SpacedTempCSV(
+                    experiment["folder"],
+                    experiment["num_samples"],
+                    includes=(experiment["treatment"],),
+                ).create_temp_csv(
+                    experiment["dilutions"],
+                    {},
+                    experiment["wells_per_sample"],
+                    experiment["sample_type"],
+                )
+        with timed("convert_INPs_L"):
+            for experiment in experiments:
+                header, vol_air_filt = experiment_header(experiment)
+                GraphDataCSV(
+                    experiment["folder"],
+                    experiment["num_samples"],
+                    experiment["sample_type"],
+                    vol_air_filt,
+                    experiment["wells_per_sample"],
+                    experiment["proportion_filter_used"],
+                    experiment["vol_susp"],
+                    experiment["dilutions"],
+                    includes=(experiment["treatment"],),
+                ).convert_INPs_L(header)
+
+        blanks = config["blanks"]
+        with timed("average_blanks"):
+            corrector = BlankCorrector(
+                project_folder, tuple(blanks["includes"]), (), (), multiple_per_day=True
+            )
+            corrector.average_blanks()
+        with timed("apply_blanks"):
+            corrector.apply_blanks(only_within_dates=False)
+
+        final = config["final"]
+        with timed("create_all_final_files"):
+            FinalFileCreation(
+                project_folder, tuple(final["includes"]), tuple(final["excludes"])
+            ).create_all_final_files(final["treatment_dict"], final["header_start"])
+
+        plots = config["plots"]
+        with timed("find_desired_files"):
+            plot = Plots(
+                project_folder,
+                tuple(plots["includes"]),
+                tuple(plots["excludes"]),
+                plots["start_date"],
+                plots["end_date"],
+                3,
+                {},
+                "benchmark",
+            )
+            if plot.desired_files_df.empty:  # loaded here, on first use
+                raise RuntimeError("No INPs/L files found to plot")
+        with timed("plot_data"):
+            plot.plot_data(subplots=True, use_cache=False)
+    return timings
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=False,
+            cwd=BENCHMARK_FOLDER,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def load_json(file, default):
+    return json.loads(file.read_text()) if file.exists() else default
+
+
+def run(sizes, repeat, history_file):
+    """Time all stages for every size (best of repeat) and append to the history"""
+    results = {}
+    for size in sizes:
+        days, cooling_rate = SIZES[size]
+        runs = [bench_size(days, cooling_rate) for _ in range(repeat)]
+        results[size] = {stage: min(timings[stage] for timings in runs) for stage in STAGES}
+        print(
+            f"{size}: "
+            + ", ".join(f"{stage} {seconds:.3f} s" for stage, seconds in results[size].items())
+        )
+
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+    history = load_json(history_file, [])
+    history.append(entry)
+    history_file.write_text(json.dumps(history, indent=1))
+    print(f"Added run {len(history)} to {history_file}")
+    return entry
+
+
+def compare(entry, baseline, threshold):
+    """
+    Stages that are slower than the baseline by more than threshold (relative) and
+    MIN_DIFFERENCE seconds.
+    Returns:
+        list of (size, stage, baseline seconds, seconds) tuples
+    """
+    regressions = []
+    for size, timings in entry["results"].items():
+        for stage, seconds in timings.items():
+            base = baseline["results"].get(size, {}).get(stage)
+            if base is None:
+                continue
+            change = (seconds - base) / base if base else 0
+            flag = change > threshold and seconds - base > MIN_DIFFERENCE
+            print(
+                f"{size:<10} {stage:<24} {base:8.3f} -> {seconds:8.3f} s "
+                f"({change:+.0%}){'  REGRESSION' if flag else ''}"
+            )
+            if flag:
+                regressions.append((size, stage, base, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--history", type=Path, default=HISTORY_FILE)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small"])
+    run_parser.add_argument("--repeat", type=int, default=1)
+    commands.add_parser("set-baseline", help="store the latest run as the baseline")
+    compare_parser = commands.add_parser("compare", help="compare the latest run to the baseline")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.2, help="relative slowdown that counts as a regression"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args.sizes, args.repeat, args.history)
+        return 0
+
+    history = load_json(args.history, [])
+    if not history:
+        print(f"No runs in {args.history}; use the run command first")
+        return 1
+    if args.command == "set-baseline":
+        args.baseline.write_text(json.dumps(history[-1], indent=1))
+        print(f"Baseline set to the run of {history[-1]['timestamp']} ({history[-1]['commit']})")
+        return 0
+
+    baseline = load_json(args.baseline, None)
+    if baseline is None:
+        print(f"No baseline in {args.baseline}; use the set-baseline command first")
+        return 1
+    regressions = compare(history[-1], baseline, args.threshold)
+    print(f"{len(regressions)} regressions against the baseline of {baseline['timestamp']}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
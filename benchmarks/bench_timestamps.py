@@ -0,0 +1,94 @@
+"""
+Benchmark of parsing the Date and Time columns of a .dat file.
+
+Compares the previous path (read_csv's parse_dates on the date column, which infers
+the format per file, and pd.to_datetime on the joined date and time strings) with
+olaf.utils.time_utils on a simulated run, checks that both give the same timestamps,
+and exits with 1 when they differ. The file is read once; only the parsing is timed.
+
+    python -m benchmarks.bench_timestamps --cooling-rate 0.035 --repeat 3
+"""
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from olaf.utils.synthetic_data import simulate_experiment, write_dat
+from olaf.utils.time_utils import parse_dat_dates, parse_dat_timestamps
+
+
+def pandas_path(data, date_col):
+    """Inferred dates (what read_csv's parse_dates does), timestamps from joined strings"""
+    dates = pd.to_datetime(data[date_col])
+    time_col = "Unnamed: 1" if date_col == "Time" else "Time"
+    joined = dates.dt.strftime("%Y-%m-%d") + " " + data[time_col].str.replace(":.", ".")
+    return dates, pd.to_datetime(joined)
+
+
+def vectorized_path(data, date_col):
+    dates = parse_dat_dates(data[date_col])
+    time_col = "Unnamed: 1" if date_col == "Time" else "Time"
+    return dates, parse_dat_timestamps(dates, data[time_col])
+
+
+def measure(function, data, date_col, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(data, date_col)
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times), 4), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--cooling-rate",
+        type=float,
+        default=0.035,
+        help="degC per minute of the simulated run (lower: more rows)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df = simulate_experiment(
+        pd.Timestamp("2024-06-10 09:00:00"),
+        cooling_rate=args.cooling_rate,
+        rng=np.random.default_rng(0),
+    )
+    results, same = [], True
+    for reviewed, date_col in ((False, "Time"), (True, "Date")):
+        buffer = io.StringIO()
+        write_dat(df, buffer, 3, reviewed=reviewed)
+        data = pd.read_csv(
+            io.StringIO(buffer.getvalue()), sep="\t", index_col=False, low_memory=False
+        )
+        old_seconds, (old_dates, old_stamps) = measure(pandas_path, data, date_col, args.repeat)
+        new_seconds, (new_dates, new_stamps) = measure(vectorized_path, data, date_col, args.repeat)
+        # compare the values: pandas infers microseconds, time_utils returns ns
+        equal = np.array_equal(old_dates.to_numpy(), new_dates.to_numpy()) and np.array_equal(
+            old_stamps.to_numpy(), new_stamps.to_numpy()
+        )
+        same &= equal
+        results.append(
+            {
+                "layout": "reviewed" if reviewed else "instrument",
+                "rows": len(df),
+                "pandas_s": old_seconds,
+                "vectorized_s": new_seconds,
+                "speedup": round(old_seconds / new_seconds, 1),
+                "equal": equal,
+            }
+        )
+    print(json.dumps(results, indent=1))
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 VOL_WELL = 50  # microL
+NUM_WELLS_PLATE = 192  # wells of the sample plate, num_samples x wells_per_sample
 
 # Temperature step used for creating frozen_at_temp_reviewed file
 TEMP_STEP = 0.5
+# Rows per block when the .dat file is streamed to create the frozen_at_temp file
+DAT_CHUNK_ROWS = 100_000
 
 # Number of temperature samples that the highest dilution needs to have more frozen wells
 # to replace the background
@@ -18,3 +21,6 @@ DATE_PATTERN = r"(?<!\d)(\d{1,2}\.\d{1,2}\.\d{2})(?!\d)"
 # How many wells less than total number of wells should be excluded from calculations.
 # See Agresti-Coull 1998.
 AGRESTI_COULL_UNCERTAIN_VALUES = 2
+
+# Number of realizations used for Monte Carlo confidence intervals in blank correction
+MONTE_CARLO_DRAWS = 10000
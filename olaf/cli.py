@@ -0,0 +1,497 @@
+"""
+Command line entry point: olaf <command> <experiments.toml>
+
+Commands: review, temp, inps, blanks, final, plots, and all (temp through plots).
+All selected experiments are processed in one process, sharing one metadata catalog,
+and a JSON run summary is written when done. Stages that finished before with the
+same parameters and input files are skipped (see run_unit, --force runs them again).
+live follows the .dat file of one running experiment and keeps a provisional INPs/L
+file up to date (see olaf.processing.live_spectrum). watch processes experiments as
+their files appear, status shows its job queue and requeue queues its failed jobs again
+(see olaf.watcher). check reports problems in the config and the .dat files before
+processing (see olaf.preflight).
+See olaf/experiments_example.toml.
+With --trace, timing spans and counters are written to a JSON-lines file
+(see olaf.utils.tracing).
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+from olaf.pipeline import (
+    ALL_STAGES,
+    EXPERIMENT_STAGES,
+    PROJECT_STAGES,
+    STAGE_FUNCTIONS,
+    experiment_header,
+    load_config,
+    open_catalog,
+)
+from olaf.utils import tracing
+from olaf.utils.checkpoint import CheckpointLog
+from olaf.utils.log_utils import configure_logging
+from olaf.utils.stage_inputs import files_hash, stage_inputs
+
+logger = logging.getLogger(__name__)
+
+# Log of the finished units (stage x experiment) in the project folder, see run_unit
+CHECKPOINT_FILE = ".olaf_checkpoints.sqlite"
+
+
+def run_stage(stage, target, config, catalog, name) -> dict:
+    """
+    Run one stage for one experiment (or the project) and summarize how it went, with
+    the files the stage returns as written. Errors are caught and reported, so the other
+    experiments are still processed.
+    """
+    start = time.perf_counter()
+    result = {"stage": stage, "experiment": name, "status": "ok"}
+    outputs = None
+    try:
+        with tracing.span(f"stage.{stage}", experiment=name):
+            outputs = STAGE_FUNCTIONS[stage](target, catalog=catalog)
+    except Exception as e:  # noqa: BLE001, report and continue with the next experiment
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["outputs"] = sorted({str(path) for path in outputs or ()})
+    if result["status"] == "ok":
+        logger.info(
+            "%-7s %s: ok (%s s, %d files written)",
+            stage,
+            name,
+            result["seconds"],
+            len(result["outputs"]),
+        )
+    else:
+        logger.error("%-7s %s: failed (%s s): %s", stage, name, result["seconds"], result["error"])
+    return result
+
+
+def unit_hash(stage, target, config) -> str:
+    """
+    Hash of what the result of a stage depends on: the parameters of the experiment (the
+    whole config for the project stages) and the files the stage reads, which the
+    stage before it writes (see olaf.utils.stage_inputs). A stage that runs again so
+    writes new inputs for the next one, which then runs again too.
+    Paths are hashed relative to the project folder, so moving the project folder (or
+    mounting it under another drive letter) keeps the checkpoints.
+    """
+    project_folder = config["project_folder"]
+
+    def relative(obj):
+        if isinstance(obj, Path) and obj.is_relative_to(project_folder):
+            return obj.relative_to(project_folder).as_posix()
+        return str(obj)
+
+    params = target if stage in EXPERIMENT_STAGES else config
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=relative).encode())
+    digest.update(files_hash(stage_inputs(stage, params), project_folder).encode())
+    return digest.hexdigest()
+
+
+def run_unit(stage, target, config, catalog, name, checkpoints=None, force=False) -> dict:
+    """
+    run_stage, unless the checkpoint log has the unit as done with the same parameters
+    and inputs, and its output files still exist (and force is False). The outcome and
+    the written files are logged before the run continues.
+    The interactive review is never skipped.
+    """
+    if checkpoints is None or stage == "review":
+        return run_stage(stage, target, config, catalog, name)
+    param_hash = unit_hash(stage, target, config)
+    if not force and checkpoints.is_done(name, stage, param_hash):
+        logger.info("%-7s %s: skipped (done before with these parameters and inputs)", stage, name)
+        return {
+            "stage": stage,
+            "experiment": name,
+            "status": "skipped",
+            "seconds": 0,
+            "outputs": [],
+        }
+    checkpoints.start(name, stage, param_hash)
+    result = run_stage(stage, target, config, catalog, name)
+    checkpoints.finish(
+        name, stage, param_hash, result["seconds"], result.get("error"), result["outputs"]
+    )
+    return result
+
+
+def run(
+    command,
+    config_file: Path,
+    experiment_names=None,
+    project_folder: Path | None = None,
+    force: bool = False,
+) -> dict:
+    """
+    Run a command on the experiments in a config file.
+    Args:
+        command: one of the stages, or "all"
+        config_file: Path of the TOML experiment table
+        experiment_names: only run these experiments (folder names or names); default all
+        project_folder: run on this copy of the project folder (default: the one in the
+        config file)
+        force: also run the units that are done according to the checkpoint log in the
+        project folder (see CheckpointLog)
+
+    Returns:
+        run summary dictionary
+    """
+    config = load_config(config_file, project_folder)
+    experiments = config["experiments"]
+    if experiment_names:
+        experiments = [
+            experiment
+            for experiment in experiments
+            if experiment["name"] in experiment_names
+            or experiment["folder"].name in experiment_names
+        ]
+
+    stages = ALL_STAGES if command == "all" else (command,)
+    started = datetime.now()
+    results = []
+    catalog = open_catalog(config)
+    checkpoints = (
+        CheckpointLog(config["project_folder"] / CHECKPOINT_FILE)
+        if config["project_folder"].is_dir()
+        else None
+    )
+    try:
+        for stage in stages:
+            if stage in EXPERIMENT_STAGES:
+                for experiment in experiments:
+                    results.append(
+                        run_unit(
+                            stage,
+                            experiment,
+                            config,
+                            catalog,
+                            experiment["name"],
+                            checkpoints,
+                            force,
+                        )
+                    )
+            else:
+                results.append(
+                    run_unit(
+                        stage,
+                        config,
+                        config,
+                        catalog,
+                        "project",
+                        checkpoints,
+                        force,
+                    )
+                )
+    finally:
+        if catalog is not None:
+            catalog.close()
+        if checkpoints is not None:
+            checkpoints.close()
+
+    return {
+        "command": command,
+        "config": str(config_file),
+        "project_folder": str(config["project_folder"]),
+        "started": started.isoformat(timespec="seconds"),
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "n_failed": sum(result["status"] == "failed" for result in results),
+        "n_skipped": sum(result["status"] == "skipped" for result in results),
+        "results": results,
+    }
+
+
+def run_live(
+    config_file: Path, experiment_name: str, interval: float = 5, idle_timeout: float | None = None
+) -> int:
+    """
+    Follow the newest (not reviewed) .dat file of a running experiment and rewrite its
+    provisional INPs/L file every interval seconds, until interrupted or idle.
+    """
+    from olaf.processing.live_spectrum import LiveSpectrum
+
+    config = load_config(config_file)
+    experiments = [
+        experiment
+        for experiment in config["experiments"]
+        if experiment_name in (experiment["name"], experiment["folder"].name)
+    ]
+    if not experiments:
+        logger.error("Experiment %s not found in %s", experiment_name, config_file)
+        return 1
+    experiment = experiments[0]
+    dat_files = [file for file in experiment["folder"].glob("*.dat") if "reviewed" not in file.name]
+    if not dat_files:
+        logger.error("No .dat file found in %s", experiment["folder"])
+        return 1
+    dat_file = max(dat_files, key=lambda file: file.stat().st_mtime)
+
+    header, vol_air_filt = experiment_header(experiment)
+    live = LiveSpectrum(
+        dat_file,
+        experiment["num_samples"],
+        experiment["dilutions"],
+        experiment["wells_per_sample"],
+        experiment["sample_type"],
+        header,
+        vol_air_filt,
+        experiment["proportion_filter_used"],
+        experiment["vol_susp"],
+        experiment["freezing_point_depression"],
+    )
+    logger.info("Following %s, writing %s", dat_file, live.output_file)
+    try:
+        live.run(interval, idle_timeout=idle_timeout)
+    except KeyboardInterrupt:
+        logger.info("Stopped following %s", dat_file.name)
+    return 0
+
+
+def run_watch(
+    config_file: Path,
+    workers: int = 1,
+    poll_interval: float = 30,
+    settle: float = 10,
+    once: bool = False,
+    skip_existing: bool = False,
+) -> int:
+    """Process new and changed experiments of a project as they appear (see olaf.watcher)"""
+    from olaf.watcher import Watcher
+
+    watcher = Watcher(config_file, workers, poll_interval, settle)
+    try:
+        if skip_existing:
+            logger.info("Marked the inputs of %d targets as processed", watcher.poll(skip=True))
+        counts = watcher.run(once=once)
+    finally:
+        watcher.close()
+    return 1 if counts["failed"] else 0
+
+
+def show_status(config_file: Path) -> int:
+    """Print the job queue of the watcher of a project"""
+    from olaf.utils.job_queue import JobQueue
+    from olaf.watcher import format_status
+
+    queue_file = load_config(config_file)["project_folder"] / ".olaf_jobs.sqlite"
+    if not queue_file.exists():
+        print(f"No watcher has run on this project ({queue_file} does not exist)")
+        return 0
+    queue = JobQueue(queue_file)
+    try:
+        print(format_status(queue))
+    finally:
+        queue.close()
+    return 0
+
+
+def requeue_failed(config_file: Path) -> int:
+    """Queue the failed jobs of the watcher of a project again, with new attempts"""
+    from olaf.utils.job_queue import JobQueue
+
+    queue_file = load_config(config_file)["project_folder"] / ".olaf_jobs.sqlite"
+    if not queue_file.exists():
+        print(f"No watcher has run on this project ({queue_file} does not exist)")
+        return 0
+    queue = JobQueue(queue_file)
+    try:
+        print(f"Requeued {queue.requeue_failed()} failed jobs")
+    finally:
+        queue.close()
+    return 0
+
+
+def run_check(config_file: Path, summary: str | None = None) -> int:
+    """Print the pre-flight check of a campaign (see olaf.preflight); 1 if it has errors"""
+    from olaf.preflight import check_campaign, format_report
+
+    config = load_config(config_file, strict=False)
+    issues = check_campaign(config)
+    if summary == "-":
+        print(json.dumps(issues, indent=2))
+    else:
+        print(format_report(issues, len(config["experiments"])))
+        if summary:
+            Path(summary).write_text(json.dumps(issues, indent=2))
+    return 1 if any(issue["severity"] == "error" for issue in issues) else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="olaf", description="Process freezing experiments listed in a TOML file."
+    )
+    parser.add_argument(
+        "command",
+        choices=[
+            *EXPERIMENT_STAGES,
+            *PROJECT_STAGES,
+            "all",
+            "live",
+            "watch",
+            "status",
+            "requeue",
+            "check",
+        ],
+    )
+    parser.add_argument("config", type=Path, help="TOML experiment table")
+    parser.add_argument(
+        "-e",
+        "--experiment",
+        action="append",
+        default=None,
+        help="only run this experiment (can be repeated)",
+    )
+    parser.add_argument(
+        "--summary",
+        default=None,
+        help="where to write the JSON run summary, - for stdout "
+        "(default: olaf_run_<command>_<time>.json in the project folder)",
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "-q", "--quiet", action="store_true", help="only log warnings and errors"
+    )
+    verbosity.add_argument(
+        "-v", "--verbose", action="store_true", help="also log per-temperature details"
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        default=None,
+        help="append timing spans and counters to this JSON-lines file "
+        f"(default: ${tracing.TRACE_ENV_VAR} if set)",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=5, help="live: seconds between updates (default: 5)"
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=None,
+        help="live: stop when the .dat file did not grow for this many "
+        "seconds (default: run until interrupted)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="also run stages that finished before with the same parameters and input files",
+    )
+    parser.add_argument(
+        "--mirror",
+        type=Path,
+        default=None,
+        help="run on a local copy of the project in this folder, and copy "
+        "the outputs back (for projects on slow shared drives; not for review, live, "
+        "watch, status, requeue and check)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="watch: number of worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=30,
+        help="watch: seconds between looking for new files (default: 30)",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=10,
+        help="watch: only pick up files unchanged for this many seconds (default: 10)",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="watch: stop when everything is processed"
+    )
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        help="watch: treat the files that are already there as processed",
+    )
+    args = parser.parse_args(argv)
+    if args.command == "live" and (not args.experiment or len(args.experiment) != 1):
+        parser.error("live needs exactly one -e/--experiment")
+    # the mirror only holds the files the batch stages read, not the raw .dat files and
+    # images the review needs, and the other commands don't run on it
+    if args.mirror and args.command not in (*ALL_STAGES, "all"):
+        parser.error(f"--mirror can't be used with {args.command}")
+
+    configure_logging(
+        logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO
+    )
+    if args.command == "status":
+        return show_status(args.config)
+    if args.command == "requeue":
+        return requeue_failed(args.config)
+    if args.command == "check":
+        return run_check(args.config, args.summary)
+    if args.trace:
+        tracing.enable(args.trace)
+    else:
+        tracing.enable_from_env()
+    if args.command in ("live", "watch"):
+        try:
+            if args.command == "watch":
+                return run_watch(
+                    args.config,
+                    args.workers,
+                    args.poll_interval,
+                    args.settle,
+                    args.once,
+                    args.skip_existing,
+                )
+            return run_live(args.config, args.experiment[0], args.interval, args.idle_timeout)
+        finally:
+            tracing.disable()
+    mirror = None
+    try:
+        if args.mirror:
+            from olaf.utils.mirror import ProjectMirror
+
+            mirror = ProjectMirror(load_config(args.config)["project_folder"], args.mirror)
+            logger.info("Mirrored %d new or changed files to %s", mirror.pull(), args.mirror)
+        summary = run(
+            args.command,
+            args.config,
+            args.experiment,
+            mirror.cache_folder if mirror else None,
+            args.force,
+        )
+        if mirror:
+            logger.info(
+                "Copied %d output files back to %s", len(mirror.push()), mirror.remote_folder
+            )
+            summary["project_folder"] = str(mirror.remote_folder)
+    finally:
+        tracing.disable()
+    summary_json = json.dumps(summary, indent=2)
+    if args.summary == "-":
+        print(summary_json)
+    else:
+        summary_file = (
+            Path(args.summary)
+            if args.summary
+            else (
+                Path(summary["project_folder"])
+                / f"olaf_run_{args.command}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            )
+        )
+        summary_file.write_text(summary_json)
+        if not args.quiet:
+            print(
+                f"{len(summary['results'])} steps, {summary['n_failed']} failed, "
+                f"{summary['n_skipped']} skipped (done before). Summary: {summary_file}"
+            )
+    return 1 if summary["n_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
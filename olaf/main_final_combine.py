@@ -2,6 +2,9 @@ from pathlib import Path
 
 from olaf.CONSTANTS import ERROR_SIGNAL
 from olaf.processing.final_file_creation import FinalFileCreation
+from olaf.utils.log_utils import configure_logging
+
+configure_logging()
 
 project_folder = Path.cwd().parent / "tests" / "test_data" / "NSA_qc_flag_test"
 includes = ("INPs_L", "frozen_at_temp", "reviewed", "blank_corrected", "10%")
@@ -1,6 +1,10 @@
 from pathlib import Path
 
 from olaf.processing.blank_correction import BlankCorrector
+from olaf.utils.log_utils import configure_logging
+
+# pass logging.DEBUG to see every corrected value, logging.WARNING for only problems
+configure_logging()
 
 # make decision on how many blanks to use
 # iterate through project folder to find all the blank INPS/L
@@ -13,10 +17,7 @@ blank_excludes = ()
 sample_excludes = ("05.22.25",)
 # Make sure to have an individual "INPS_L_frozen_at_temp..." for each date
 corrector = BlankCorrector(
-    project_folder,
-    blank_includes,
-    blank_excludes,
-    sample_excludes,
-    multiple_per_day=True)
+    project_folder, blank_includes, blank_excludes, sample_excludes, multiple_per_day=True
+)
 avg_blanks = corrector.average_blanks()
 corrector.apply_blanks(only_within_dates=False, show_comp_plot=True)
@@ -1,17 +1,27 @@
+from contextlib import nullcontext
 from pathlib import Path
 
 from olaf.processing.plots import Plots
+from olaf.utils.log_utils import configure_logging
+from olaf.utils.mirror import ProjectMirror
 
-#project_folder =  Path.cwd().parent / "data" / "PUFIN tests"
-#project_folder = Path("D:/INP Mentor/Long term sites/NSA/data/12.01.25 test")
-project_folder = Path("G:/Shared drives/INP Mentor/Current Data Processing/CAPE_k/QAQC as of 03.04.26_CH/2024")
-#project_folder = Path("D:/INP Mentor/Long term sites/BNF/TBS/Data/May-June 2025")
+configure_logging()
+
+# project_folder =  Path.cwd().parent / "data" / "PUFIN tests"
+# project_folder = Path("D:/INP Mentor/Long term sites/NSA/data/12.01.25 test")
+project_folder = Path(
+    "G:/Shared drives/INP Mentor/Current Data Processing/CAPE_k/QAQC as of 03.04.26_CH/2024"
+)
+# project_folder = Path("D:/INP Mentor/Long term sites/BNF/TBS/Data/May-June 2025")
 ## NOTE ^ this method works but plots everything in a strange order
+# For a project on a slow shared drive, set a local folder (e.g. Path.home() / "olaf_cache")
+# to read the INPs/L files from a local copy; the plots are copied back to project_folder
+local_cache = None
 
 includes = ("INPs_L", "frozen_at_temp", "reviewed")
 excludes = ()
-start_date = "07.24.24" #earliest date you want as part of the analysis
-end_date = "07.24.24" # latest date
+start_date = "07.24.24"  # earliest date you want as part of the analysis
+end_date = "07.24.24"  # latest date
 
 # if making subplots, designate number of desired columns here
 num_columns = 3
@@ -20,7 +30,7 @@ num_columns = 3
 save_name = "BNF spring 2025 TBS overview"
 
 # if you are doing a site comparison, type them here and decide on marker style
-#site_markers = {"CRG_M1": "o", "CRG_S2": "^", "CRG_S7_TBS": "o", "KCG_S3": "o"}
+# site_markers = {"CRG_M1": "o", "CRG_S2": "^", "CRG_S7_TBS": "o", "KCG_S3": "o"}
 # or default markers if you leave the dict empty
 site_markers = {}
 
@@ -33,13 +43,21 @@ site_markers = {}
 # both sites on a single plot and timestamps are removed from plot title when true.
 # TBS = True sets the "site" parameter to altitude range and plots each altitude
 # range per day on the same plot
-plot = Plots(
-    project_folder,
-    includes,
-    excludes,
-    start_date,
-    end_date,
-    num_columns,
-    site_markers,
-    save_name=save_name)
-plot.plot_data(subplots=True, site_comparison=False, tbs = False)
+# The guard is needed because figures are rendered in separate processes
+if __name__ == "__main__":
+    mirror = ProjectMirror(project_folder, local_cache) if local_cache else None
+    with mirror if mirror else nullcontext(project_folder) as folder:
+        plot = Plots(
+            folder,
+            includes,
+            excludes,
+            start_date,
+            end_date,
+            num_columns,
+            site_markers,
+            save_name=save_name,
+        )
+        plot.plot_data(subplots=True, site_comparison=False, tbs=False)
+        # Campaign overview: INPs/L at fixed temperatures over time and the median/IQR
+        # envelope of all spectra per treatment
+        # plot.plot_campaign(temperatures=(-15, -20, -25))
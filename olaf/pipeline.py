@@ -0,0 +1,321 @@
+import re
+import tomllib
+from datetime import datetime
+from pathlib import Path
+
+from olaf.CONSTANTS import DAT_CHUNK_ROWS, DATE_PATTERN, ERROR_SIGNAL
+from olaf.utils.catalog import MetadataCatalog
+
+# Stages that run per experiment folder and stages that run once on the project folder
+EXPERIMENT_STAGES = ("review", "temp", "inps")
+PROJECT_STAGES = ("blanks", "final", "plots")
+# "all" leaves out the (interactive) review
+ALL_STAGES = ("temp", "inps", "blanks", "final", "plots")
+
+# Keys every [[experiment]] has to set
+REQUIRED_KEYS = ("folder", "site", "start_time", "end_time", "treatment")
+EXPERIMENT_DEFAULTS = {
+    "filter_color": "white",
+    "notes": "none",
+    "user": "none",
+    "IS": "none",
+    "num_samples": 6,
+    "sample_type": "air",
+    "vol_air_filt": 1,
+    "wells_per_sample": 32,
+    "proportion_filter_used": 1.0,
+    "vol_susp": 10,
+    "dilutions": {
+        "Sample_0": 1,
+        "Sample_1": 11,
+        "Sample_2": 121,
+        "Sample_3": 1331,
+        "Sample_4": 14641,
+        "Sample_5": "inf",
+    },
+    "freezing_point_depression": {},
+    "lower_altitude": 0,
+    "upper_altitude": 0,
+    "dry_mass": 1,
+    "show_plot": False,
+}
+BLANKS_DEFAULTS = {
+    "includes": ["INPs_L_frozen_at_temp_reviewed", "blank"],
+    "excludes": [],
+    "sample_excludes": [],
+    "multiple_per_day": True,
+    "only_within_dates": False,
+    "show_comp_plot": False,
+    "monte_carlo_draws": None,
+}
+FINAL_DEFAULTS = {
+    "includes": ["INPs_L", "frozen_at_temp", "reviewed", "blank_corrected"],
+    "excludes": ["blanks"],
+    "treatment_dict": {"base": 0, "heat": 1, "peroxide": 2},
+    "header_start": (
+        "Treatment flags: 0 = untreated; 1 = heat treated; and 2 = peroxide treated\n"
+        f"Missing values or values below detection limit are denoted as {ERROR_SIGNAL}\n"
+    ),
+    "result_store": None,
+}
+PLOTS_DEFAULTS = {
+    "includes": ["INPs_L", "frozen_at_temp", "reviewed"],
+    # blank folders, and blank corrected files (which have an extra qc_flag column)
+    "excludes": ["blank"],
+    "start_date": None,  # no start or end date: all dates
+    "end_date": None,
+    "num_columns": 3,
+    "save_name": "overview",
+    "site_markers": {},
+    "subplots": True,
+    "site_comparison": False,
+    "tbs": False,
+    "campaign": False,
+    "temperatures": [-15, -20, -25],
+}
+
+
+def load_config(config_file: Path, project_folder: Path | None = None, strict: bool = True) -> dict:
+    """
+    Read a TOML experiment table. Relative paths are relative to the config file, and
+    experiment folders are relative to the project folder. Every [[experiment]] gets the
+    values of [defaults] (and then EXPERIMENT_DEFAULTS) for the keys it doesn't set.
+    Example: olaf/experiments_example.toml
+    Args:
+        config_file: Path of the .toml file
+        project_folder: use this project folder instead of the one in the file, e.g. a
+        local mirror of it (see olaf.utils.mirror)
+        strict: raise a ValueError when an experiment misses a required key; else set
+        it to "" and list it in the experiment's "missing_keys" (see olaf.preflight)
+
+    Returns:
+        dictionary with project_folder, catalog, experiments (list of dictionaries),
+        blanks, final and plots
+    """
+    with open(config_file, "rb") as f:
+        raw = tomllib.load(f)
+
+    project = raw.get("project", {})
+    if "folder" not in project:
+        raise ValueError(f"{config_file} has no [project] folder")
+    if project_folder is None:
+        project_folder = (config_file.parent / project["folder"]).resolve()
+
+    defaults = EXPERIMENT_DEFAULTS | raw.get("defaults", {})
+    experiments = []
+    for idx, experiment in enumerate(raw.get("experiment", [])):
+        experiment = defaults | experiment
+        missing = [key for key in REQUIRED_KEYS if key not in experiment]
+        if missing and strict:
+            raise ValueError(f"Experiment {idx} in {config_file} is missing {missing}")
+        if missing:
+            experiment = dict.fromkeys(missing, "") | experiment | {"missing_keys": missing}
+        experiment["folder"] = project_folder / experiment["folder"]
+        experiment.setdefault("name", experiment["folder"].name)
+        # TOML has no infinity, so the empty (background) sample is written as "inf"
+        try:
+            experiment["dilutions"] = {
+                sample: float(dilution) for sample, dilution in experiment["dilutions"].items()
+            }
+        except (AttributeError, TypeError, ValueError) as e:
+            if strict:
+                raise ValueError(f"Experiment {idx} in {config_file} has invalid dilutions: {e}")
+            # left as they are, for the pre-flight check to report
+        experiments.append(experiment)
+
+    final = FINAL_DEFAULTS | raw.get("final", {})
+    if final["result_store"] is not None:
+        final["result_store"] = project_folder / final["result_store"]
+    return {
+        "project_folder": project_folder,
+        "catalog": project.get("catalog", False),
+        "experiments": experiments,
+        "blanks": BLANKS_DEFAULTS | raw.get("blanks", {}),
+        "final": final,
+        "plots": PLOTS_DEFAULTS | raw.get("plots", {}),
+    }
+
+
+def open_catalog(config: dict) -> MetadataCatalog | None:
+    """MetadataCatalog in the project folder if the config asks for one"""
+    if not config["catalog"]:
+        return None
+    return MetadataCatalog(config["project_folder"] / ".olaf_catalog.sqlite")
+
+
+def experiment_header(experiment: dict) -> tuple[str, float]:
+    """
+    The header of the INPs/L file of an experiment, like it is assembled in main.py.
+    Returns:
+        (header string, volume of air filtered to use in the calculation)
+    """
+    vol_air_filt = experiment["vol_air_filt"]
+    if "blank" in experiment["treatment"] or experiment["sample_type"] != "air":
+        vol_air_filt = 1  # Always the case for blank
+    if "soil" in experiment["sample_type"]:
+        vol_air_filt = experiment["vol_susp"] / experiment["dry_mass"]
+
+    header = (
+        f"site = {experiment['site']}\nstart_time = {experiment['start_time']}\n"
+        f"end_time = {experiment['end_time']}\n"
+        f"filter_color = {experiment['filter_color']}\n"
+        f"sample_type = {experiment['sample_type']}\n"
+        f"vol_air_filt = {experiment['vol_air_filt']}\n"
+        f"proportion_filter_used = {experiment['proportion_filter_used']}\n"
+        f"vol_susp = {experiment['vol_susp']}\ntreatment = {experiment['treatment']}\n"
+        f"notes = {experiment['notes']}\nuser = {experiment['user']}\n"
+        f"IS = {experiment['IS']}\nwells_per_sample = {experiment['wells_per_sample']}\n"
+    )
+    if "TBS" in experiment["site"]:
+        header += (
+            f"lower_altitude = {experiment['lower_altitude']}\n"
+            f"upper_altitude = {experiment['upper_altitude']}\n"
+        )
+    return header, vol_air_filt
+
+
+def run_review(experiment: dict, catalog=None) -> None:
+    """Open the FreezingReviewer GUI for an experiment and wait until it is closed"""
+    import tkinter as tk
+
+    from olaf.image_verification.freezing_reviewer import FreezingReviewer
+
+    window = tk.Tk()
+    FreezingReviewer(
+        window,
+        experiment["folder"],
+        experiment["num_samples"],
+        experiment["wells_per_sample"],
+        experiment["dilutions"],
+        includes=(experiment["treatment"],),
+    )
+    window.mainloop()
+
+
+def run_temp(experiment: dict, catalog=None) -> list[Path]:
+    """
+    Create the frozen_at_temp .csv of an experiment from its reviewed .dat file.
+    Returns the written files, like the other stages (except the review).
+    """
+    from olaf.processing.spaced_temp_csv import SpacedTempCSV
+
+    spaced_temp_csv = SpacedTempCSV(
+        experiment["folder"],
+        experiment["num_samples"],
+        includes=(experiment["treatment"],),
+        chunksize=DAT_CHUNK_ROWS,
+    )
+    spaced_temp_csv.create_temp_csv(
+        experiment["dilutions"],
+        experiment["freezing_point_depression"],
+        experiment["wells_per_sample"],
+        experiment["sample_type"],
+    )
+    return spaced_temp_csv.saved_files
+
+
+def run_inps(experiment: dict, catalog: MetadataCatalog | None = None) -> list[Path]:
+    """Create the INPs/L .csv of an experiment from its frozen_at_temp .csv"""
+    from olaf.processing.graph_data_csv import GraphDataCSV
+
+    found_dates = re.findall(DATE_PATTERN, experiment["folder"].name)
+    if not found_dates:
+        raise ValueError(f"No date found in folder name {experiment['folder'].name}")
+    start_time = datetime.strptime(experiment["start_time"].strip(), "%Y-%m-%d %H:%M:%S")
+    date = found_dates[0]
+    if datetime.strptime(date, "%m.%d.%y").date() != start_time.date():
+        raise ValueError(
+            f"Date {date} does not match with the specified start time: {experiment['start_time']}"
+        )
+
+    header, vol_air_filt = experiment_header(experiment)
+    graph_data_csv = GraphDataCSV(
+        experiment["folder"],
+        experiment["num_samples"],
+        experiment["sample_type"],
+        vol_air_filt,
+        experiment["wells_per_sample"],
+        experiment["proportion_filter_used"],
+        experiment["vol_susp"],
+        experiment["dilutions"],
+        includes=(date, experiment["treatment"]),
+    )
+    graph_data_csv.convert_INPs_L(header, show_plot=experiment["show_plot"], catalog=catalog)
+    return graph_data_csv.saved_files
+
+
+def run_blanks(config: dict, catalog: MetadataCatalog | None = None) -> list[Path]:
+    """Average the blanks of the project and apply them to the samples"""
+    from olaf.processing.blank_correction import BlankCorrector
+
+    blanks = config["blanks"]
+    corrector = BlankCorrector(
+        config["project_folder"],
+        tuple(blanks["includes"]),
+        tuple(blanks["excludes"]),
+        tuple(blanks["sample_excludes"]),
+        multiple_per_day=blanks["multiple_per_day"],
+    )
+    corrector.average_blanks()
+    # used for INPs/L files written before the header recorded wells_per_sample
+    wells = {experiment["wells_per_sample"] for experiment in config["experiments"]}
+    wells_per_sample = wells.pop() if len(wells) == 1 else EXPERIMENT_DEFAULTS["wells_per_sample"]
+    corrector.apply_blanks(
+        only_within_dates=blanks["only_within_dates"],
+        show_comp_plot=blanks["show_comp_plot"],
+        monte_carlo_draws=blanks["monte_carlo_draws"],
+        wells_per_sample=wells_per_sample,
+        catalog=catalog,
+    )
+    return corrector.saved_files
+
+
+def run_final(config: dict, catalog: MetadataCatalog | None = None) -> list[Path]:
+    """Combine the treatments of every experiment into final files"""
+    from olaf.processing.final_file_creation import FinalFileCreation
+
+    final = config["final"]
+    to_final_file = FinalFileCreation(
+        config["project_folder"],
+        tuple(final["includes"]),
+        tuple(final["excludes"]),
+        catalog=catalog,
+    )
+    to_final_file.create_all_final_files(
+        final["treatment_dict"], final["header_start"], result_store=final["result_store"]
+    )
+    return to_final_file.saved_files
+
+
+def run_plots(config: dict, catalog: MetadataCatalog | None = None) -> list[Path]:
+    """Plot the INP spectra of the project, and the campaign overview if asked for"""
+    from olaf.processing.plots import Plots
+
+    plots = config["plots"]
+    plot = Plots(
+        config["project_folder"],
+        tuple(plots["includes"]),
+        tuple(plots["excludes"]),
+        plots["start_date"],
+        plots["end_date"],
+        plots["num_columns"],
+        plots["site_markers"],
+        save_name=plots["save_name"],
+        catalog=catalog,
+    )
+    plot.plot_data(
+        subplots=plots["subplots"], site_comparison=plots["site_comparison"], tbs=plots["tbs"]
+    )
+    if plots["campaign"]:
+        plot.plot_campaign(temperatures=tuple(plots["temperatures"]))
+    return plot.saved_files
+
+
+STAGE_FUNCTIONS = {
+    "review": run_review,
+    "temp": run_temp,
+    "inps": run_inps,
+    "blanks": run_blanks,
+    "final": run_final,
+    "plots": run_plots,
+}
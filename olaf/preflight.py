@@ -0,0 +1,261 @@
+"""
+Check a campaign before processing it:
+
+    olaf check experiments.toml
+
+Every experiment in the config is checked in its own thread, reading only the header
+line and the Avg_Temp and Picture columns of its .dat file and listing (not opening)
+its images, so a campaign on a shared drive is checked in seconds:
+- config: a required key is missing from the experiment, or num_samples,
+  wells_per_sample or dilutions have the wrong type
+- start_time: missing, or not in the %Y-%m-%d %H:%M:%S format the stages read
+- folder_date: the date in the folder name is not the date of start_time
+- wells: num_samples x wells_per_sample is not the NUM_WELLS_PLATE wells of a plate
+- dat_file: no .dat file, or one without an Avg_Temp column
+- temperature: the temperature rises more than TEMP_RISE_TOLERANCE above the lowest
+  temperature before it, while a run should only cool down
+- images: pictures named in the .dat file are not in the images folder
+Errors make stages fail or give wrong results; warnings are worth a look. A check that
+crashes on an experiment is reported as one error of that experiment.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from olaf.CONSTANTS import DATE_PATTERN, NUM_WELLS_PLATE
+from olaf.utils.data_handler import dat_dtypes
+from olaf.utils.path_utils import find_latest_file
+from olaf.utils.stage_inputs import experiment_inputs
+
+# degC the temperature may rise above its running minimum (sensor noise) before a run
+# counts as not cooling monotonically
+TEMP_RISE_TOLERANCE = 0.5
+CHECK_THREADS = 16
+
+
+def _issue(experiment, check, severity, message) -> dict:
+    return {
+        "experiment": experiment["name"],
+        "check": check,
+        "severity": severity,
+        "message": message,
+    }
+
+
+def _start_time(value) -> datetime | None:
+    """start_time as the stages read it, or None if it is missing or has another format"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _is_count(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _type_issues(experiment) -> list[dict]:
+    """
+    num_samples and wells_per_sample that are not positive integers, and dilutions that
+    are not a table of numbers (load_config converts them to float). Missing keys are
+    already reported.
+    """
+    issues = []
+    missing_keys = experiment.get("missing_keys", [])
+    for key in ("num_samples", "wells_per_sample"):
+        value = experiment[key]
+        if key not in missing_keys and not _is_count(value):
+            issues.append(
+                _issue(experiment, "config", "error", f"{key} {value!r} is not a positive integer")
+            )
+    dilutions = experiment["dilutions"]
+    if "dilutions" not in missing_keys and (
+        not isinstance(dilutions, dict)
+        or not all(isinstance(dilution, float) for dilution in dilutions.values())
+    ):
+        issues.append(
+            _issue(
+                experiment,
+                "config",
+                "error",
+                f"dilutions {dilutions!r} is not a table of sample = number",
+            )
+        )
+    return issues
+
+
+def _find_dat_file(experiment):
+    """The reviewed .dat file of an experiment, else the newest raw one (or None)"""
+    reviewed = experiment_inputs(experiment)
+    if reviewed:
+        return find_latest_file(reviewed), True
+    raw = [
+        file
+        for file in experiment["folder"].iterdir()
+        if file.suffix == ".dat"
+        and "reviewed" not in file.name
+        and experiment["treatment"] in file.name
+    ]
+    return (max(raw, key=lambda file: file.stat().st_mtime) if raw else None), False
+
+
+def check_experiment(experiment: dict) -> list[dict]:
+    """
+    Args:
+        experiment: experiment dictionary from load_config(..., strict=False)
+
+    Returns:
+        list of issues, dictionaries with experiment, check, severity and message
+    """
+    issues = []
+    missing_keys = experiment.get("missing_keys", [])
+    if missing_keys:
+        issues.append(_issue(experiment, "config", "error", f"missing {missing_keys}"))
+    if "folder" in missing_keys:
+        return issues
+
+    start_time = _start_time(experiment["start_time"])
+    if start_time is None:
+        issues.append(
+            _issue(
+                experiment,
+                "start_time",
+                "error",
+                f"start_time {experiment['start_time']!r} is missing or not "
+                "in the %Y-%m-%d %H:%M:%S format",
+            )
+        )
+    folder_dates = re.findall(DATE_PATTERN, experiment["folder"].name)
+    if start_time is not None and len(folder_dates) == 1:
+        folder_date = datetime.strptime(folder_dates[0], "%m.%d.%y").date()
+        if folder_date != start_time.date():
+            issues.append(
+                _issue(
+                    experiment,
+                    "folder_date",
+                    "warning",
+                    f"folder date {folder_date} is not the date of start_time {start_time}",
+                )
+            )
+
+    issues.extend(_type_issues(experiment))
+    num_samples, wells_per_sample = experiment["num_samples"], experiment["wells_per_sample"]
+    if (
+        _is_count(num_samples)
+        and _is_count(wells_per_sample)
+        and num_samples * wells_per_sample != NUM_WELLS_PLATE
+    ):
+        issues.append(
+            _issue(
+                experiment,
+                "wells",
+                "warning",
+                f"num_samples x wells_per_sample = {num_samples} x {wells_per_sample} = "
+                f"{num_samples * wells_per_sample}, not {NUM_WELLS_PLATE}",
+            )
+        )
+
+    if not experiment["folder"].is_dir():
+        issues.append(
+            _issue(experiment, "dat_file", "error", f"folder {experiment['folder']} does not exist")
+        )
+        return issues
+    dat_file, reviewed = _find_dat_file(experiment)
+    if dat_file is None:
+        issues.append(_issue(experiment, "dat_file", "error", "no .dat file"))
+        return issues
+    columns = pd.read_csv(dat_file, sep="\t", nrows=0).columns
+    if "Avg_Temp" not in columns:
+        issues.append(
+            _issue(experiment, "dat_file", "error", f"{dat_file.name} has no Avg_Temp column")
+        )
+        return issues
+    usecols = ["Avg_Temp"] + (["Picture"] if "Picture" in columns else [])
+    data = pd.read_csv(
+        dat_file, sep="\t", usecols=usecols, dtype=dat_dtypes(usecols), index_col=False
+    )
+
+    temps = data["Avg_Temp"]
+    rise = temps - temps.cummin()
+    if rise.max() > TEMP_RISE_TOLERANCE:
+        row = int(rise.idxmax())
+        issues.append(
+            _issue(
+                experiment,
+                "temperature",
+                "warning",
+                f"{dat_file.name} row {row}: {temps[row]} degC is "
+                f"{rise[row]:.2f} degC above the lowest temperature before it",
+            )
+        )
+
+    if "Picture" in data:
+        pictures = set(data["Picture"].dropna().astype(str)) - {""}
+        images_folder = next(
+            (
+                folder
+                for folder in experiment["folder"].iterdir()
+                if folder.is_dir() and folder.name.endswith("Images")
+            ),
+            None,
+        )
+        missing = pictures - set(os.listdir(images_folder) if images_folder else ())
+        if missing:
+            # the images are only needed to review the run
+            issues.append(
+                _issue(
+                    experiment,
+                    "images",
+                    "warning" if reviewed else "error",
+                    f"{len(missing)} of {len(pictures)} pictures are not in "
+                    f"{images_folder.name if images_folder else 'an images folder'}, e.g. "
+                    f"{min(missing)}",
+                )
+            )
+    return issues
+
+
+def _check_safely(experiment: dict) -> list[dict]:
+    """check_experiment, with an unexpected error as one issue of the experiment"""
+    try:
+        return check_experiment(experiment)
+    except Exception as e:  # noqa: BLE001, report and continue with the other experiments
+        return [_issue(experiment, "check", "error", f"check failed: {type(e).__name__}: {e}")]
+
+
+def check_campaign(config: dict, max_workers: int | None = None) -> list[dict]:
+    """
+    Check all experiments of a config in parallel.
+    Args:
+        config: dictionary from load_config(..., strict=False)
+        max_workers: number of threads (default: CHECK_THREADS)
+
+    Returns:
+        list of issues in the order of the experiments (see check_experiment)
+    """
+    experiments = config["experiments"]
+    if not experiments:
+        return []
+    with ThreadPoolExecutor(min(max_workers or CHECK_THREADS, len(experiments))) as pool:
+        return [issue for issues in pool.map(_check_safely, experiments) for issue in issues]
+
+
+def format_report(issues: list[dict], n_experiments: int) -> str:
+    """Issues as a text report, errors first"""
+    n_errors = sum(issue["severity"] == "error" for issue in issues)
+    lines = [
+        f"{n_experiments} experiments checked: {n_errors} errors, "
+        + f"{len(issues) - n_errors} warnings"
+    ]
+    for issue in sorted(issues, key=lambda issue: issue["severity"] != "error"):
+        lines.append(
+            f"{issue['severity'].upper():8}{issue['experiment']:30} "
+            f"{issue['check']:12}{issue['message']}"
+        )
+    return "\n".join(lines)
@@ -1,20 +1,30 @@
-
+import logging
+import re
 from datetime import datetime
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
-from olaf.CONSTANTS import ERROR_SIGNAL, THRESHOLD_ERROR
-from olaf.utils.df_utils import header_to_dict, read_with_flexible_header, unique_dilutions
-from olaf.utils.math_utils import inps_L_to_ml, inps_ml_to_L, rms
+from olaf.CONSTANTS import DATE_PATTERN, ERROR_SIGNAL, MONTE_CARLO_DRAWS, THRESHOLD_ERROR
+from olaf.utils.catalog import MetadataCatalog
+from olaf.utils.df_utils import header_to_dict, read_many, unique_dilutions
+from olaf.utils.math_utils import (
+    inps_L_to_ml,
+    inps_ml_to_L,
+    percentile_ci,
+    rms,
+    simulate_inps_ml,
+)
 from olaf.utils.path_utils import (
     find_latest_file,
     is_within_dates,
     save_df_file,
     sort_files_by_date,
 )
-from olaf.utils.plot_utils import plot_blank_corrected_vs_pre_corrected_inps
+from olaf.utils.tracing import count, traced
+
+logger = logging.getLogger(__name__)
 
 
 class BlankCorrector:
@@ -24,13 +34,16 @@ class BlankCorrector:
         blank_includes: tuple,
         blank_excludes: tuple,
         sample_excludes: tuple,
-        multiple_per_day=False
+        multiple_per_day=False,
     ) -> None:
         self.project_folder = project_folder
         self.blank_files = self._find_blank_files(multiple_per_day, blank_includes, blank_excludes)
         self.combined_blank: dict[tuple[str, str], pd.DataFrame] = {}
         self.sample_excludes = sample_excludes
+        # files written by average_blanks and apply_blanks
+        self.saved_files: list[Path] = []
 
+    @traced("blanks.discover")
     def _find_blank_files(self, multiple_per_day, blank_includes, blank_excludes):
         """Find all blank files in the project folder."""
 
@@ -61,10 +74,12 @@ class BlankCorrector:
                     blank_files.append(file_tuple[0])
             else:
                 blank_files.append(files_list[0][0])
-            # Print statement for which file we found:
-            print(f" found {len(files_list)} blank files for date {date}: {files_list}")
+            logger.debug("Found %d blank files for date %s: %s", len(files_list), date, files_list)
+        logger.info("Found %d blank files for %d dates", len(blank_files), len(files_by_date))
+        count("files", len(blank_files))
         return blank_files
 
+    @traced("blanks.average")
     def average_blanks(self, save=True):
         """Average all blank files into a single CSV file by temperature"""
         all_data = []
@@ -72,8 +87,7 @@ class BlankCorrector:
         # Track header information
         header_info = {}
 
-        for file in self.blank_files:
-            header_lines, df = read_with_flexible_header(file)
+        for file, (header_lines, df) in zip(self.blank_files, read_many(self.blank_files)):
             dict_header = header_to_dict(header_lines)
 
             # Filter out zero and negative INPS values
@@ -96,7 +110,7 @@ class BlankCorrector:
                 if header_info["start_time"] > date_obj:
                     header_info["start_time"] = date_obj
             else:
-                print(f"start_time not found in {file.name}")
+                logger.warning("start_time not found in %s", file.name)
 
             if "end_time" in dict_header:
                 date_str = dict_header["end_time"]
@@ -105,7 +119,7 @@ class BlankCorrector:
                 if header_info["end_time"] < date_obj:
                     header_info["end_time"] = date_obj
             else:
-                print(f"end_time not found in {file.name}")
+                logger.warning("end_time not found in %s", file.name)
 
             all_data.append(df)
 
@@ -154,55 +168,95 @@ class BlankCorrector:
         latest = header_info["end_time"].strftime("%Y-%m-%d")
         # Save the combined blank data to a CSV file
         save_file = self.project_folder / f"combined_blank_{earliest}_{latest}.csv"
-        # save_file, clean_df = save_df_file()
-        counter = 0
-        output_stem = save_file.stem
-        while save_file.exists():
-            # If the file exists, append a number to the filename
-            counter += 1
-            save_file = save_file.with_name(output_stem + f"({counter})" + save_file.suffix)
-
-        with open(save_file, "w") as f:
-            f.write(f"filename = {save_file.name}\n")
-            for key, value in header_info.items():
-                f.write(f"{key} = {value}\n")
-            clean_df.to_csv(f, index=True, lineterminator="\n")
+        save_file = save_df_file(clean_df, save_file, header_info, index=True)
+        self.saved_files.append(save_file)
         return save_file, clean_df
 
-    def apply_blanks(self, save=True, only_within_dates=True, show_comp_plot=False):
-        """Apply the blank correction to all INPs/L files in the project folder"""
+    def _find_inps_files(self, only_within_dates=True) -> dict:
+        """
+        The latest (not blank corrected) INPs/L file of every sample experiment folder.
+        Args:
+            only_within_dates: only folders within the dates of one of the combined blanks
 
-        for dates, data in self.combined_blank.items():
-            df_blanks, header_info_blanks = data
-            for experiment_folder in self.project_folder.iterdir():
-                if ("blank" not in experiment_folder.name
-                        and not any(excl in experiment_folder.name for excl in self.sample_excludes)
-                        and (is_within_dates(dates, experiment_folder.name) or not only_within_dates
-                )):
-                    # Collect all INPs/L files in the experiment folder
-                    input_files = list(experiment_folder.rglob("INPs_L*.csv"))
-                    # Process the latest INPS file (assumes one relevant per folder)
-                    # Select the appropriate INPs/L file for processing
-                    if not input_files:
-                        print(FileNotFoundError(f"No INPs_L files found in {experiment_folder}"))
-                        continue
-
-                    # Filter out any previously blank-corrected files
-                    original_files = [f for f in input_files if "blank_corrected" not in f.name]
-
-                    if not original_files:
-                        print(
-                            FileNotFoundError(
-                                f"Only blank-corrected files found in {experiment_folder}"
-                            )
-                        )
-                        continue
+        Returns:
+            dictionary of experiment folder to the Path of its INPs/L file
+        """
+        inps_files = {}
+        for experiment_folder in sorted(self.project_folder.iterdir()):
+            if (
+                experiment_folder.is_dir()
+                and "blank" not in experiment_folder.name
+                and not any(excl in experiment_folder.name for excl in self.sample_excludes)
+                and (
+                    not only_within_dates
+                    or any(
+                        is_within_dates(dates, experiment_folder.name)
+                        for dates in self.combined_blank
+                    )
+                )
+            ):
+                # Collect all INPs/L files in the experiment folder
+                input_files = list(experiment_folder.rglob("INPs_L*.csv"))
+                # Process the latest INPS file (assumes one relevant per folder)
+                # Select the appropriate INPs/L file for processing
+                if not input_files:
+                    # folders without a date (plots, final_files) aren't experiments
+                    if re.search(DATE_PATTERN, experiment_folder.name):
+                        logger.warning("No INPs_L files found in %s", experiment_folder)
+                    continue
+
+                # Filter out any previously blank-corrected files
+                original_files = [f for f in input_files if "blank_corrected" not in f.name]
+
+                if not original_files:
+                    logger.warning("Only blank-corrected files found in %s", experiment_folder)
+                    continue
+
+                # Get the latest original file (highest numbered or most recent)
+                inps_files[experiment_folder] = find_latest_file(original_files)
+                logger.debug("Selected %s for blank correction", inps_files[experiment_folder].name)
+        return inps_files
+
+    @traced("blanks.apply")
+    def apply_blanks(
+        self,
+        save=True,
+        only_within_dates=True,
+        show_comp_plot=False,
+        monte_carlo_draws: int | None = None,
+        wells_per_sample: int = 32,
+        seed: int | None = None,
+        catalog: MetadataCatalog | None = None,
+    ):
+        """
+        Apply the blank correction to all INPs/L files in the project folder.
+        By default, the confidence intervals of sample and blank are combined by root sum
+        of squares. When monte_carlo_draws is given, they are replaced by percentile
+        confidence intervals from that many simulated realizations (see _monte_carlo_ci).
+        Args:
+            save: whether to save the corrected files (default: True)
+            only_within_dates: only correct experiments within the dates of the blanks
+            show_comp_plot: whether to save a plot of pre- and post-corrected spectra
+            monte_carlo_draws: number of realizations for Monte Carlo confidence
+            intervals, e.g. MONTE_CARLO_DRAWS (default: None, root sum of squares)
+            wells_per_sample: number of wells per dilution used in the simulation for
+            INPs/L files whose header has no wells_per_sample
+            seed: seed for the random number generator, for reproducible intervals
+            catalog: MetadataCatalog to record the saved files in (default: None)
+        """
+        rng = np.random.default_rng(seed)
 
-                    # Get the latest original file (highest numbered or most recent)
-                    inps_file = find_latest_file(original_files)
-                    print(f"Selected {inps_file.name} for blank correction")
+        # The INPs/L files are the same for every blank date range, so they are found
+        # and read (concurrently) once
+        inps_files = self._find_inps_files(only_within_dates)
+        parsed_files = dict(zip(inps_files.values(), read_many(inps_files.values())))
 
-                    header_lines, df_inps = read_with_flexible_header(inps_file)
+        for dates, data in self.combined_blank.items():
+            df_blanks, header_info_blanks = data
+            for experiment_folder, inps_file in inps_files.items():
+                if is_within_dates(dates, experiment_folder.name) or not only_within_dates:
+                    count("files")
+                    header_lines, df_inps = parsed_files[inps_file]
                     dict_header = header_to_dict(header_lines)
                     # Check if the blank correction covers all temperatures from inps
 
@@ -229,7 +283,11 @@ class BlankCorrector:
                             )
                             missing_temps = set(inps_temps) - set(blank_temps)
                         if min(missing_temps) < min(blank_temps):
-                            print(f"Missing temperatures in blank correction: {missing_temps}")
+                            logger.warning(
+                                "%s: missing temperatures in blank correction: %s",
+                                inps_file.name,
+                                sorted(missing_temps),
+                            )
 
                     # Extract parameters
                     prop_filter_used = float(dict_header["proportion_filter_used"])
@@ -238,6 +296,8 @@ class BlankCorrector:
                     prop_filter_used_blanks = float(header_info_blanks["proportion_filter_used"])
                     vol_susp_blanks = float(header_info_blanks["vol_susp"])
                     vol_air_filt_blanks = float(header_info_blanks["vol_air_filt"])
+                    wells = int(dict_header.get("wells_per_sample", wells_per_sample))
+                    wells_blanks = int(header_info_blanks.get("wells_per_sample", wells_per_sample))
 
                     # Set index to temperature for alignment
                     df_inps.set_index("degC", inplace=True)
@@ -306,6 +366,20 @@ class BlankCorrector:
                             vol_susp,
                         )
 
+                    if monte_carlo_draws:
+                        lower_ci, upper_ci = self._monte_carlo_ci(
+                            df_inps.loc[common_temps],
+                            df_blanks.loc[common_temps],
+                            (vol_air_filt, prop_filter_used, vol_susp),
+                            (vol_air_filt_blanks, prop_filter_used_blanks, vol_susp_blanks),
+                            wells,
+                            monte_carlo_draws,
+                            rng,
+                            blank_wells_per_sample=wells_blanks,
+                        )
+                        df_corrected.loc[common_temps, "lower_CI"] = lower_ci
+                        df_corrected.loc[common_temps, "upper_CI"] = upper_ci
+
                     # Before concatenating, ensure the index is set to temperature
                     df_zero_rows.set_index("degC", inplace=True)
                     if not df_zero_rows.empty:
@@ -316,9 +390,22 @@ class BlankCorrector:
                     df_corrected = df_corrected.sort_index(ascending=False)
                     df_corrected.reset_index(inplace=True)
                     df_corrected = self._final_check(df_corrected, df_original)
+                    logger.info(
+                        "%s: %d values below the error threshold replaced with %s, "
+                        "%d non-monotonic values corrected",
+                        inps_file.name,
+                        (df_corrected["INPS_L"] == ERROR_SIGNAL).sum(),
+                        ERROR_SIGNAL,
+                        (df_corrected["qc_flag"] == 1).sum(),
+                    )
 
                     # Plot blank corrected and non-corrected INP spectra on same plot
                     if show_comp_plot:
+                        # imported here so matplotlib is only loaded when a plot is made
+                        from olaf.utils.plot_utils import (
+                            plot_blank_corrected_vs_pre_corrected_inps,
+                        )
+
                         plot_header_info = dict_header
                         current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
                         save_path = inps_file.parent / (
@@ -330,6 +417,7 @@ class BlankCorrector:
                         plot_blank_corrected_vs_pre_corrected_inps(
                             df_corrected, df_original, save_path, plot_header_info
                         )
+                        self.saved_files.append(save_path)
 
                     # Save to output file
                     if save:
@@ -342,9 +430,10 @@ class BlankCorrector:
                                     f"threshold_{split_files[0]}{inps_file.suffix}"
                                 )
                             else:
-                                print(
-                                    f"Difficulty saving corrected file name \n"
-                                    f": {inps_file.stem} has more than one ()"
+                                logger.warning(
+                                    "Difficulty saving corrected file name: %s has "
+                                    "more than one ()",
+                                    inps_file.stem,
                                 )
 
                         else:
@@ -353,13 +442,83 @@ class BlankCorrector:
                                 / f"blank_corrected_{THRESHOLD_ERROR}%_error_threshold_"
                                 f"{inps_file.name}"
                             )
-                        save_df_file(df_corrected, save_file, dict_header, index=False)
+                        save_file = save_df_file(df_corrected, save_file, dict_header)
+                        self.saved_files.append(save_file)
+                        if catalog is not None:
+                            catalog.record(save_file, dict_header)
+
+    @staticmethod
+    @traced("blanks.monte_carlo")
+    def _monte_carlo_ci(
+        df_sample,
+        df_blank,
+        sample_params,
+        blank_params,
+        wells_per_sample=32,
+        n_draws=MONTE_CARLO_DRAWS,
+        rng=None,
+        blank_wells_per_sample=None,
+    ):
+        """
+        Monte Carlo confidence intervals for blank corrected INPs/L.
+        Frozen well counts for sample and blank are drawn for all temperatures at once
+        as (draws x temps) arrays, converted to INPs/mL of suspension, subtracted, and
+        converted back to INPs/L with the sample parameters. The percentiles of the
+        result give the confidence intervals.
+        The blank is an average of blank_count filters, so it is simulated with that many
+        times the wells. For blanks averaged over several dilutions, the least diluted
+        one is used.
+        This is an approximation of convert_INPs_L: there, the wells frozen in the
+        background (DI water) column are taken off both the frozen and the total wells
+        (N_total) of every row. The INPs/L files don't keep the background counts, so the
+        simulation uses all wells of a dilution as the total, so the intervals are only
+        approximate where the background froze many wells.
+        Args:
+            df_sample: sample rows (indexed by degC) with "INPS_L" and "dilution"
+            df_blank: blank rows with the same index, "INPS_L", "dilution", "blank_count"
+            sample_params: (vol_air_filt, proportion_filter_used, vol_susp) of the sample
+            blank_params: (vol_air_filt, proportion_filter_used, vol_susp) of the blanks
+            wells_per_sample: number of wells per dilution of the sample
+            n_draws: number of realizations
+            rng: numpy Generator
+            blank_wells_per_sample: number of wells per dilution of the blanks
+            (default: None, wells_per_sample)
+
+        Returns:
+            tuple with the lower and upper confidence intervals in INPs/L
+        """
+        sample_ml = inps_L_to_ml(df_sample["INPS_L"].to_numpy(dtype=float), *sample_params)
+        blank_ml = inps_L_to_ml(df_blank["INPS_L"].to_numpy(dtype=float), *blank_params)
+        blank_dilution = [
+            min(unique_dilutions(pd.Series([dil]))) if dil is not None else np.nan
+            for dil in df_blank["dilution"]
+        ]
+        blank_wells = blank_wells_per_sample or wells_per_sample
+        if "blank_count" in df_blank.columns:
+            blank_wells = blank_wells * np.maximum(df_blank["blank_count"].to_numpy(), 1)
+
+        sample_draws = simulate_inps_ml(
+            sample_ml,
+            df_sample["dilution"].to_numpy(dtype=float),
+            wells_per_sample,
+            n_draws,
+            rng=rng,
+        )
+        blank_draws = simulate_inps_ml(blank_ml, blank_dilution, blank_wells, n_draws, rng=rng)
 
+        corrected_draws = inps_ml_to_L(sample_draws - blank_draws, *sample_params)
+        corrected = inps_ml_to_L(sample_ml - blank_ml, *sample_params)
+        return percentile_ci(corrected_draws, corrected)
+
+    @traced("blanks.final_check")
     def _final_check(self, df_corrected, df_inps):
         """
         Add info with how many times corrected value is below lower CI
         Check for monotonicity - INP/L should not decrease with decreasing temperature
+        The replaced and corrected values are logged per temperature at DEBUG level only;
+        apply_blanks logs a summary per file.
         """
+        debug = logger.isEnabledFor(logging.DEBUG)
         # Remove zero value rows from corrected INPS_L
         df_corrected = df_corrected[df_inps["INPS_L"] != 0]
 
@@ -375,13 +534,17 @@ class BlankCorrector:
                 corrected_below_ci.append(i)
 
         if (len(corrected_below_ci) / len(df_corrected)) * 100 > THRESHOLD_ERROR:
+            count("error_signals", len(corrected_below_ci))
             # Replace all the temperatures, and CI's with error value
             for i in corrected_below_ci:
-                print(
-                    f"value {df_corrected.loc[i, 'INPS_L']} for temperature {i} "
-                    f"below error threshold (see CONSTANTS); replacing with error "
-                    f"value {ERROR_SIGNAL}"
-                )
+                if debug:
+                    logger.debug(
+                        "value %s for temperature %s below error threshold (see CONSTANTS); "
+                        "replacing with error value %s",
+                        df_corrected.loc[i, "INPS_L"],
+                        i,
+                        ERROR_SIGNAL,
+                    )
                 df_corrected.loc[i, "INPS_L"] = ERROR_SIGNAL
                 df_corrected.loc[i, "lower_CI"] = ERROR_SIGNAL
                 df_corrected.loc[i, "upper_CI"] = ERROR_SIGNAL
@@ -409,12 +572,17 @@ class BlankCorrector:
                 != df_corrected.loc[current_temp, "INPS_L"]
             ):
                 while df_corrected.loc[prev_temp, "INPS_L"] == ERROR_SIGNAL:
-                    print(f"previous INP_L value of {ERROR_SIGNAL} at {prev_temp}.")
+                    if debug:
+                        logger.debug("previous INP_L value of %s at %s.", ERROR_SIGNAL, prev_temp)
                     prev_temp -= 1
-                print(f"Correcting value at temperature {current_temp} due to non-monotonicity.")
+                if debug:
+                    logger.debug(
+                        "Correcting value at temperature %s due to non-monotonicity.", current_temp
+                    )
                 df_corrected.loc[current_temp, "INPS_L"] = df_corrected.loc[prev_temp, "INPS_L"]
 
                 # if correction occurs, add 1 to qc column
+                count("corrections")
                 df_corrected.loc[current_temp, "qc_flag"] = 1
 
                 # Upper error is rmse of the one we are removing and previous error
@@ -444,15 +612,16 @@ class BlankCorrector:
         extrapolation_temps = [temp for temp in missing_temps if temp < min_blank_temp]
 
         if not extrapolation_temps:
-            print(f"No extrapolation occurred for missing temperatures: {missing_temps}")
+            logger.debug("No extrapolation occurred for missing temperatures: %s", missing_temps)
             return df_blanks, blank_temps
 
         # Check if the last (or any other value) is lower than previous ones
         # We expect INP values to increase as temperature decreases
         if len(df_blanks) > 1 and df_blanks["INPS_L"].iloc[-1] < df_blanks["INPS_L"].iloc[-2]:
-            print(
-                f"Warning: Last temperature {df_blanks.index[-1]}degC has lower INP value "
-                f"than previous temperature. Excluding from slope calculation."
+            logger.warning(
+                "Last temperature %sdegC has lower INP value than previous temperature. "
+                "Excluding from slope calculation.",
+                df_blanks.index[-1],
             )
 
             # Use the 4 points before the last one
@@ -469,13 +638,18 @@ class BlankCorrector:
             last_four = df_blanks.tail(4)
 
         # Check for other non-monotonic behavior in the dataset
-        for i in range(1, len(df_blanks) - 1):
-            if df_blanks["INPS_L"].iloc[i] > df_blanks["INPS_L"].iloc[i + 1]:
-                print(
-                    f"Warning: Non-monotonic behavior detected at temperature "
-                    f"{df_blanks.index[i]}degC in combined blank file. INP value "
-                    f"decreases at colder temperature."
-                )
+        non_monotonic_temps = [
+            df_blanks.index[i]
+            for i in range(1, len(df_blanks) - 1)
+            if df_blanks["INPS_L"].iloc[i] > df_blanks["INPS_L"].iloc[i + 1]
+        ]
+        if non_monotonic_temps:
+            logger.warning(
+                "Non-monotonic behavior detected at %d temperatures in combined blank file "
+                "(INP value decreases at colder temperature): %s",
+                len(non_monotonic_temps),
+                non_monotonic_temps,
+            )
 
         # Calculate the slope using linear regression on these points
         x = last_four.index.to_numpy()  # Temperatures
@@ -526,6 +700,7 @@ class BlankCorrector:
                 / f"extrap_comb_b_correction_range_{dates[0].strftime('%Y%m%d_%H%M%S')}_"
                 f"{dates[1].strftime('%Y%m%d_%H%M%S')}_created_on-{current_time}.csv"
             )
-            print(f"Saving extrapolated blanks to {save_file}")
+            logger.info("Saving extrapolated blanks to %s", save_file)
             df_blanks.to_csv(save_file, index=True)
+            self.saved_files.append(save_file)
         return df_blanks, blank_temps
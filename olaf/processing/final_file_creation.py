@@ -1,42 +1,81 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 from olaf.CONSTANTS import ERROR_SIGNAL
+from olaf.utils.catalog import MetadataCatalog
 from olaf.utils.data_handler import DataHandler
-from olaf.utils.df_utils import header_to_dict, read_with_flexible_header
+from olaf.utils.df_utils import header_to_dict, read_many
+from olaf.utils.path_utils import atomic_write_bytes
+from olaf.utils.result_store import ResultStore
+from olaf.utils.tracing import count, traced
+
+logger = logging.getLogger(__name__)
+
+FINAL_COLUMNS = [
+    "Temperature (degC)",
+    "n_INP_STP (per L)",
+    "lower_CL (per L)",
+    "upper_CL (per L)",
+    "QC_flag",
+    "Treatment_flag",
+]
+# Names of the FINAL_COLUMNS in the ResultStore
+STORE_FINAL_COLUMNS = ["degC", "n_INP", "lower_CL", "upper_CL", "qc_flag", "treatment_flag"]
 
 
 class FinalFileCreation:
-    def __init__(self, project_folder: Path, includes, excludes) -> None:
-        """ """
+    def __init__(
+        self, project_folder: Path, includes, excludes, catalog: MetadataCatalog | None = None
+    ) -> None:
+        """
+        Class to combine the treatments of every experiment into final (ARM format) files.
+        Args:
+            project_folder: Path of the project folder
+            includes: strings that all have to be in the file names to combine
+            excludes: strings that can't be in the folder or file names
+            catalog: MetadataCatalog to select the files from, instead of going through
+            every experiment folder (default: None)
+        """
         self.project_folder = project_folder
+        self.catalog = catalog
+        # header dictionary and data per file, parsed once while grouping the files by date
+        self.parsed_files: dict[Path, tuple[dict, pd.DataFrame]] = {}
+        # files written by create_all_final_files
+        self.saved_files: list[Path] = []
         self.files_per_date = self._get_files_per_date(includes, excludes)
 
+    @traced("final.collect")
     def _get_files_per_date(self, includes, excludes):
         """
         Get all the files in the project folder and group them by date.
         """
-        file_paths = []
-        # Go through every folder in the project folder and create a data_handler object for it
-        for folder in self.project_folder.iterdir():
-            if folder.is_dir() and not any(excl in folder.name for excl in excludes):
-                data_handler = DataHandler(
-                    folder, 0, suffix=".csv", includes=includes, excludes=excludes, date_col=None
-                )
-                if data_handler.data_file and data_handler.data_file not in file_paths:
-                    file_paths.append(data_handler.data_file)
+        if self.catalog is not None:
+            self.catalog.index_project(self.project_folder)
+            file_paths = self.catalog.query(
+                includes=includes, excludes=excludes, project_folder=self.project_folder
+            )
+        else:
+            file_paths = self._find_files(includes, excludes)
 
         files_per_date = {}
-        for file in file_paths:
+        parsed = read_many(
+            file_paths,
+            expected_columns=("degC", "dilution", "INPS_L", "lower_CI", "upper_CI", "qc_flag"),
+        )
+        for file, (header_lines, df_inps) in zip(file_paths, parsed):
             # look for the "start_time" in the header of each blank_corrected .csv file
-            header_lines, _ = read_with_flexible_header(file, expected_columns=(
-                "degC", "dilution", "INPS_L", "lower_CI", "upper_CI", "qc_flag"))
             dict_header = header_to_dict(header_lines)
+            self.parsed_files[file] = (dict_header, df_inps)
             found_dates = dict_header["start_time"]
             if not found_dates:
-                print(f"No date found in file name: {file.name}")
+                logger.warning("No date found in file name: %s", file.name)
                 continue
             else:
                 # Check if the date is already in the dictionary
@@ -46,140 +85,219 @@ class FinalFileCreation:
 
         return files_per_date
 
-    def create_all_final_files(self, treatment_dict, header_start) -> None:
+    @traced("final.discover")
+    def _find_files(self, includes, excludes):
+        """
+        Find the latest file matching includes and excludes in every experiment folder.
+        """
+        file_paths = []
+        # Go through every folder in the project folder and create a data_handler object for it
+        for folder in self.project_folder.iterdir():
+            if folder.is_dir() and not any(excl in folder.name for excl in excludes):
+                data_handler = DataHandler(
+                    folder, 0, suffix=".csv", includes=includes, excludes=excludes, date_col=None
+                )
+                if data_handler.data_file and data_handler.data_file not in file_paths:
+                    file_paths.append(data_handler.data_file)
+        return file_paths
+
+    def create_all_final_files(
+        self,
+        treatment_dict,
+        header_start,
+        max_workers: int | None = None,
+        manifest=True,
+        result_store: Path | None = None,
+    ) -> dict:
         """
         Create a final file with all the data from the files in the project folder.
+        The files per date are independent, so they are created in a thread pool from the
+        data parsed in _get_files_per_date. Every file is written to a temporary file and
+        renamed, and a manifest.json with the number of rows, the size and the sha256
+        checksum of every final file is written next to them.
+        Args:
+            treatment_dict: dictionary of treatment names in the file names to flags
+            header_start: string that starts the header of every final file
+            max_workers: number of threads (default: ThreadPoolExecutor default)
+            manifest: whether to write the manifest.json (default: True)
+            result_store: Path of a campaign-wide ResultStore file to also add the
+            results to (default: None)
+
+        Returns:
+            dictionary with the manifest entry per final file name
         """
         # Create a folder for the final files
         final_file_folder = self.project_folder / "final_files"
         if not final_file_folder.exists():
             final_file_folder.mkdir()
 
-        # Iterate through all the files per date in the project folder
-        for date, files in self.files_per_date.items():
-            header = header_start
-            save_file = None  # placeholder for file saving name
-            notes = ""  # string to fill out with the notes from all the files
-
-            dfs_to_concat = []  # List to hold dataframes for concatenation
-
-            # Go through each file and add it to the final df
-            for file in files:
-                # Read the file and get the header data
-                header_lines, df_inps = read_with_flexible_header(file, expected_columns=(
-                    "degC", "dilution", "INPS_L", "lower_CI", "upper_CI", "qc_flag"))
-                dict_header = header_to_dict(header_lines)
-                notes += f"{dict_header['notes']}"
-                if save_file is None:  # on First read, set save_file and extend header
-                    save_file = final_file_folder / (
-                        f"{dict_header['site']}_"
-                        f"{dict_header['start_time'][0:10]}_"
-                        f"{dict_header['start_time'][11:].replace(':', '')}.csv"
-                    )
-
-                    header += f"Site: {dict_header['site']}\n"
-                    header += f"Filter color: {dict_header['filter_color']}\n"
-
-                # Get the treatment flag from the file name
-                treatment_flag = ERROR_SIGNAL
-                for treatment, flag in treatment_dict.items():
-                    if treatment in file.name:
-                        treatment_flag = flag
-                        break
-                if treatment_flag == ERROR_SIGNAL:
-                    print(f"Treatment flag not found in file name: {file.name}")
-                    continue
-
-                temp_df = df_inps.drop("dilution", axis=1)
-                temp_df["Treatment_flag"] = treatment_flag
-
-                # find ERROR SIGNAl for confidence intervals L in df_inps
-                error_mask = (df_inps["lower_CI"] == ERROR_SIGNAL) | (
-                    df_inps["upper_CI"] == ERROR_SIGNAL
-                )
-                no_error_mask = ~error_mask
-
-                # Keep error confidence intervals as errors
-                temp_df.loc[error_mask, "lower_CI"] = df_inps.loc[error_mask, "lower_CI"]
-                temp_df.loc[error_mask, "upper_CI"] = df_inps.loc[error_mask, "upper_CI"]
-
-                # Convert non-error confidence intervals to confidence limits
-                temp_df.loc[no_error_mask, "lower_CI"] = (
-                    df_inps.loc[no_error_mask, "INPS_L"] - df_inps.loc[no_error_mask, "lower_CI"]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self._create_final_file,
+                    date,
+                    files,
+                    final_file_folder,
+                    treatment_dict,
+                    header_start,
                 )
-                temp_df.loc[no_error_mask, "upper_CI"] = (
-                    df_inps.loc[no_error_mask, "INPS_L"] + df_inps.loc[no_error_mask, "upper_CI"]
+                for date, files in self.files_per_date.items()
+            ]
+            results = [future.result() for future in futures]
+
+        final_manifest = {entry["file"]: entry for entry, _ in results if entry is not None}
+        self.saved_files.extend(final_file_folder / name for name in final_manifest)
+        if manifest:
+            self.saved_files.append(
+                atomic_write_bytes(
+                    final_file_folder / "manifest.json",
+                    json.dumps(final_manifest, indent=2).encode(),
                 )
+            )
+        if result_store is not None:
+            store_dfs = [store_df for _, store_df in results if store_df is not None]
+            if store_dfs:
+                ResultStore(result_store).append(pd.concat(store_dfs, ignore_index=True))
+                self.saved_files.append(result_store)
+        return final_manifest
+
+    @traced("final.merge")
+    def _create_final_file(self, date, files, final_file_folder, treatment_dict, header_start):
+        """
+        Combine the (already parsed) files of one date into one final file and write it.
 
-                temp_df.rename(
-                    columns={
-                        "degC": "Temperature (degC)",
-                        "INPS_L": "n_INP_STP (per L)",
-                        "lower_CI": "lower_CL (per L)",
-                        "upper_CI": "upper_CL (per L)",
-                        "qc_flag": "QC_flag",
-                    },
-                    inplace=True,
+        Returns:
+            tuple with the manifest entry of the written file and the rows for the
+            ResultStore, or (None, None) if no file was written
+        """
+        header_lines = [header_start]
+        save_file = None  # placeholder for file saving name
+        notes = []  # list to fill out with the notes from all the files
+
+        dfs_to_concat = []  # List to hold dataframes for concatenation
+        treatments = []  # treatment name of every dataframe, for the result store
+
+        # Go through each file and add it to the final df
+        for file in files:
+            # Get the header data and the data parsed while grouping the files
+            dict_header, df_inps = self.parsed_files[file]
+            notes.append(f"{dict_header['notes']}")
+            if save_file is None:  # on First read, set save_file and extend header
+                save_file = final_file_folder / (
+                    f"{dict_header['site']}_"
+                    f"{dict_header['start_time'][0:10]}_"
+                    f"{dict_header['start_time'][11:].replace(':', '')}.csv"
                 )
-                # Final check before concatenating
-                temp_df = self._final_check(temp_df)
 
-                # Add the dataframe to the list for concatenation
-                dfs_to_concat.append(temp_df)
+                header_lines.append(f"Site: {dict_header['site']}\n")
+                header_lines.append(f"Filter color: {dict_header['filter_color']}\n")
+
+            # Get the treatment flag from the file name
+            treatment_flag = ERROR_SIGNAL
+            for treatment, flag in treatment_dict.items():
+                if treatment in file.name:
+                    treatment_flag = flag
+                    break
+            if treatment_flag == ERROR_SIGNAL:
+                logger.warning("Treatment flag not found in file name: %s", file.name)
+                count("missing_treatment_flags")
+                continue
 
-            # Concatenate all dataframes in the list
-            if dfs_to_concat:
-                final_df = pd.concat(dfs_to_concat, ignore_index=True)
-            else:
-                final_df = pd.DataFrame(
-                    columns=[
-                        "Temperature (degC)",
-                        "n_INP_STP (per L)",
-                        "lower_CL (per L)",
-                        "upper_CL (per L)",
-                        "QC_flag",
-                        "Treatment_flag",
-                    ]
-                )
+            temp_df = df_inps.drop("dilution", axis=1)
+            temp_df["Treatment_flag"] = treatment_flag
 
-            # Add all the notes to the header
-            header += f"Sample notes: {notes}\n"
-            # Add the columns manually with two options for either TBS or non TBS samples
-            if "TBS" in dict_header["site"]:
-                header += (
-                    "Start (UTC); Stop (UTC); Lower altitude range (m AGL); "
-                    "Upper altitude range (m AGL); Total_vol (L)\n"
-                )
-            else:
-                header += "Start (UTC); Stop (UTC); Total_vol (L)\n"
+            # find ERROR SIGNAl for confidence intervals L in df_inps
+            error_mask = (df_inps["lower_CI"] == ERROR_SIGNAL) | (
+                df_inps["upper_CI"] == ERROR_SIGNAL
+            )
+            no_error_mask = ~error_mask
+
+            # Keep error confidence intervals as errors
+            temp_df.loc[error_mask, "lower_CI"] = df_inps.loc[error_mask, "lower_CI"]
+            temp_df.loc[error_mask, "upper_CI"] = df_inps.loc[error_mask, "upper_CI"]
 
-            header += (
-                "Temperature (degC); n_INP_STP (per L); lower_CL (per L); "
-                "upper_CL (per L); QC_flag; Treatment_flag\n"
+            # Convert non-error confidence intervals to confidence limits
+            temp_df.loc[no_error_mask, "lower_CI"] = (
+                df_inps.loc[no_error_mask, "INPS_L"] - df_inps.loc[no_error_mask, "lower_CI"]
+            )
+            temp_df.loc[no_error_mask, "upper_CI"] = (
+                df_inps.loc[no_error_mask, "INPS_L"] + df_inps.loc[no_error_mask, "upper_CI"]
             )
-            # Convert both start_time and end_time to UTC seconds
-            start_dt_obj = datetime.strptime(dict_header["start_time"], "%Y-%m-%d %H:%M:%S")
-            end_dt_obj = datetime.strptime(dict_header["end_time"], "%Y-%m-%d %H:%M:%S")
-
-            # Convert to UTC timestamp (seconds since epoch)
-            start_utc_seconds = int(start_dt_obj.replace(tzinfo=timezone.utc).timestamp())
-            end_utc_seconds = int(end_dt_obj.replace(tzinfo=timezone.utc).timestamp())
-
-            # Replace the old line with the new timestamps and altitudes if TBS filter
-            if "TBS" in dict_header["site"]:
-                header += (
-                    f"{start_utc_seconds},{end_utc_seconds},{dict_header['lower_altitude']},"
-                    f"{dict_header['upper_altitude']},{dict_header['vol_air_filt']}\n"
-                )
-            else:
-                header += f"{start_utc_seconds},{end_utc_seconds},{dict_header['vol_air_filt']}\n"
 
-            if save_file is not None:
-                with open(save_file, "w", newline="") as f:
-                    f.write(header)
-                    final_df.to_csv(f, sep=",", index=False, header=False)
-            else:
-                print(f"Warning: No save file created for date {date} in {self.project_folder}")
+            temp_df.rename(
+                columns={
+                    "degC": "Temperature (degC)",
+                    "INPS_L": "n_INP_STP (per L)",
+                    "lower_CI": "lower_CL (per L)",
+                    "upper_CI": "upper_CL (per L)",
+                    "qc_flag": "QC_flag",
+                },
+                inplace=True,
+            )
+            # Final check before concatenating
+            temp_df = self._final_check(temp_df)
+
+            # Add the dataframe to the list for concatenation
+            dfs_to_concat.append(temp_df)
+            treatments.append(treatment)
+
+        # Concatenate all dataframes in the list
+        if dfs_to_concat:
+            final_df = pd.concat(dfs_to_concat, ignore_index=True)
+        else:
+            final_df = pd.DataFrame(columns=FINAL_COLUMNS)
+
+        # Add all the notes to the header
+        header_lines.append(f"Sample notes: {''.join(notes)}\n")
+        # Add the columns manually with two options for either TBS or non TBS samples
+        if "TBS" in dict_header["site"]:
+            header_lines.append(
+                "Start (UTC); Stop (UTC); Lower altitude range (m AGL); "
+                "Upper altitude range (m AGL); Total_vol (L)\n"
+            )
+        else:
+            header_lines.append("Start (UTC); Stop (UTC); Total_vol (L)\n")
+
+        header_lines.append(f"{'; '.join(FINAL_COLUMNS)}\n")
+        # Convert both start_time and end_time to UTC seconds
+        start_dt_obj = datetime.strptime(dict_header["start_time"], "%Y-%m-%d %H:%M:%S")
+        end_dt_obj = datetime.strptime(dict_header["end_time"], "%Y-%m-%d %H:%M:%S")
+
+        # Convert to UTC timestamp (seconds since epoch)
+        start_utc_seconds = int(start_dt_obj.replace(tzinfo=timezone.utc).timestamp())
+        end_utc_seconds = int(end_dt_obj.replace(tzinfo=timezone.utc).timestamp())
+
+        # Replace the old line with the new timestamps and altitudes if TBS filter
+        if "TBS" in dict_header["site"]:
+            header_lines.append(
+                f"{start_utc_seconds},{end_utc_seconds},{dict_header['lower_altitude']},"
+                f"{dict_header['upper_altitude']},{dict_header['vol_air_filt']}\n"
+            )
+        else:
+            header_lines.append(
+                f"{start_utc_seconds},{end_utc_seconds},{dict_header['vol_air_filt']}\n"
+            )
+
+        if save_file is None:
+            logger.warning("No save file created for date %s in %s", date, self.project_folder)
+            return None, None
+
+        count("rows_written", len(final_df))
+        content = ("".join(header_lines) + final_df.to_csv(index=False, header=False)).encode()
+        atomic_write_bytes(save_file, content)
+        manifest_entry = {
+            "file": save_file.name,
+            "date": date,
+            "rows": len(final_df),
+            "bytes": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+        }
+        store_df = final_df.rename(columns=dict(zip(FINAL_COLUMNS, STORE_FINAL_COLUMNS)))
+        store_df["site"] = dict_header["site"]
+        store_df["start_utc"] = start_utc_seconds
+        store_df["end_utc"] = end_utc_seconds
+        store_df["treatment"] = np.repeat(treatments, [len(df) for df in dfs_to_concat])
+        return manifest_entry, store_df
 
     def _final_check(self, df):
         """
@@ -213,6 +331,7 @@ class FinalFileCreation:
             df.loc[df["n_INP_STP (per L)"] < 0, "n_INP_STP (per L)"] = ERROR_SIGNAL
 
         # Set nan values to ERROR_SIGNAL
+        count("error_signals", int(nan_mask_inp.sum()))
         df.loc[nan_mask_inp, "n_INP_STP (per L)"] = ERROR_SIGNAL
         df.loc[nan_mask_lower, "lower_CL (per L)"] = ERROR_SIGNAL
         df.loc[nan_mask_upper, "upper_CL (per L)"] = ERROR_SIGNAL
@@ -1,3 +1,4 @@
+import logging
 import operator
 from datetime import datetime
 from pathlib import Path
@@ -6,9 +7,12 @@ import numpy as np
 import pandas as pd
 
 from olaf.CONSTANTS import AGRESTI_COULL_UNCERTAIN_VALUES, NUM_TO_REPLACE_D1, VOL_WELL, Z
+from olaf.utils.catalog import MetadataCatalog
 from olaf.utils.data_handler import DataHandler
 from olaf.utils.df_utils import header_to_dict
-from olaf.utils.plot_utils import plot_INPS_L
+from olaf.utils.tracing import count, span
+
+logger = logging.getLogger(__name__)
 
 
 class GraphDataCSV(DataHandler):
@@ -34,6 +38,8 @@ class GraphDataCSV(DataHandler):
         includes: tuple = ("base",),
         excludes: tuple = ("INPs_L", "dict"),
         date_col=False,
+        data: pd.DataFrame | None = None,
+        data_file: Path | None = None,
     ) -> None:
         # Add class specific includes to make sure we get the right file
         includes = includes + ("frozen_at_temp", "reviewed")
@@ -45,6 +51,8 @@ class GraphDataCSV(DataHandler):
             excludes=excludes,
             date_col=date_col,
             sep=",",
+            data=data,
+            data_file=data_file,
         )
         self.sample_type = sample_type.lower()
         self.vol_air_filt = vol_air_filt
@@ -79,7 +87,9 @@ class GraphDataCSV(DataHandler):
             raise ValueError(f"Failed to rename columns: {str(e)}")
         return
 
-    def convert_INPs_L(self, header: str, save=True, show_plot=False) -> pd.DataFrame:
+    def convert_INPs_L(
+        self, header: str, save=True, show_plot=False, catalog: MetadataCatalog | None = None
+    ) -> pd.DataFrame:
         """
         Convert from # frozen wells at temperature for certain dilution to INPs/L.
         The steps involved in this function are:
@@ -106,14 +116,13 @@ class GraphDataCSV(DataHandler):
 
         args:
             save: whether to save the data to a .csv file (default: True)
+            catalog: MetadataCatalog to record the saved file in (default: None)
 
         Returns: the data as a pandas DataFrame
 
         """
 
-
-
-            # Internal logic function for later use
+        # Internal logic function for later use
         def error_logic_selecting_values(i, col_name, next_dilution_INP):
             """
             Logic for selecting the values to keep in the result_df when both current
@@ -195,32 +204,44 @@ class GraphDataCSV(DataHandler):
         # if more than NUM_TO_REPLACE_D1 samples in the highest dilutions are smaller
         # than the background
         # to create N_total df --> one column
-        print(
-            f"DI background found to be higher than {most_diluted_value} dilution "
-            f"{dilution_v_background_df.sum()} times."
+        logger.debug(
+            "DI background found to be higher than %s dilution %d times.",
+            most_diluted_value,
+            dilution_v_background_df.sum(),
         )
         if dilution_v_background_df.sum() < NUM_TO_REPLACE_D1:
             N_total_series = self.wells_per_sample - samples[float("inf")]
             adjusted_samples = samples.apply(lambda col: col - samples[float("inf")])
         else:  # use the background
+            count("background_replacements")
             N_total_series = self.wells_per_sample - samples[most_diluted_value]
             adjusted_samples = samples.apply(lambda col: col - samples[most_diluted_value])
-            print(
-                f"DI found to be higher than the {most_diluted_value} diltuion on "
-                f"{dilution_v_background_df.sum()} occasions. "
-                f"{most_diluted_value} dilution used for background in place of DI."
+            logger.info(
+                "%s: DI found to be higher than the %s dilution on %d occasions. "
+                "%s dilution used for background in place of DI.",
+                self.data_file.name if self.data_file else self.folder_path.name,
+                most_diluted_value,
+                dilution_v_background_df.sum(),
+                most_diluted_value,
             )
 
         "--------------- Step 3: INP/L calc + Confidence Intervals ----------------------"
         # With the samples columns and the N_total column, we can calculate the INPs/L
-        INPs_p_mL_test_water = adjusted_samples.apply(
-            lambda col: (-np.log((N_total_series - col) / N_total_series) / (VOL_WELL / 1000))
-            * float(col.name)
-        )
-        all_INPs_p_L = self._INP_ml_to_L(INPs_p_mL_test_water)
-        lower_INPS_p_L, upper_INPS_p_L = self._error_calc(
-            adjusted_samples, N_total_series, VOL_WELL, samples.columns
-        )
+        # fully frozen dilutions give log(0) and 0/0: the inf and NaN are pruned in step 4
+        with (
+            span("inps.ci_math", rows=len(samples)),
+            np.errstate(divide="ignore", invalid="ignore"),
+        ):
+            INPs_p_mL_test_water = adjusted_samples.apply(
+                lambda col: (
+                    (-np.log((N_total_series - col) / N_total_series) / (VOL_WELL / 1000))
+                    * float(col.name)
+                )
+            )
+            all_INPs_p_L = self._INP_ml_to_L(INPs_p_mL_test_water)
+            lower_INPS_p_L, upper_INPS_p_L = self._error_calc(
+                adjusted_samples, N_total_series, VOL_WELL, samples.columns
+            )
 
         "-------------------------- Step 4: Pruning the data --------------------------"
         # Turn both positive and negative INP's into NaN's
@@ -234,71 +255,82 @@ class GraphDataCSV(DataHandler):
 
         " -------------------------- Step 5: Combining into one -------------------------- "
         # initialize the results df with the first dilution
-        result_df = pd.concat(
-            [
-                pd.Series([all_INPs_p_L.columns[0]] * len(all_INPs_p_L)),
-                all_INPs_p_L.iloc[:, 0],
-                lower_INPS_p_L.iloc[:, 0],
-                upper_INPS_p_L.iloc[:, 0],
-            ],
-            axis=1,
-        )  # Rename the columns
-        result_df.columns = ["dilution", "INPS_L", "lower_CI", "upper_CI"]
-
-        # iterate over all consequent dilutions | skip the background | apply the logics
-        for col_name, next_dilution_INP in all_INPs_p_L.iloc[:, 1:-1].items():
-            # Take last 4 real values of current result_df["INPS_L"]
-            last_4_i = result_df["INPS_L"].dropna().tail(4).index
-            going_down = False
-            for i in last_4_i:
-                if (
-                    result_df.loc[i, "INPS_L"] < result_df.loc[i - 1, "INPS_L"] or going_down
-                ):  # If value is going down
-                    going_down = True
-                    prev_val = result_df["INPS_L"][i - 1]
-                    if prev_val == np.nan:
-                        prev_val = result_df["INPS_L"][i - 2]
-                    if prev_val == np.nan:
-                        print(
-                            f"Dilution transition error going to dilution {col_name}; "
-                            f"check frozen_at_temp file!"
-                        )
-
-                    # Check if both options are smaller, constrained by lower bound
-                    prev_val_ci = prev_val - result_df["lower_CI"][i]
-                    if result_df["INPS_L"][i] < prev_val_ci and next_dilution_INP[i] < prev_val_ci:
-                        # throw them out/error, no value for that temperature, whatever
-                        result_df.loc[i, :] = np.nan
-                        # Both are bigger:
-                    elif result_df["INPS_L"][i] > prev_val and next_dilution_INP[i] > prev_val:
-                        # Logic moved to function at top of this function for readability
-                        error_logic_selecting_values(i, col_name, next_dilution_INP)
-
-                    # If only current dilution is bigger, take that one
-                    elif result_df["INPS_L"][i] >= prev_val_ci:
-                        continue  # current one already selected
-                    # If only next dilution is bigger, take that one
-                    elif next_dilution_INP[i] >= prev_val_ci:
-                        result_df.loc[i, "dilution"] = col_name
-                        result_df.loc[i, "INPS_L"] = next_dilution_INP[i]
-                        result_df.loc[i, "lower_CI"] = lower_INPS_p_L[col_name][i]
-                        result_df.loc[i, "upper_CI"] = upper_INPS_p_L[col_name][i]
-                else:
-                    continue
-            # After checking the 4 overlapping values, we need to add the rest of the next dilution
-            result_df.iloc[i + 1 :, 0] = col_name
-            result_df.iloc[i + 1 :, 1] = next_dilution_INP[i + 1 :]
-            result_df.iloc[i + 1 :, 2] = lower_INPS_p_L[col_name][i + 1 :]
-            result_df.iloc[i + 1 :, 3] = upper_INPS_p_L[col_name][i + 1 :]
+        with span("inps.merge"):
+            result_df = pd.concat(
+                [
+                    pd.Series([all_INPs_p_L.columns[0]] * len(all_INPs_p_L)),
+                    all_INPs_p_L.iloc[:, 0],
+                    lower_INPS_p_L.iloc[:, 0],
+                    upper_INPS_p_L.iloc[:, 0],
+                ],
+                axis=1,
+            )  # Rename the columns
+            result_df.columns = ["dilution", "INPS_L", "lower_CI", "upper_CI"]
+
+            # iterate over all consequent dilutions | skip the background | apply the logics
+            for col_name, next_dilution_INP in all_INPs_p_L.iloc[:, 1:-1].items():
+                # Take last 4 real values of current result_df["INPS_L"]
+                last_4_i = result_df["INPS_L"].dropna().tail(4).index
+                going_down = False
+                for i in last_4_i:
+                    if (
+                        result_df.loc[i, "INPS_L"] < result_df.loc[i - 1, "INPS_L"] or going_down
+                    ):  # If value is going down
+                        going_down = True
+                        prev_val = result_df["INPS_L"][i - 1]
+                        if prev_val == np.nan:
+                            prev_val = result_df["INPS_L"][i - 2]
+                        if prev_val == np.nan:
+                            logger.warning(
+                                "Dilution transition error going to dilution %s; "
+                                "check frozen_at_temp file!",
+                                col_name,
+                            )
+
+                        # Check if both options are smaller, constrained by lower bound
+                        prev_val_ci = prev_val - result_df["lower_CI"][i]
+                        if (
+                            result_df["INPS_L"][i] < prev_val_ci
+                            and next_dilution_INP[i] < prev_val_ci
+                        ):
+                            # throw them out/error, no value for that temperature, whatever
+                            result_df.loc[i, :] = np.nan
+                            # Both are bigger:
+                        elif result_df["INPS_L"][i] > prev_val and next_dilution_INP[i] > prev_val:
+                            # Logic moved to function at top of this function for readability
+                            error_logic_selecting_values(i, col_name, next_dilution_INP)
+
+                        # If only current dilution is bigger, take that one
+                        elif result_df["INPS_L"][i] >= prev_val_ci:
+                            continue  # current one already selected
+                        # If only next dilution is bigger, take that one
+                        elif next_dilution_INP[i] >= prev_val_ci:
+                            result_df.loc[i, "dilution"] = col_name
+                            result_df.loc[i, "INPS_L"] = next_dilution_INP[i]
+                            result_df.loc[i, "lower_CI"] = lower_INPS_p_L[col_name][i]
+                            result_df.loc[i, "upper_CI"] = upper_INPS_p_L[col_name][i]
+                    else:
+                        continue
+                # After checking the 4 overlapping values, add the rest of the next dilution
+                result_df.iloc[i + 1 :, 0] = col_name
+                result_df.iloc[i + 1 :, 1] = next_dilution_INP[i + 1 :]
+                result_df.iloc[i + 1 :, 2] = lower_INPS_p_L[col_name][i + 1 :]
+                result_df.iloc[i + 1 :, 3] = upper_INPS_p_L[col_name][i + 1 :]
         # Add the temperature back as first column
         result_df.insert(0, "degC", temps)
+        count("missing_values", int(result_df["INPS_L"].isna().sum()))
 
         "---------------------- Step 6: Save and return the data ----------------------"
         if save:
-            self.save_to_new_file(result_df, prefix="INPs_L", header=header)
+            save_file = self.save_to_new_file(result_df, prefix="INPs_L", header=header)
+            if catalog is not None:
+                catalog.record(save_file, header_to_dict(header))
 
         # Plotting option
         if show_plot:
+            # imported here so matplotlib is only loaded when a plot is made
+            from olaf.utils.plot_utils import plot_INPS_L
+
             header_dict = header_to_dict(header)
             current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
             save_path = self.folder_path / (
@@ -306,6 +338,7 @@ class GraphDataCSV(DataHandler):
                 f"{header_dict['treatment']}_INPs_L_generated-{current_time}.png"
             )
             plot_INPS_L(result_df, save_path, header_dict)
+            self.saved_files.append(save_path)
 
         return result_df
 
@@ -333,8 +366,12 @@ class GraphDataCSV(DataHandler):
         """
         if isinstance(n_frozen, pd.DataFrame):  # dealing with a dataframes
             plus_min_part = n_frozen.apply(
-                lambda col: z
-                * np.sqrt((col / n_total * (1 - col / n_total) + z**2 / (4 * n_total)) / n_total)
+                lambda col: (
+                    z
+                    * np.sqrt(
+                        (col / n_total * (1 - col / n_total) + z**2 / (4 * n_total)) / n_total
+                    )
+                )
             )
             rem_num = n_frozen.apply(lambda col: (col / n_total) + z**2 / (2 * n_total))
             denom = 1 + z**2 / n_total
@@ -356,10 +393,12 @@ class GraphDataCSV(DataHandler):
                     lambda col: (op(col, plus_min_part[col.name]) / denom) * n_total
                 )
                 limit_INPS_ml = limit_wells.apply(
-                    lambda col: col.name
-                    / (vol_well / 1000)
-                    * abs((n_frozen[col.name] - col))
-                    / (n_total - n_frozen[col.name])
+                    lambda col: (
+                        col.name
+                        / (vol_well / 1000)
+                        * abs((n_frozen[col.name] - col))
+                        / (n_total - n_frozen[col.name])
+                    )
                 )
             limit_INPS_L = self._INP_ml_to_L(limit_INPS_ml)
             conf_intervals.append(limit_INPS_L)
@@ -0,0 +1,253 @@
+"""
+Provisional INP spectrum of an experiment that is still running.
+
+The instrument appends a row to the .dat file every second. LiveSpectrum reads only the
+rows that were added since the last update (DatTail), adds them to the same running
+temperature grid that SpacedTempCSV.create_temp_csv uses (TempGridAccumulator) and
+converts the grid to INPs/L with GraphDataCSV. The work per update is proportional to
+the new rows plus the size of the grid, not to the length of the run, so a spectrum can
+be refreshed every few seconds while the run goes on:
+
+    olaf live experiments.toml -e "SGP 01.01.24 base" --interval 5
+
+The spectrum uses the frozen wells as the instrument counts them, before the review in
+the GUI, so it is provisional. It is written to live_INPs_L_<dat file>.csv next to the
+.dat file, a name the blanks, final and plots stages do not pick up.
+"""
+
+import io
+import logging
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from olaf.processing.graph_data_csv import GraphDataCSV
+from olaf.processing.spaced_temp_csv import temp_frozen_frame
+from olaf.utils.path_utils import atomic_write_bytes
+from olaf.utils.temp_grid import TempGridAccumulator
+from olaf.utils.tracing import count, span
+
+logger = logging.getLogger(__name__)
+
+
+class DatTail:
+    def __init__(self, dat_file: Path, columns, sep: str = "\t") -> None:
+        """
+        Reader for the rows that were appended to a .dat file since the last read.
+        Only complete lines are parsed; a line the instrument is still writing is kept
+        until its end arrives.
+        Args:
+            dat_file: Path of the .dat file (raw or reviewed layout)
+            columns: names of the columns to read, e.g. Avg_Temp and the sample columns
+            sep: separator of the .dat file (default: tab-separated)
+        """
+        self.dat_file = dat_file
+        self.columns = list(columns)
+        self.sep = sep
+        self.offset = 0  # bytes of the file read so far
+        self.rewound = False  # the file was replaced or truncated at the last read
+        self._positions = None  # positions of self.columns in the header
+        self._partial = b""
+
+    def read_new(self) -> pd.DataFrame:
+        """
+        Returns:
+            DataFrame with self.columns for the complete rows added since the last call
+            (empty if there are none). If the file got shorter it is read from the start
+            and self.rewound is set.
+        """
+        self.rewound = False
+        if self.dat_file.stat().st_size < self.offset:
+            logger.warning("%s got shorter, reading it from the start", self.dat_file.name)
+            self.offset, self._positions, self._partial = 0, None, b""
+            self.rewound = True
+        with open(self.dat_file, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+
+        chunk = self._partial + chunk
+        end = chunk.rfind(b"\n") + 1
+        chunk, self._partial = chunk[:end], chunk[end:]
+        if self._positions is None and chunk:
+            header, _, chunk = chunk.partition(b"\n")
+            names = header.decode().rstrip("\r").split(self.sep)
+            missing = [column for column in self.columns if column not in names]
+            if missing:
+                raise ValueError(f"Columns {missing} not found in {self.dat_file.name}")
+            self._positions = [names.index(column) for column in self.columns]
+        if not chunk.strip():
+            return pd.DataFrame(columns=self.columns)
+
+        # usecols by position, so the unnamed time column of a raw .dat doesn't matter
+        data = pd.read_csv(
+            io.BytesIO(chunk),
+            sep=self.sep,
+            header=None,
+            usecols=self._positions,
+            index_col=False,
+        )
+        data.columns = [self.columns[self._positions.index(i)] for i in data.columns]
+        count("rows", len(data))
+        return data[self.columns]
+
+
+class LiveSpectrum:
+    def __init__(
+        self,
+        dat_file: Path,
+        num_samples: int,
+        dict_samples_to_dilution: dict,
+        wells_per_sample: int,
+        sample_type: str,
+        header: str,
+        vol_air_filt: float,
+        filter_used: float,
+        vol_susp: float,
+        freezing_point_depression_dict: dict | None = None,
+        temp_col: str = "Avg_Temp",
+    ) -> None:
+        """
+        Running frozen_at_temp and INPs/L data of a .dat file that is still being written.
+        Args:
+            dat_file: Path of the .dat file of the running experiment
+            num_samples: number of samples
+            dict_samples_to_dilution: dict of sample column to dilution factor
+            wells_per_sample: number of wells per sample
+            sample_type: sample type, e.g. air
+            header: header of the INPs/L file (see pipeline.experiment_header)
+            vol_air_filt: volume of air filtered (L) to use in the calculation
+            filter_used: proportion of the filter used
+            vol_susp: volume of the suspension (mL)
+            freezing_point_depression_dict: dict from main (salt and sea water only)
+            temp_col: temperature column of the .dat file
+        """
+        self.dat_file = dat_file
+        self.num_samples = num_samples
+        self.dict_samples_to_dilution = dict_samples_to_dilution
+        self.wells_per_sample = wells_per_sample
+        self.sample_type = sample_type
+        self.header = header
+        self.vol_air_filt = vol_air_filt
+        self.filter_used = filter_used
+        self.vol_susp = vol_susp
+        self.freezing_point_depression_dict = freezing_point_depression_dict or {}
+        self.temp_col = temp_col
+        self.sample_columns = [f"Sample_{i}" for i in range(num_samples)]
+        self.least_diluted_sample = min(
+            dict_samples_to_dilution, key=lambda k: dict_samples_to_dilution[k]
+        )
+        self.tail = DatTail(dat_file, [temp_col] + self.sample_columns)
+        self.accumulator = self._new_accumulator()
+        self.output_file = dat_file.parent / f"live_INPs_L_{dat_file.stem}.csv"
+
+    def _new_accumulator(self) -> TempGridAccumulator:
+        return TempGridAccumulator(self.sample_columns, self.least_diluted_sample)
+
+    def update(self) -> int:
+        """
+        Add the rows written since the last update.
+        Returns:
+            number of new rows
+        """
+        with span("live.update", file=self.dat_file.name):
+            new_rows = self.tail.read_new()
+            if self.tail.rewound:
+                self.accumulator = self._new_accumulator()
+            self.accumulator.add_frame(new_rows, self.temp_col)
+        return len(new_rows)
+
+    def frozen_at_temp(self) -> pd.DataFrame | None:
+        """
+        Returns:
+            the frozen_at_temp data of the rows so far, or None until the least diluted
+            sample has a frozen well
+        """
+        if self.accumulator.first_frozen is None:
+            return None
+        return temp_frozen_frame(
+            self.accumulator,
+            self.dict_samples_to_dilution,
+            self.freezing_point_depression_dict,
+            self.wells_per_sample,
+            self.sample_type,
+            self.temp_col,
+        )
+
+    def inps_l(self) -> pd.DataFrame | None:
+        """
+        Returns:
+            the INPs/L of the rows so far (like GraphDataCSV.convert_INPs_L), or None until
+            the least diluted sample has a frozen well
+        """
+        frozen_at_temp = self.frozen_at_temp()
+        if frozen_at_temp is None:
+            return None
+        graph_data_csv = GraphDataCSV(
+            self.dat_file.parent,
+            self.num_samples,
+            self.sample_type,
+            self.vol_air_filt,
+            self.wells_per_sample,
+            self.filter_used,
+            self.vol_susp,
+            self.dict_samples_to_dilution,
+            data=frozen_at_temp,
+            data_file=self.dat_file,
+        )
+        with span("live.inps"):
+            return graph_data_csv.convert_INPs_L(self.header, save=False)
+
+    def write(self, inps_l: pd.DataFrame) -> Path:
+        """Overwrite self.output_file with the header and inps_l, atomically"""
+        text = f"{self.header}\n" + inps_l.to_csv(index=False, lineterminator="\n")
+        return atomic_write_bytes(self.output_file, text.encode())
+
+    def run(
+        self, interval: float = 5, idle_timeout: float | None = None, max_updates: int | None = None
+    ) -> pd.DataFrame | None:
+        """
+        Update the spectrum and rewrite self.output_file every interval seconds.
+        Args:
+            interval: seconds between updates
+            idle_timeout: stop when no rows were added for this many seconds (default:
+            run until interrupted)
+            max_updates: stop after this many updates (default: no limit)
+
+        Returns:
+            the last INPs/L data, or None if nothing froze yet
+        """
+        inps_l = None
+        updates = 0
+        last_rows = time.monotonic()
+        while max_updates is None or updates < max_updates:
+            new_rows = self.update()
+            updates += 1
+            if new_rows:
+                last_rows = time.monotonic()
+                result = self.inps_l()
+                if result is not None:
+                    inps_l = result
+                    self.write(inps_l)
+                    logger.info(
+                        "%s: %d rows, %.1f degC, %d temperatures, down to %.1f degC",
+                        self.dat_file.name,
+                        self.accumulator.n_rows,
+                        self.accumulator.min_temp,
+                        len(inps_l),
+                        inps_l["degC"].min(),
+                    )
+                else:
+                    logger.info(
+                        "%s: %d rows, %.1f degC, no frozen wells yet",
+                        self.dat_file.name,
+                        self.accumulator.n_rows,
+                        self.accumulator.min_temp,
+                    )
+            elif idle_timeout is not None and time.monotonic() - last_rows >= idle_timeout:
+                logger.info("%s: no new rows for %s s, stopping", self.dat_file.name, idle_timeout)
+                break
+            if max_updates is None or updates < max_updates:
+                time.sleep(interval)
+        return inps_l
@@ -1,29 +1,48 @@
+import copy
 import itertools
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-
+import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
-from olaf.utils.df_utils import read_with_flexible_header, header_to_dict
-from olaf.utils.path_utils import is_within_dates
+import numpy as np
+import pandas as pd
+
+from olaf.CONSTANTS import DATE_PATTERN
+from olaf.utils.campaign_stats import SpectrumEnvelope, values_at_temperatures
+from olaf.utils.catalog import MetadataCatalog
 from olaf.utils.data_handler import DataHandler
-from olaf.utils.plot_utils import apply_plot_settings, PLOT_SETTINGS
+from olaf.utils.df_utils import header_to_dict, read_many, read_with_flexible_header
+from olaf.utils.path_utils import is_within_dates
+from olaf.utils.plot_utils import (
+    PLOT_SETTINGS,
+    PlotCache,
+    apply_plot_settings,
+    content_hash,
+    new_figure,
+    save_figure,
+)
+from olaf.utils.tracing import count, traced
+
+logger = logging.getLogger(__name__)
 
 
 class Plots:
-    DEFAULT_MARKERS = ['o', 's', '^', 'v', 'D', 'p', '*', 'h', 'X', 'P', '<', '>', 'd']
-    def __init__(self,
-                 project_folder: Path,
-                 includes: tuple,
-                 excludes: tuple,
-                 start_date: str,
-                 end_date: str,
-                 num_columns: int,
-                 site_markers: dict,
-                 save_name: str
-                ) -> None:
+    DEFAULT_MARKERS = ["o", "s", "^", "v", "D", "p", "*", "h", "X", "P", "<", ">", "d"]
+
+    def __init__(
+        self,
+        project_folder: Path,
+        includes: tuple,
+        excludes: tuple,
+        start_date: str | None,
+        end_date: str | None,
+        num_columns: int,
+        site_markers: dict,
+        save_name: str,
+        catalog: MetadataCatalog | None = None,
+    ) -> None:
         """
         This class is used for plotting INP spectra and can make lots of individual plots
         with or without site comparisons, or a single figure of subplots with or without
@@ -35,11 +54,15 @@ class Plots:
             project_folder: Path variable
             includes: tuple, generally "INPS_L" and other strings
             excludes: tuple, generally "blank" and other strings
-            start_date: User defined starting date from which to pull data. mm.dd.yy format
-            end_date: User defined date from which to pull data. mm.dd.yy format
+            start_date: User defined starting date from which to pull data. mm.dd.yy format,
+            or None for no start date
+            end_date: User defined date from which to pull data. mm.dd.yy format, or None
+            for no end date
             num_columns: Integer set by user if creating subplots
             site_markers: Dictionary of site markers
             save_name: String of user desired save name if creating subplots
+            catalog: MetadataCatalog to select the files from, instead of going through
+            every folder in the project folder
         """
         self.project_folder = project_folder
         self.num_columns = num_columns
@@ -47,15 +70,47 @@ class Plots:
         self._marker_cycle = itertools.cycle(self.DEFAULT_MARKERS)
         self._auto_markers = {}
         self.save_name = save_name
-        self.desired_files_df = self.find_desired_files(includes, excludes, start_date, end_date)
-
-
-    def plot_data(self, subplots = False, site_comparison = False, tbs = False):
+        self.catalog = catalog
+        self.file_selection = (includes, excludes, start_date, end_date)
+        self._desired_files_df = None
+        # figures written by plot_data and plot_campaign (not the reused ones)
+        self.saved_files: list[Path] = []
+
+    @property
+    def desired_files_df(self):
+        """Data of all selected files, loaded on first use"""
+        if self._desired_files_df is None:
+            self._desired_files_df = self.find_desired_files(*self.file_selection)
+        return self._desired_files_df
+
+    @traced("plots.plot_data")
+    def plot_data(
+        self,
+        subplots=False,
+        site_comparison=False,
+        tbs=False,
+        max_workers=None,
+        use_cache=True,
+        settings=None,
+    ):
         """
         Function with multiple options for plotting INP data.
+        Figures are drawn on their own Agg canvas and cleared after saving, so memory
+        doesn't grow with the number of dates. The separate figures per date are rendered
+        in a process pool.
+        With use_cache, a figure is only rendered when the hash of its data, the plot
+        settings and the markers differs from the last saved figure with the same name.
+        Otherwise the existing image is reused.
         Args:
             subplots: bool
             site_comparison: bool
+            tbs: bool
+            max_workers: Number of processes rendering figures per date. 1 renders them
+            one after another in this process. Default: number of CPUs.
+            use_cache: bool, skip figures that didn't change since they were last saved
+            settings: plot settings (default: a copy of PLOT_SETTINGS as it is now). They
+            are passed to the rendering processes with every figure, so changes made at
+            runtime also apply there.
 
         Returns: None, saves image(s)
 
@@ -65,8 +120,12 @@ class Plots:
         if not plots_folder.exists():
             plots_folder.mkdir()
         save_path = plots_folder
+        cache = PlotCache(plots_folder) if use_cache else None
+        settings = copy.deepcopy(PLOT_SETTINGS if settings is None else settings)
 
         all_inp_data_df = self.desired_files_df.copy()
+        if all_inp_data_df.empty:
+            return
 
         # Remove timestamps in case they are slightly different for site comparisons
         if site_comparison:
@@ -75,252 +134,344 @@ class Plots:
         else:
             date_version = "site_date"
 
-        # Obtain unique dates or site dates depending on plot
-        unique_site_dates = all_inp_data_df[date_version].unique()
+        # Errorbars per unique date or site date depending on plot
+        partition = self._partition(all_inp_data_df, date_version, site_comparison, tbs, settings)
 
         # for sizing and saving
-        n_dates = len(unique_site_dates)
+        n_dates = len(partition)
         current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
 
         if subplots:
-            n_cols = min(self.num_columns, n_dates) #user chooses num_columns on main_plots
+            n_cols = min(self.num_columns, n_dates)  # user chooses num_columns on main_plots
             n_rows = int(np.ceil(n_dates / n_cols))
 
             # sizing of subplots
-            width_per_subplot = PLOT_SETTINGS['figure']['figsize'][0]
-            height_per_subplot = PLOT_SETTINGS['figure']['figsize'][1]
+            width_per_subplot = settings["figure"]["figsize"][0]
+            height_per_subplot = settings["figure"]["figsize"][1]
 
             # sizing of figure
-            scale = PLOT_SETTINGS['figure']['subplot_scale']
+            scale = settings["figure"]["subplot_scale"]
             total_width = width_per_subplot * n_cols * scale
             total_height = height_per_subplot * n_rows * scale
 
-            # make figure
-            fig, axes = plt.subplots(n_rows, n_cols,
-                                     figsize=(total_width, total_height),
-                                     dpi=PLOT_SETTINGS['figure']['dpi'],
-                                     squeeze=False)
-            # flatten to 1D array
-            axes = axes.flatten()
-
-            for idx, date in enumerate(unique_site_dates):
-                ax = axes[idx]
-
-                date_data = all_inp_data_df[all_inp_data_df[date_version] == date]
-
-                if tbs:
-                    sites = date_data["altitude_range"].unique()
-                else:
-                    sites = date_data["site"].unique()
-
-                for site in sites:
-                    if site_comparison:
-                        if tbs:
-                            site_data = date_data[date_data["altitude_range"] == site]
-                        else:
-                            site_data = date_data[date_data["site"] == site]
-                    else:
-                        site_data = date_data
-
-                    marker = self.get_marker(site)
-
-                # Plot each treatment
-                    for treatment in site_data["treatment"].unique():
-                        treatment_data = site_data[site_data["treatment"] == treatment]
-
-                        # Calculate error bars (asymmetric)
-                        yerr= [treatment_data["lower_CI"], treatment_data["upper_CI"]]
-
-                        if tbs:
-                            color = None
-                        else:
-                            color = PLOT_SETTINGS['treatment_colors'].get(treatment, None)
+            all_series = [(date, series) for date, (series, _) in partition.items()]
 
+            key = content_hash(n_rows, n_cols, (total_width, total_height), all_series, settings)
+            if cache is not None and cache.lookup(self.save_name, key):
+                logger.info(
+                    "%s unchanged, reusing %s", self.save_name, cache.lookup(self.save_name, key)
+                )
+                return
 
-                        if site_comparison and site != 'default':
-                            label = f"{site} - {treatment}"
-                        else:
-                            label = treatment
-
-                        # Manually add marker setting
-                        line_settings = PLOT_SETTINGS['line'].copy()
-                        line_settings['marker'] = marker
-
-                        ax.errorbar(treatment_data["degC"],
-                                    treatment_data["INPS_L"],
-                                    yerr=yerr,
-                                    label=label,
-                                    color = color,
-                                    **line_settings)
+            # make figure
+            fig = new_figure(figsize=(total_width, total_height), dpi=settings["figure"]["dpi"])
+            # flatten to 1D array
+            axes = fig.subplots(n_rows, n_cols, squeeze=False).flatten()
 
-                        ax.set_title(f'{date}')
-                    apply_plot_settings(ax, settings=PLOT_SETTINGS)
+            for idx, (date, series) in enumerate(all_series):
+                _draw_date(axes[idx], date, series, settings)
 
                 # Hide extra subplots if any
             for idx in range(n_dates, len(axes)):
                 axes[idx].set_visible(False)
 
-            plt.tight_layout()
+            fig.tight_layout()
 
-            plt.savefig(f'{save_path}/{self.save_name}_created_on-'
-                        f'{current_time}.png', **PLOT_SETTINGS['save'])
+            save_file = save_figure(
+                fig,
+                save_path / f"{self.save_name}_created_on-{current_time}.png",
+                **settings["save"],
+            )
+            self.saved_files.append(save_file)
+            if cache is not None:
+                cache.store(self.save_name, key, save_file)
+                cache.save()
 
         else:
             # Create separate figure for each date
-            for date in unique_site_dates:
-                fig, ax = plt.subplots(figsize=PLOT_SETTINGS['figure']['figsize'],
-                                       dpi=PLOT_SETTINGS['figure']['dpi'])
-
-                date_data = all_inp_data_df[all_inp_data_df[date_version] == date]
-
-                if tbs:
-                    sites = date_data["altitude_range"].unique()
-                else:
-                    sites = date_data["site"].unique()
-
-                for site in sites:
-                    if site_comparison:
-                        if tbs:
-                            site_data = date_data[date_data["altitude_range"] == site]
-                        else:
-                            site_data = date_data[date_data["site"] == site]
-                    else:
-                        site_data = date_data
-
-                    #marker = self.site_markers.get(site)
-                    marker = self.get_marker(site)
-
-                    # Plot each treatment
-                    for treatment in site_data["treatment"].unique():
-                        treatment_data = site_data[site_data["treatment"] == treatment]
-
-                        # Calculate error bars (asymmetric)
-
-                        yerr = [treatment_data["lower_CI"], treatment_data["upper_CI"]]
-                        if tbs:
-                            color = None
-                        else:
-                            color = PLOT_SETTINGS['treatment_colors'].get(treatment, None)
-
-                        if site_comparison and site != 'default':
-                            label = f"{site} - {treatment}"
-                        else:
-                            label = treatment
-
-                        line_settings = PLOT_SETTINGS['line'].copy()
-                        line_settings['marker'] = marker
-
-                        ax.errorbar(treatment_data["degC"],
-                                    treatment_data["INPS_L"],
-                                    yerr=yerr,
-                                    label=label,
-                                    color = color,
-                                    **line_settings)
-                    ax.set_title(f'{date}')
-
-                    apply_plot_settings(ax, settings=PLOT_SETTINGS)
-                plt.tight_layout()
-
-                if site_comparison and tbs:
-                    save_site = site + "_"
-                elif site_comparison:
+            jobs = []
+            cache_keys = []
+            for date, (series, site) in partition.items():
+                if site_comparison:
                     save_site = site + "_"
                 else:
                     save_site = ""
 
-                if save_path:
-                    safe_date = str(date).replace('/', '_').replace(
-                        ' ', '_').replace(':', '-')
-                    plt.savefig(f'{save_path}/{save_site}{safe_date}_created_on-'
-                                f'{current_time}.png', **PLOT_SETTINGS['save'])
+                safe_date = str(date).replace("/", "_").replace(" ", "_").replace(":", "-")
+                name = f"{save_site}{safe_date}"
+                key = content_hash(date, series, settings)
+                if cache is not None and cache.lookup(name, key):
+                    continue  # unchanged, the saved figure is reused
+                cache_keys.append((name, key))
+                jobs.append(
+                    (date, series, save_path / f"{name}_created_on-{current_time}.png", settings)
+                )
+
+            if cache is not None:
+                logger.info(
+                    "Rendering %d changed figures, reusing %d unchanged figures",
+                    len(jobs),
+                    n_dates - len(jobs),
+                )
+            save_files = _render_date_figures(jobs, max_workers)
+            self.saved_files.extend(save_files)
+            if cache is not None:
+                for (name, key), save_file in zip(cache_keys, save_files):
+                    cache.store(name, key, save_file)
+                cache.save()
+
+    @traced("plots.campaign")
+    def plot_campaign(
+        self,
+        temperatures=(-15, -20, -25),
+        percentiles=(25, 50, 75),
+        max_workers=None,
+        use_cache=True,
+        settings=None,
+    ):
+        """
+        Overview plots of the whole date range, per treatment:
+        - a time series of the INP concentration at fixed temperatures, one subplot
+          per temperature, with a marker per site
+        - the median and interquartile envelope of all spectra per temperature
+        The files are read one folder date at a time and aggregated on the fly
+        (values at the fixed temperatures, and a SpectrumEnvelope histogram per
+        treatment), so memory doesn't grow with the number of experiments.
+        Args:
+            temperatures: temperatures in degC for the time series
+            percentiles: (lower, central, upper) percentiles of the envelope
+            max_workers: Number of threads reading files at the same time
+            use_cache: bool, skip figures that didn't change since they were last saved
+            settings: plot settings (default: a copy of PLOT_SETTINGS as it is now)
+
+        Returns: None, saves two images
+        """
+        plots_folder = self.project_folder / "plots"
+        if not plots_folder.exists():
+            plots_folder.mkdir()
+        cache = PlotCache(plots_folder) if use_cache else None
+        settings = copy.deepcopy(PLOT_SETTINGS if settings is None else settings)
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        timeseries = []
+        envelopes = {}
+        for _, date_df in self.find_desired_files(
+            *self.file_selection, by_date=True, max_workers=max_workers
+        ):
+            timeseries.extend(_campaign_points(date_df, temperatures))
+            for treatment, positions in _groups_in_order(date_df, ["treatment"]).items():
+                envelope = envelopes.setdefault(treatment, SpectrumEnvelope())
+                envelope.add(
+                    date_df["degC"].to_numpy()[positions],
+                    date_df["INPS_L"].to_numpy()[positions],
+                    n_spectra=date_df["site_date"].iloc[positions].nunique(),
+                )
+        if not timeseries:
+            return
+
+        timeseries_df = pd.DataFrame(timeseries).sort_values("time", kind="stable")
+        envelope_dfs = {
+            treatment: (envelope.percentiles(percentiles), envelope.n_spectra)
+            for treatment, envelope in envelopes.items()
+        }
+        markers = {site: self.get_marker(site) for site in timeseries_df["site"].unique()}
+
+        figures = {
+            f"{self.save_name}_timeseries": (
+                _draw_campaign_timeseries,
+                (timeseries_df, temperatures, markers, settings),
+                [
+                    timeseries_df["time"].astype("int64").to_numpy(),
+                    timeseries_df["site"].tolist(),
+                    timeseries_df["treatment"].tolist(),
+                    np.vstack(timeseries_df["values"].to_numpy()),
+                    temperatures,
+                    markers,
+                ],
+            ),
+            f"{self.save_name}_envelope": (
+                _draw_campaign_envelope,
+                (envelope_dfs, percentiles, settings),
+                [
+                    {treatment: envelope.counts for treatment, envelope in envelopes.items()},
+                    percentiles,
+                ],
+            ),
+        }
+        for name, (draw, args, content) in figures.items():
+            key = content_hash(content, settings)
+            if cache is not None and cache.lookup(name, key):
+                logger.info("%s unchanged, reusing %s", name, cache.lookup(name, key))
+                continue
+            fig = draw(*args)
+            save_file = save_figure(
+                fig, plots_folder / f"{name}_created_on-{current_time}.png", **settings["save"]
+            )
+            self.saved_files.append(save_file)
+            if cache is not None:
+                cache.store(name, key, save_file)
+        if cache is not None:
+            cache.save()
+
+    def _partition(self, all_inp_data_df, date_version, site_comparison, tbs, settings):
+        """
+        Split the data into the errorbars to draw per date (or site date), per site and
+        treatment, with a single groupby. The result is built once and shared by the
+        subplot and the separate figure branches of plot_data, and holds plain arrays, so
+        drawing doesn't need the data frame anymore.
+        Args:
+            all_inp_data_df: df with the data of all dates
+            date_version: column with the dates to make a (sub)plot for
+            site_comparison: bool
+            tbs: bool
+            settings: plot settings, for the treatment colors
 
+        Returns: dict of date to (list of dicts with x, y, yerr, label, color and marker;
+        last site of that date)
+        """
+        site_col = "altitude_range" if tbs else "site"
+        # Column arrays that are indexed per group
+        x = all_inp_data_df["degC"].to_numpy()
+        y = all_inp_data_df["INPS_L"].to_numpy()
+        yerr = all_inp_data_df[["lower_CI", "upper_CI"]].to_numpy().T
+
+        # Sites per date, in order of appearance. A missing site (e.g. the altitude range
+        # of a non-TBS file) is kept as NaN: without site comparison its rows are drawn
+        sites_per_date = {}
+        for date, site in _groups_in_order(all_inp_data_df, [date_version, site_col], dropna=False):
+            sites_per_date.setdefault(date, []).append(site)
+
+        # Row positions per treatment, of a site when comparing sites, else of the date
+        group_cols = (
+            [date_version, site_col, "treatment"]
+            if site_comparison
+            else [date_version, "treatment"]
+        )
+        treatments = {}
+        for key, positions in _groups_in_order(all_inp_data_df, group_cols).items():
+            treatments.setdefault(key[:-1], []).append((key[-1], positions))
+
+        partition = {}
+        for date, sites in sites_per_date.items():
+            series = []
+            for site in sites:
+                marker = self.get_marker(site)
+                site_key = (date, site) if site_comparison else (date,)
+                # Plot each treatment
+                for treatment, positions in treatments.get(site_key, []):
+                    if tbs:
+                        color = None
+                    else:
+                        color = settings["treatment_colors"].get(treatment, None)
 
+                    if site_comparison and site != "default":
+                        label = f"{site} - {treatment}"
+                    else:
+                        label = treatment
+
+                    series.append(
+                        {
+                            "x": x[positions],
+                            "y": y[positions],
+                            # error bars (asymmetric)
+                            "yerr": yerr[:, positions],
+                            "label": label,
+                            "color": color,
+                            "marker": marker,
+                        }
+                    )
+            partition[date] = (series, str(site))
+        return partition
 
-    def find_desired_files(self, includes, excludes, start_date, end_date):
+    def find_desired_files(
+        self, includes, excludes, start_date, end_date, by_date=False, max_workers=None
+    ):
         """
 
         Args:
             includes: User defined on main. INPS_L is primary, can specify specific treatments,
             blank corrected, sites, etc.
             excludes: User defined on main. Blanks excluded, can be customized like includes.
-            start_date: In mm.dd.yy format
-            end_date: In mm.dd.yy format
+            start_date: In mm.dd.yy format, or None for no start date
+            end_date: In mm.dd.yy format, or None for no end date
+            by_date: If True, return an iterator of (date, df) tuples that loads the files
+            one folder date at a time, instead of one df with all the data.
+            max_workers: Number of threads reading files at the same time
 
         Returns: combined_df. Df with columns of degC, INPS_L, lower_CI, upper_CI,
         site_date, site, date_time and treatment. Site_date is the site and full date_time
-        strings combined.
+        strings combined. The last four are categoricals.
 
         """
-        start_date = datetime.strptime(start_date, "%m.%d.%y")
-        end_date = datetime.strptime(end_date, "%m.%d.%y")
+        file_paths = self.find_file_paths(includes, excludes, start_date, end_date)
+        if "blank_corrected" in includes:
+            expected_columns = ("degC", "dilution", "INPS_L", "lower_CI", "upper_CI", "qc_flag")
+        else:
+            expected_columns = ("degC", "dilution", "INPS_L", "lower_CI", "upper_CI")
+
+        if by_date:
+            return self._iter_files_by_date(file_paths, expected_columns, max_workers)
+        return load_inp_files(file_paths, expected_columns, max_workers)
+
+    @traced("plots.discover")
+    def find_file_paths(self, includes, excludes, start_date, end_date):
+        """
+        Find the latest file matching includes and excludes in every folder in the date
+        range (mm.dd.yy format, None for no limit), sorted by path.
+        """
+        start_date = datetime.strptime(start_date, "%m.%d.%y") if start_date else None
+        end_date = datetime.strptime(end_date, "%m.%d.%y") if end_date else None
 
         file_paths = []
-        for folder in self.project_folder.iterdir():
-            if is_within_dates(dates=(start_date, end_date), folder_name=folder.name):
-                if folder.is_dir() and not any(excl in folder.name for excl in excludes):
-                    data_handler = DataHandler(
-                        folder, 0, suffix=".csv", includes=includes,
-                        excludes=excludes, date_col=None
-                    )
-                    if data_handler.data_file and data_handler.data_file not in file_paths:
-                        file_paths.append(data_handler.data_file)
+        if self.catalog is not None:
+            self.catalog.index_project(self.project_folder)
+            file_paths = self.catalog.query(
+                start=start_date,
+                end=end_date.replace(hour=23, minute=59, second=59) if end_date else None,
+                includes=includes,
+                excludes=excludes,
+                project_folder=self.project_folder,
+            )
+        else:
+            for folder in self.project_folder.iterdir():
+                if is_within_dates(
+                    dates=(start_date or datetime.min, end_date or datetime.max),
+                    folder_name=folder.name,
+                ):
+                    if folder.is_dir() and not any(excl in folder.name for excl in excludes):
+                        data_handler = DataHandler(
+                            folder,
+                            0,
+                            suffix=".csv",
+                            includes=includes,
+                            excludes=excludes,
+                            date_col=None,
+                        )
+                        if data_handler.data_file and data_handler.data_file not in file_paths:
+                            file_paths.append(data_handler.data_file)
 
         if len(file_paths) == 0:
-            print("No files found. Check includes, excludes and date range.")
-
-        file_paths = sorted(file_paths)
-        combined_df = pd.DataFrame()
-        all_data = []
-
-        for file in file_paths:
-            # probably a cleaner way to do this
-            if "blank_corrected" in includes:
-                header_lines, df = read_with_flexible_header(file, expected_columns=(
-                    "degC", "dilution", "INPS_L", "lower_CI", "upper_CI", "qc_flag"))
-            else:
-                header_lines, df = read_with_flexible_header(file)
-            dict_header = header_to_dict(header_lines)
-
-            # Remove zero or ERROR_SIGNAL (if below zero)
-            df = df[df["INPS_L"] > 0]
-
-            # Parse dates directly from the header dictionary
-            if "start_time" in dict_header:
-                date_str = dict_header["start_time"]
-            else:
-                print(f"start_time not found in {file.name}")
-
-            # Find site and treatment from header dictionary
-            if "site" in dict_header:
-                site_str = dict_header["site"]
-            else:
-                print(f"site not found in {file.name}")
-
-            if "treatment" in dict_header:
-                treatment_str = dict_header["treatment"]
-            else:
-                print(f"treatment not found in {file.name}")
-
-            # Creating df columns for easier access by the plot_data function
-            # Can add more from dict_header if desired
-            site_date_str = site_str + " " + date_str
-            df["site_date"] = site_date_str
-            df["site"] = site_str
-            df["date_time"] = date_str
-            df["treatment"] = treatment_str
-
-            if "TBS" in site_str:
-                altitude_string = (f"{dict_header['lower_altitude']}m - "
-                                   f"{dict_header['upper_altitude']}m")
-                df["altitude_range"] = altitude_string
-
-            all_data.append(df)
-
-            if all_data:
-                combined_df = pd.concat(all_data)
-            else:
-                raise ValueError("No valid data found in the provided files.")
-        return combined_df
+            logger.warning("No files found. Check includes, excludes and date range.")
+        count("files", len(file_paths))
+
+        return sorted(file_paths)
+
+    @staticmethod
+    def _iter_files_by_date(file_paths, expected_columns, max_workers=None):
+        """
+        Generator that loads the files of one folder date at a time.
+        Yields: (date, df) with date in yyyy-mm-dd format and df like find_desired_files.
+        """
+
+        def folder_date(file):
+            found_dates = re.findall(DATE_PATTERN, file.parent.name)
+            return datetime.strptime(found_dates[0], "%m.%d.%y") if found_dates else datetime.min
+
+        for date, files in itertools.groupby(sorted(file_paths, key=folder_date), folder_date):
+            yield (
+                date.strftime("%Y-%m-%d"),
+                load_inp_files(sorted(files), expected_columns, max_workers),
+            )
 
     def get_marker(self, site):
 
@@ -338,4 +489,198 @@ class Plots:
         return marker
 
 
-
+@traced("plots.load")
+def load_inp_files(file_paths, expected_columns, max_workers=None):
+    """
+    Read INPs/L files with a bounded thread pool (see read_many) and concatenate them once.
+    The header values (site_date, site, date_time, treatment and altitude_range for TBS
+    sites) are added as categorical columns, so they cost one small code per row instead
+    of a full string.
+    Args:
+        file_paths: list of files to read
+        expected_columns: column names of the data in the files
+        max_workers: Number of threads reading files at the same time
+
+    Returns: df with the data of all files, in the order of file_paths
+    """
+    if not file_paths:
+        return pd.DataFrame()
+
+    results = read_many(file_paths, _read_inp_file, max_workers, expected_columns=expected_columns)
+
+    frames = [df for df, _ in results]
+    combined_df = pd.concat(frames)
+    lengths = [len(df) for df in frames]
+    meta_columns = ["site_date", "site", "date_time", "treatment"]
+    if any("altitude_range" in meta for _, meta in results):
+        meta_columns.append("altitude_range")
+    for col in meta_columns:
+        codes, categories = pd.factorize(pd.Series([meta.get(col) for _, meta in results]))
+        combined_df[col] = pd.Categorical.from_codes(np.repeat(codes, lengths), categories)
+    return combined_df
+
+
+def _read_inp_file(file, expected_columns):
+    """
+    Read one INPs/L file and the header values used by the Plots class.
+    Returns: (df, dict with the header values)
+    """
+    header_lines, df = read_with_flexible_header(file, expected_columns=expected_columns)
+    dict_header = header_to_dict(header_lines)
+
+    # Remove zero or ERROR_SIGNAL (if below zero)
+    df = df[df["INPS_L"] > 0]
+
+    # Find start time, site and treatment from header dictionary
+    for key in ("start_time", "site", "treatment"):
+        if key not in dict_header:
+            logger.warning("%s not found in %s", key, file.name)
+    date_str = dict_header.get("start_time", "")
+    site_str = dict_header.get("site", "")
+
+    # Values for easier access by the plot_data function
+    # Can add more from dict_header if desired
+    meta = {
+        "site_date": site_str + " " + date_str,
+        "site": site_str,
+        "date_time": date_str,
+        "treatment": dict_header.get("treatment", ""),
+    }
+    if "TBS" in site_str:
+        meta["altitude_range"] = (
+            f"{dict_header['lower_altitude']}m - {dict_header['upper_altitude']}m"
+        )
+    return df, meta
+
+
+def _groups_in_order(df, columns, dropna=True):
+    """
+    Row positions per group of df, with the groups in order of first appearance.
+    With dropna=False, rows with NaN in one of the columns form their own groups.
+    """
+    indices = df.groupby(columns, sort=False, observed=True, dropna=dropna).indices
+    return dict(sorted(indices.items(), key=lambda item: item[1][0]))
+
+
+def _campaign_points(date_df, temperatures):
+    """Values at the fixed temperatures of every spectrum in date_df, as dicts"""
+    points = []
+    for (site, date_time, treatment), positions in _groups_in_order(
+        date_df, ["site", "date_time", "treatment"]
+    ).items():
+        values = values_at_temperatures(date_df.iloc[positions], temperatures)
+        points.append(
+            {
+                "time": pd.to_datetime(date_time),
+                "site": site,
+                "treatment": treatment,
+                "values": values,
+            }
+        )
+    return points
+
+
+def _draw_campaign_timeseries(timeseries_df, temperatures, markers, settings):
+    """Figure with the values at each fixed temperature over time, per site and treatment"""
+    width, height = settings["figure"]["figsize"]
+    fig = new_figure(
+        figsize=(width * 1.5, height * 0.6 * len(temperatures)), dpi=settings["figure"]["dpi"]
+    )
+    axes = fig.subplots(len(temperatures), 1, sharex=True, squeeze=False)[:, 0]
+    values = np.vstack(timeseries_df["values"].to_numpy())
+    for (site, treatment), positions in _groups_in_order(
+        timeseries_df, ["site", "treatment"]
+    ).items():
+        times = timeseries_df["time"].to_numpy()[positions]
+        for idx, ax in enumerate(axes):
+            ax.plot(
+                times,
+                values[positions, idx],
+                marker=markers[site],
+                linestyle="-",
+                linewidth=0.5,
+                markersize=4,
+                label=f"{site} - {treatment}",
+                color=settings["treatment_colors"].get(treatment, None),
+            )
+    for ax, temperature in zip(axes, temperatures):
+        ax.set_yscale(settings["axes"]["yscale"])
+        ax.set_ylabel(f"{settings['axes']['ylabel']} at {temperature:g} deg C")
+        ax.grid(**settings["grid"]["major"])
+    axes[0].legend(**settings["legend"])
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return fig
+
+
+def _draw_campaign_envelope(envelope_dfs, percentiles, settings):
+    """
+    Figure with the central percentile and the lower-upper band per treatment.
+    envelope_dfs: dict of treatment to (SpectrumEnvelope.percentiles df, number of spectra)
+    """
+    lower, central, upper = (f"p{percentile:g}" for percentile in percentiles)
+    fig = new_figure(figsize=settings["figure"]["figsize"], dpi=settings["figure"]["dpi"])
+    ax = fig.add_subplot()
+    for treatment, (envelope_df, n_spectra) in envelope_dfs.items():
+        color = settings["treatment_colors"].get(treatment, None)
+        (line,) = ax.plot(
+            envelope_df["degC"],
+            envelope_df[central],
+            color=color,
+            label=f"{treatment} {central} (n = {n_spectra})",
+        )
+        ax.fill_between(
+            envelope_df["degC"],
+            envelope_df[lower],
+            envelope_df[upper],
+            color=line.get_color(),
+            alpha=0.25,
+            linewidth=0,
+            label=f"{treatment} {lower}-{upper}",
+        )
+    apply_plot_settings(ax, settings=settings)
+    fig.tight_layout()
+    return fig
+
+
+def _draw_date(ax, date, series, settings):
+    """Draw the errorbars of one date (see Plots._partition) on ax with the plot settings"""
+    for line in series:
+        # Manually add marker setting
+        line_settings = settings["line"].copy()
+        line_settings["marker"] = line["marker"]
+
+        ax.errorbar(
+            line["x"],
+            line["y"],
+            yerr=line["yerr"],
+            label=line["label"],
+            color=line["color"],
+            **line_settings,
+        )
+    ax.set_title(f"{date}")
+    apply_plot_settings(ax, settings=settings)
+
+
+def _render_date_figure(job):
+    """
+    Render and save the figure of one date. Job is a (date, series, save_file, settings)
+    tuple; the settings come with the job because a worker process started with spawn
+    only has the module defaults of PLOT_SETTINGS.
+    """
+    date, series, save_file, settings = job
+    fig = new_figure(figsize=settings["figure"]["figsize"], dpi=settings["figure"]["dpi"])
+    _draw_date(fig.add_subplot(), date, series, settings)
+    fig.tight_layout()
+    save_figure(fig, save_file, **settings["save"])
+    return save_file
+
+
+@traced("plots.render")
+def _render_date_figures(jobs, max_workers=None):
+    """Render the figures per date in a process pool (or here if max_workers is 1)"""
+    count("figures", len(jobs))
+    if max_workers == 1 or len(jobs) < 2:
+        return [_render_date_figure(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_render_date_figure, jobs))
@@ -5,6 +5,8 @@ import pandas as pd
 
 from olaf.CONSTANTS import TEMP_STEP
 from olaf.utils.data_handler import DataHandler
+from olaf.utils.temp_grid import TempGridAccumulator
+from olaf.utils.tracing import count, span
 
 
 class SpacedTempCSV(DataHandler):
@@ -16,6 +18,8 @@ class SpacedTempCSV(DataHandler):
         excludes: tuple = ("frozen",),
         date_col: str = "Date",
         sample_type: str = "salt",
+        usecols: tuple | None = None,
+        chunksize: int | None = None,
     ) -> None:
         """
         Class that has functionality to read a (processed ("verified")) well experiments
@@ -25,13 +29,27 @@ class SpacedTempCSV(DataHandler):
         Args:
             folder_path: location of the experiment folder
             rev_name: list of strings to identify the revision name in the .dat file
+            usecols: columns to load from the .dat file (default: Avg_Temp and the
+            num_samples sample columns, which is all create_temp_csv uses)
+            chunksize: stream the .dat file in blocks of this many rows instead of
+            loading it, so memory doesn't grow with the length of the run (e.g.
+            DAT_CHUNK_ROWS). self.data is then None, and every create_temp_csv call reads
+            the file again (see DataHandler.read_chunks)
 
         Returns:
             The data file and the data as a pandas DataFrame
         """
         includes = includes + ("reviewed",)
+        if usecols is None:
+            usecols = ("Avg_Temp", *(f"Sample_{i}" for i in range(num_samples)))
         super().__init__(
-            folder_path, num_samples, includes=includes, excludes=excludes, date_col=date_col
+            folder_path,
+            num_samples,
+            includes=includes,
+            excludes=excludes,
+            date_col=date_col,
+            usecols=usecols,
+            chunksize=chunksize,
         )
         return
 
@@ -72,81 +90,30 @@ class SpacedTempCSV(DataHandler):
         Returns:
             Dataframe, and saves the data in a .csv file if save is True
         """
-        # initialize the temp_frozen_df with temperature column and sample columns
-        # step 1 and 2: Find least diluted sample from dict_to_sample_dilution
         least_diluted_sample = min(
             dict_samples_to_dilution, key=lambda k: dict_samples_to_dilution[k]
         )
-        first_frozen_id = self.data[least_diluted_sample].ne(0).idxmax()
-        temp_frozen = round(pd.to_numeric(self.data.loc[first_frozen_id, temp_col]), 1)
-        # step 3: round down to nearest 0.5
-        round_temp_frozen = ceil((temp_frozen * 2)) / 2
-        # step 5: Initialize with three rows for the first two and zeros for the samples
-        temp_first_frozen_row = [temp_frozen] + [
-            self.data.loc[first_frozen_id, f"Sample_{i}"] for i in range(self.num_samples)
-        ]
-        if sample_type == "salt" or sample_type == "sea water":
-            least_diluted_sample_adjustment = freezing_point_depression_dict.get(least_diluted_sample)
-            num_empty_rows = round(10 * least_diluted_sample_adjustment + 4)
-        else:
-            num_empty_rows = 4
-
-        temp_frozen_df = pd.DataFrame(
-            data=[[round_temp_frozen + j * TEMP_STEP] + [0] *
-                  self.num_samples for j in range(num_empty_rows, 0, -1)],
-            columns=[temp_col] + [f"Sample_{i}" for i in range(self.num_samples)],
+        accumulator = TempGridAccumulator(
+            [f"Sample_{i}" for i in range(self.num_samples)], least_diluted_sample, temp_step
         )
-
-        temp_frozen_df.loc[len(temp_frozen_df)] = temp_first_frozen_row
-        while round_temp_frozen - temp_step > min(self.data[temp_col]):
-            # Step 6: increment the temperature by temp_step until the end of the data
-            round_temp_frozen -= temp_step
-            # Step 7: find the frozen wells for each temp
-            round_temp_frozen_upper = round_temp_frozen + 0.01
-            round_temp_frozen_lower = round_temp_frozen - 0.01
-            # If no line is found within this range, it puts in NaN values. If there's
-            # a NaN value, we want it to take the first temperature  below the range.
-
-            new_row = [round_temp_frozen] + [
-                self.data[
-                    (self.data[temp_col] > round_temp_frozen_lower)
-                    & (self.data[temp_col] < round_temp_frozen_upper)
-                ][f"Sample_{i}"].max()
-                if not pd.isna(
-                    self.data[
-                        (self.data[temp_col] > round_temp_frozen_lower)
-                        & (self.data[temp_col] < round_temp_frozen_upper)
-                    ][f"Sample_{i}"].max()
-                )
-                else self.data[self.data[temp_col] > round_temp_frozen_upper][f"Sample_{i}"].max()
-                for i in range(self.num_samples)
-            ]
-
-            temp_frozen_df.loc[len(temp_frozen_df)] = new_row
-
-        temp_frozen_df["Avg_Temp"] = temp_frozen_df["Avg_Temp"].round(decimals=1)
-
-        # Move columns affected by freezing point depression to the corrected
-        # temperature indices
-        if sample_type == "salt" or sample_type == "sea water":
-            for key, value in freezing_point_depression_dict.items():
-                df_index_adjustment = value * 10
-                temp_frozen_df[key] = temp_frozen_df[key].shift(-int(df_index_adjustment))
-
-        # Change temperature column to standard name of degC
-        temp_frozen_df.rename(columns={temp_col: "degC"}, inplace=True)
-        # Set sample columns to ints
-        for i in range(self.num_samples):
-            mask = temp_frozen_df[f"Sample_{i}"].isna()
-            temp_frozen_df.loc[mask, f"Sample_{i}"] = wells_per_sample
-            temp_frozen_df[f"Sample_{i}"] = temp_frozen_df[f"Sample_{i}"].astype("int64")
-
-        # filter dataframe to take 0.5 temp intervals beside first freezer
-        if sample_type == "salt" or sample_type == "sea water":
-            first_four_rows = temp_frozen_df.iloc[:4]
-            remaining_rows = temp_frozen_df.iloc[4:]
-            filtered_rows = remaining_rows[remaining_rows.loc[:,"degC"] % 0.5 == 0]
-            temp_frozen_df = pd.concat([first_four_rows, filtered_rows]).reset_index(drop=True)
+        if isinstance(self.data, pd.DataFrame):
+            with span("temp.binning", rows=len(self.data)):
+                accumulator.add_frame(self.data, temp_col)
+        else:  # blocks of the .dat file, only the running maxima are kept
+            with span("temp.binning", chunked=True):
+                for chunk in self.read_chunks():
+                    accumulator.add_frame(chunk, temp_col)
+            if not accumulator.n_rows:
+                raise FileNotFoundError("No .dat file found in the folder")
+        temp_frozen_df = temp_frozen_frame(
+            accumulator,
+            dict_samples_to_dilution,
+            freezing_point_depression_dict,
+            wells_per_sample,
+            sample_type,
+            temp_col,
+        )
+        count("temperature_steps", len(temp_frozen_df))
 
         # step 8
         if save:
@@ -155,9 +122,8 @@ class SpacedTempCSV(DataHandler):
             )
             if sample_type == "salt" or sample_type == "sea water":
                 fpd_dict_df = pd.DataFrame.from_dict(
-                    freezing_point_depression_dict,
-                    orient="index",
-                    columns=["temp_adjustment"])
+                    freezing_point_depression_dict, orient="index", columns=["temp_adjustment"]
+                )
                 fpd_dict_df.index.name = "dilution"
                 fpd_dict_df = fpd_dict_df.reset_index()
                 self.save_to_new_file(
@@ -165,12 +131,90 @@ class SpacedTempCSV(DataHandler):
                 )
             # convert dilution dict to df then save as new csv file
             dilution_dict_df = pd.DataFrame.from_dict(
-                dict_samples_to_dilution,
-                orient="index",
-                columns=["dilution"])
+                dict_samples_to_dilution, orient="index", columns=["dilution"]
+            )
             dilution_dict_df.index.name = "sample"
             dilution_dict_df = dilution_dict_df.reset_index()
-            self.save_to_new_file(dilution_dict_df, self.folder_path /
-                                  f"{self.data_file.stem}.csv", "dilution_dict")
+            self.save_to_new_file(
+                dilution_dict_df, self.folder_path / f"{self.data_file.stem}.csv", "dilution_dict"
+            )
 
         return temp_frozen_df
+
+
+def temp_frozen_frame(
+    accumulator: TempGridAccumulator,
+    dict_samples_to_dilution: dict,
+    freezing_point_depression_dict: dict,
+    wells_per_sample: int,
+    sample_type: str,
+    temp_col: str = "Avg_Temp",
+) -> pd.DataFrame:
+    """
+    The frozen_at_temp data (steps 1 to 7 of SpacedTempCSV.create_temp_csv) from the rows
+    added to a TempGridAccumulator so far.
+    Args:
+        accumulator: TempGridAccumulator with the sample columns and the least diluted
+        sample as trigger column
+        dict_samples_to_dilution: dict from main
+        freezing_point_depression_dict: dict from main
+        wells_per_sample: variable from main
+        sample_type: variable from main
+        temp_col: name of the temperature column before it is renamed to degC
+
+    Returns:
+        Dataframe with degC and the number of frozen wells per sample
+    """
+    num_samples = len(accumulator.sample_columns)
+    # step 1 and 2: Find least diluted sample from dict_to_sample_dilution
+    least_diluted_sample = min(dict_samples_to_dilution, key=lambda k: dict_samples_to_dilution[k])
+    first_frozen_temp, first_frozen_counts = accumulator.start_row()
+    temp_frozen = round(first_frozen_temp, 1)
+    # step 3: round down to nearest 0.5
+    round_temp_frozen = ceil(temp_frozen * 2) / 2
+    # step 5: Initialize with three rows for the first two and zeros for the samples
+    temp_first_frozen_row = [temp_frozen] + list(first_frozen_counts)
+    if sample_type == "salt" or sample_type == "sea water":
+        least_diluted_sample_adjustment = freezing_point_depression_dict.get(least_diluted_sample)
+        num_empty_rows = round(10 * least_diluted_sample_adjustment + 4)
+    else:
+        num_empty_rows = 4
+
+    # Step 6 and 7: the temperatures every temp_step until the end of the data, with the
+    # highest number of frozen wells in the band around each (see TempGridAccumulator)
+    grid_temps, grid_values = accumulator.grid_rows(round_temp_frozen)
+    temp_frozen_df = pd.DataFrame(
+        data=[
+            [round_temp_frozen + j * TEMP_STEP] + [0] * num_samples
+            for j in range(num_empty_rows, 0, -1)
+        ]
+        + [temp_first_frozen_row]
+        + [[temp] + list(values) for temp, values in zip(grid_temps, grid_values)],
+        columns=[temp_col] + accumulator.sample_columns,
+    )
+
+    temp_frozen_df["Avg_Temp"] = temp_frozen_df["Avg_Temp"].round(decimals=1)
+
+    # Move columns affected by freezing point depression to the corrected
+    # temperature indices
+    if sample_type == "salt" or sample_type == "sea water":
+        for key, value in freezing_point_depression_dict.items():
+            df_index_adjustment = value * 10
+            temp_frozen_df[key] = temp_frozen_df[key].shift(-int(df_index_adjustment))
+
+    # Change temperature column to standard name of degC
+    temp_frozen_df.rename(columns={temp_col: "degC"}, inplace=True)
+    # Set sample columns to ints
+    for i in range(num_samples):
+        mask = temp_frozen_df[f"Sample_{i}"].isna()
+        temp_frozen_df.loc[mask, f"Sample_{i}"] = wells_per_sample
+        temp_frozen_df[f"Sample_{i}"] = temp_frozen_df[f"Sample_{i}"].astype("int64")
+
+    # filter dataframe to take 0.5 temp intervals beside first freezer
+    if sample_type == "salt" or sample_type == "sea water":
+        first_four_rows = temp_frozen_df.iloc[:4]
+        remaining_rows = temp_frozen_df.iloc[4:]
+        filtered_rows = remaining_rows[remaining_rows.loc[:, "degC"] % 0.5 == 0]
+        temp_frozen_df = pd.concat([first_four_rows, filtered_rows]).reset_index(drop=True)
+
+    return temp_frozen_df
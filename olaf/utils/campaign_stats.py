@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Temperatures of the envelope: the 0.5 degC grid of the INP files, 0 to -30 degC
+ENVELOPE_TEMPS = np.arange(0, -30.5, -0.5)
+# log10(INPs) bins of the envelope histograms: 0.02 decades wide, from 1e-6 to 1e6
+LOG_BIN_WIDTH = 0.02
+LOG_BIN_RANGE = (-6, 6)
+
+
+def values_at_temperatures(
+    df: pd.DataFrame, temperatures, value_col: str = "INPS_L", tolerance: float = 0.01
+) -> np.ndarray:
+    """
+    Value of a spectrum at fixed temperatures.
+    Args:
+        df: df of one spectrum with a degC column
+        temperatures: temperatures in degC, e.g. (-15, -20, -25)
+        value_col: column with the values (default: INPS_L)
+        tolerance: max distance in degC between a requested and a measured temperature
+
+    Returns:
+        array with a value per temperature; NaN where the spectrum has no value
+    """
+    temps = df["degC"].to_numpy(dtype=float)
+    values = df[value_col].to_numpy(dtype=float)
+    result = np.full(len(temperatures), np.nan)
+    for idx, temperature in enumerate(temperatures):
+        matches = np.flatnonzero(np.abs(temps - temperature) <= tolerance)
+        if matches.size:
+            result[idx] = values[matches[0]]
+    return result
+
+
+class SpectrumEnvelope:
+    def __init__(
+        self,
+        temperatures=ENVELOPE_TEMPS,
+        bin_width: float = LOG_BIN_WIDTH,
+        log_range: tuple = LOG_BIN_RANGE,
+    ) -> None:
+        """
+        Streaming per-temperature percentiles of many spectra. Every spectrum is added
+        to a fixed histogram of log10(INPs) per temperature, so memory doesn't grow with
+        the number of spectra. Percentiles are accurate to one bin (default: 0.02
+        decades, about 5%), which is well below the confidence intervals.
+        Args:
+            temperatures: temperature grid in degC; values of other temperatures are ignored
+            bin_width: width of the log10 bins
+            log_range: (min, max) of log10(INPs); values outside are put in the edge bins
+        """
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        self.bin_width = bin_width
+        self.log_range = log_range
+        n_bins = int(round((log_range[1] - log_range[0]) / bin_width))
+        self.counts = np.zeros((len(self.temperatures), n_bins), dtype=np.int64)
+        self.n_spectra = 0
+
+    def add(self, degC, values, n_spectra: int = 1) -> None:
+        """
+        Add one spectrum, or several at once with their values concatenated. Non-positive
+        and non-finite values are skipped, like they are in the plots.
+        Args:
+            degC: temperatures; array-like
+            values: INP concentrations at those temperatures; array-like
+            n_spectra: number of spectra in degC and values, counted in n_spectra
+        """
+        degC = np.asarray(degC, dtype=float)
+        values = np.asarray(values, dtype=float)
+        temp_idx = np.searchsorted(-self.temperatures, -degC)
+        on_grid = temp_idx < len(self.temperatures)
+        on_grid[on_grid] = np.isclose(self.temperatures[temp_idx[on_grid]], degC[on_grid])
+        valid = on_grid & np.isfinite(values) & (values > 0)
+
+        bins = np.floor((np.log10(values[valid]) - self.log_range[0]) / self.bin_width)
+        bins = np.clip(bins.astype(np.int64), 0, self.counts.shape[1] - 1)
+        np.add.at(self.counts, (temp_idx[valid], bins), 1)
+        self.n_spectra += n_spectra
+
+    def percentiles(self, percentiles=(25, 50, 75), min_count: int = 1) -> pd.DataFrame:
+        """
+        Percentiles per temperature, from the bin centers.
+        Args:
+            percentiles: percentiles to compute, 0-100
+            min_count: temperatures with fewer values get NaN
+
+        Returns:
+            df with degC, count and a p<percentile> column per percentile
+        """
+        totals = self.counts.sum(axis=1)
+        cumulative = np.cumsum(self.counts, axis=1)
+        centers = self.log_range[0] + (np.arange(self.counts.shape[1]) + 0.5) * self.bin_width
+        result = {"degC": self.temperatures, "count": totals}
+        for percentile in percentiles:
+            # first bin where the cumulative count reaches the percentile
+            targets = np.maximum(np.ceil(totals * percentile / 100), 1)[:, None]
+            bin_idx = np.argmax(cumulative >= targets, axis=1)
+            column = 10 ** centers[bin_idx]
+            column[totals < max(min_count, 1)] = np.nan
+            result[f"p{percentile:g}"] = column
+        return pd.DataFrame(result)
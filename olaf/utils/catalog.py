@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from olaf.utils.df_utils import header_to_dict, read_header
+from olaf.utils.path_utils import find_latest_file
+
+# Header keys with their own (queryable) column in the catalog, with the SQL type
+CATALOG_COLUMNS = {
+    "site": "TEXT",
+    "start_time": "TEXT",
+    "end_time": "TEXT",
+    "treatment": "TEXT",
+    "sample_type": "TEXT",
+    "vol_air_filt": "REAL",
+    "IS": "TEXT",
+    "user": "TEXT",
+    "notes": "TEXT",
+    "lower_altitude": "REAL",
+    "upper_altitude": "REAL",
+}
+INDEXED_COLUMNS = ("site", "start_time", "treatment", "folder")
+
+
+class MetadataCatalog:
+    def __init__(self, db_path: Path) -> None:
+        """
+        Local SQLite catalog of the header metadata of the .csv files in a project, so
+        files can be selected on site, dates and treatment without opening them.
+        The catalog is filled by index_project, or by record when a file is written.
+        Args:
+            db_path: Path of the SQLite database file, created if it doesn't exist
+        """
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        header_columns = ", ".join(
+            f'"{key}" {sql_type}' for key, sql_type in CATALOG_COLUMNS.items()
+        )
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, folder TEXT, "
+                f"name TEXT, mtime REAL, size INTEGER, {header_columns}, header TEXT)"
+            )
+            for column in INDEXED_COLUMNS:
+                self.connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS idx_files_{column} ON files ("{column}")'
+                )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def record(self, file_path: Path, header_dict: dict | None = None) -> None:
+        """
+        Add or update a single file in the catalog.
+        Args:
+            file_path: Path of the file
+            header_dict: header of the file as a dictionary. If None, the header is read
+        """
+        if header_dict is None:
+            header_dict = header_to_dict(read_header(file_path))
+        with self.connection:
+            self.connection.execute(*self._upsert(file_path, header_dict))
+
+    def index_project(self, project_folder: Path, suffix: str = ".csv") -> int:
+        """
+        Bring the catalog up to date with the experiment folders in a project folder.
+        Only the headers of new files, or files with a changed modification time or size,
+        are read. Files that no longer exist are removed from the catalog.
+        Args:
+            project_folder: Path of the project folder
+            suffix: suffix of the files to index (default: .csv)
+
+        Returns:
+            number of files that were (re-)read
+        """
+        in_project, params = self._in_project(project_folder)
+        known = {
+            path: (mtime, size)
+            for path, mtime, size in self.connection.execute(
+                f"SELECT path, mtime, size FROM files WHERE {in_project}", params
+            )
+        }
+        statements = []
+        seen = set()
+        for folder in project_folder.iterdir():
+            if not folder.is_dir():
+                continue
+            for file in folder.iterdir():
+                if file.suffix != suffix:
+                    continue
+                seen.add(str(file))
+                stat = file.stat()
+                if known.get(str(file)) == (stat.st_mtime, stat.st_size):
+                    continue
+                header_dict = header_to_dict(read_header(file))
+                if "start_time" in header_dict:  # only files with an experiment header
+                    statements.append(self._upsert(file, header_dict, stat))
+
+        with self.connection:
+            for statement in statements:
+                self.connection.execute(*statement)
+            self.connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in set(known) - seen]
+            )
+        return len(statements)
+
+    def query(
+        self,
+        sites=None,
+        start: datetime | str | None = None,
+        end: datetime | str | None = None,
+        treatment: str | None = None,
+        includes: tuple = (),
+        excludes: tuple = (),
+        latest: bool = True,
+        project_folder: Path | None = None,
+    ) -> list[Path]:
+        """
+        Select files from the catalog.
+        Args:
+            sites: collection of sites to select (default: all)
+            start: earliest start_time (inclusive)
+            end: latest start_time (inclusive)
+            treatment: treatment to select, e.g. "heat" (default: all)
+            includes: strings that all have to be in the file name
+            excludes: strings that can't be in the file or folder name
+            latest: only return the latest version of the files per folder, like
+            DataHandler does (default: True)
+            project_folder: only select files in this project folder (default: all)
+
+        Returns:
+            sorted list with the Paths of the selected files
+        """
+        conditions, params = [], []
+        if project_folder is not None:
+            in_project, project_params = self._in_project(project_folder)
+            conditions.append(in_project)
+            params.extend(project_params)
+        if sites is not None:
+            sites = list(sites)
+            conditions.append(f"site IN ({', '.join('?' * len(sites))})")
+            params.extend(sites)
+        if start is not None:
+            conditions.append("start_time >= ?")
+            params.append(str(start))
+        if end is not None:
+            conditions.append("start_time <= ?")
+            params.append(str(end))
+        if treatment is not None:
+            conditions.append("treatment = ?")
+            params.append(treatment)
+        for include in includes:
+            conditions.append("instr(name, ?) > 0")
+            params.append(include)
+        for exclude in excludes:
+            conditions.append("instr(name, ?) = 0")
+            params.append(exclude)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        files_per_folder = defaultdict(list)
+        rows = self.connection.execute(f"SELECT path, folder FROM files{where}", params)
+        for path, folder in rows:
+            if not any(excl in Path(folder).name for excl in excludes):
+                files_per_folder[folder].append(Path(path))
+        if not latest:
+            return sorted(file for files in files_per_folder.values() for file in files)
+        return sorted(find_latest_file(files) for files in files_per_folder.values())
+
+    def header(self, file_path: Path) -> dict:
+        """Header dictionary of a file in the catalog (empty if it is not in it)"""
+        row = self.connection.execute(
+            "SELECT header FROM files WHERE path = ?", (str(file_path),)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    @staticmethod
+    def _in_project(project_folder: Path) -> tuple[str, list]:
+        """
+        SQL condition (and its parameters) for files in project_folder. The prefix ends
+        with the separator, so a sibling folder with a longer name (project2) is not in it.
+        """
+        prefix = str(project_folder) + os.sep
+        params = [str(project_folder), len(prefix), prefix]
+        return "(folder = ? OR substr(folder, 1, ?) = ?)", params
+
+    @staticmethod
+    def _upsert(file_path, header_dict, stat=None):
+        """SQL statement and parameters to insert or replace a file"""
+        stat = file_path.stat() if stat is None else stat
+        values = [
+            str(file_path),
+            str(file_path.parent),
+            file_path.name,
+            stat.st_mtime,
+            stat.st_size,
+            *(header_dict.get(key) for key in CATALOG_COLUMNS),
+            json.dumps(header_dict, default=str),
+        ]
+        return f"INSERT OR REPLACE INTO files VALUES ({', '.join('?' * len(values))})", values
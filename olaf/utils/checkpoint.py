@@ -0,0 +1,103 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+# Statuses of a unit: started and not (yet) finished, e.g. when the run crashed, and the
+# outcomes. Only "done" units are skipped.
+STATUSES = ("running", "done", "failed")
+
+
+class CheckpointLog:
+    def __init__(self, db_path: Path) -> None:
+        """
+        Durable log of the completed units of olaf runs, in a SQLite database, so a rerun
+        after a crash or a failure only runs what is left. A unit is one stage for one
+        experiment (or "project" for the project stages) with a hash of its parameters
+        and input files; when either changes, the unit is new and runs again. A done unit
+        also runs again when one of the output files it wrote was deleted since.
+        Every change is committed (and synced to disk) before the run continues.
+        Args:
+            db_path: Path of the SQLite database file, created if it doesn't exist
+        """
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute("PRAGMA synchronous = FULL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS units (experiment TEXT, stage TEXT, "
+                "param_hash TEXT, status TEXT, started REAL, finished REAL, seconds REAL, "
+                "error TEXT, outputs TEXT, PRIMARY KEY (experiment, stage, param_hash))"
+            )
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(units)")]
+            if "outputs" not in columns:  # logs created before the outputs were recorded
+                self.connection.execute("ALTER TABLE units ADD COLUMN outputs TEXT")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def is_done(self, experiment: str, stage: str, param_hash: str) -> bool:
+        """True if the unit finished successfully before, and its output files still exist"""
+        row = self.connection.execute(
+            "SELECT status, outputs FROM units "
+            "WHERE experiment = ? AND stage = ? AND param_hash = ?",
+            (experiment, stage, param_hash),
+        ).fetchone()
+        if row is None or row[0] != "done":
+            return False
+        outputs = json.loads(row[1]) if row[1] else []
+        return all((self.db_path.parent / output).exists() for output in outputs)
+
+    def start(self, experiment: str, stage: str, param_hash: str) -> None:
+        """Record that a unit started; it stays "running" if the run doesn't get to finish"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO units (experiment, stage, param_hash, status, "
+                "started) VALUES (?, ?, ?, 'running', ?)",
+                (experiment, stage, param_hash, time.time()),
+            )
+
+    def finish(
+        self,
+        experiment: str,
+        stage: str,
+        param_hash: str,
+        seconds: float,
+        error: str | None = None,
+        outputs=(),
+    ) -> None:
+        """
+        Mark a unit as done, or as failed with the error message.
+        Args:
+            outputs: Paths of the files the unit wrote; stored relative to the folder of the
+            database when they are in it, so the log still holds when the folder moves
+        """
+        outputs = [
+            str(Path(output).relative_to(self.db_path.parent))
+            if Path(output).is_relative_to(self.db_path.parent)
+            else str(output)
+            for output in outputs
+        ]
+        with self.connection:
+            self.connection.execute(
+                "UPDATE units SET status = ?, finished = ?, seconds = ?, error = ?, outputs = ? "
+                "WHERE experiment = ? AND stage = ? AND param_hash = ?",
+                (
+                    "failed" if error else "done",
+                    time.time(),
+                    seconds,
+                    error,
+                    json.dumps(outputs),
+                    experiment,
+                    stage,
+                    param_hash,
+                ),
+            )
+
+    def counts(self) -> dict:
+        """Number of units per status"""
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(
+            self.connection.execute("SELECT status, COUNT(*) FROM units GROUP BY status").fetchall()
+        )
+        return counts
@@ -1,9 +1,56 @@
+import logging
+import sys
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
-from olaf.utils.path_utils import find_latest_file
+from olaf.utils.path_utils import find_latest_file, write_new_version
+from olaf.utils.time_utils import parse_dat_dates, parse_dat_timestamps
+from olaf.utils.tracing import count, span
+
+logger = logging.getLogger(__name__)
+
+# Column with the Date and Time of a .dat file in one datetime64[ns] value
+TIMESTAMP_COL = "Timestamp"
+
+# Types of the .dat columns when only some columns are loaded (usecols): the number of
+# frozen wells fits in uint8, and the picture names repeat for every row between two
+# pictures. Avg_Temp stays float64: create_temp_csv compares it to band edges 0.01 degC
+# apart, and float32 would move values that are exactly on an edge. A file with an empty
+# sample cell is read again with the nullable UInt8 (see dat_dtypes), which is a few times
+# slower to parse, so it is not the default.
+DAT_DTYPES = {"Avg_Temp": "float64", "TC_1": "float32", "TC_2": "float32", "Picture": "category"}
+
+
+def dat_dtypes(columns, nullable: bool = False) -> dict:
+    """
+    Types to load the given .dat columns with (see DAT_DTYPES). With nullable, the sample
+    columns are UInt8 instead of uint8, so they can hold empty cells (as NA).
+    """
+    sample_dtype = "UInt8" if nullable else "uint8"
+    return {
+        column: sample_dtype if column.startswith("Sample_") else DAT_DTYPES[column]
+        for column in columns
+        if column.startswith("Sample_") or column in DAT_DTYPES
+    }
+
+
+def _default_type_bytes(column: pd.Series) -> int:
+    """
+    Estimated memory of column at the default read_csv types: 8 bytes per number or date,
+    and a pointer plus a Python object (a string, or NaN for an empty cell) per row for
+    text. For a categorical the object sizes are taken from its categories, so the column
+    is never converted to strings.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = [*column.cat.categories, np.nan]  # code -1 is NaN, the last one
+        sizes = np.array([sys.getsizeof(c) for c in categories], dtype=np.int64)
+        return int(8 * len(column) + sizes[column.cat.codes.to_numpy()].sum())
+    if column.dtype == object:
+        return int(column.memory_usage(deep=True, index=False))
+    return 8 * len(column)
 
 
 class DataHandler:
@@ -16,12 +63,20 @@ class DataHandler:
 
         self.folder_path = folder_path
         self.num_samples = num_samples
+        # files written by save_to_new_file (and the plots of subclasses)
+        self.saved_files: list[Path] = []
+        if kwargs.get("data") is not None:  # data that is already loaded, e.g. a live run
+            # data_file: the file the data was read from, if any (e.g. the live .dat)
+            self.data_file, self.data = kwargs.get("data_file"), kwargs["data"]
+            return
         self.data_file, self.data = self.get_data_file(
             suffix=kwargs["suffix"],
             includes=kwargs["includes"],
             excludes=kwargs["excludes"],
             date_col=kwargs["date_col"],
             sep=kwargs["sep"],
+            usecols=kwargs.get("usecols"),
+            chunksize=kwargs.get("chunksize"),
         )
 
         return
@@ -33,37 +88,50 @@ class DataHandler:
         suffix: str = ".dat",
         date_col: str = "Time",
         sep: str = "\t",
+        usecols: tuple | None = None,
+        chunksize: int | None = None,
     ) -> tuple[Any, Any]:
         """
         Load a file with a given suffix (default: .dat) from the Project folder.
         Arguments to exclude files can be passed as a list to the "excludes" parameter.
         Because of pandas loading, the Date and Time in column "Time" are split in two
         Different columns and renamed to Date and Time respectively.
+        The dates are parsed with parse_dat_dates, and a file with Date and Time (an
+        instrument or a reviewed .dat file) also gets them in one datetime64[ns] column,
+        Timestamp (see parse_dat_timestamps). save_to_new_file leaves it out again.
         It also adds a column to capture changes to the number of frozen wells.
         The function returns the file path and the data as a pandas DataFrame.
         Args:
             suffix: suffix of the file to load (default: .dat)
             includes: combination of strings to include in the file name (default: None)
             excludes: combination of strings to exclude from the file name (default: None)
-            date_col: column name for the date (or time) column (default: "Time")
+            date_col: column name for the date column, None to not parse dates (default:
+            "Time"). In reviewed files the dates are in Date, whatever date_col is.
             sep: separator for the file to load (default: tab-separated)
+            usecols: only load these columns, with the types of dat_dtypes, e.g. the
+            temperature and Sample_0 to Sample_{num_samples - 1} (default: all columns
+            with the types pandas infers)
+            chunksize: with usecols, don't load the file (the data is None), but read it
+            with read_chunks in blocks of this many rows (default: load all rows)
         Returns:
             tuple with the file path and the data as a pandas DataFrame
         """
-        if excludes or includes:
-            files = [
-                file
-                for file in self.folder_path.iterdir()
-                if file.suffix == suffix
-                and all(name in file.name for name in includes)
-                and not any(excl in file.name for excl in excludes)
-            ]
-        else:
-            files = [
-                file
-                for file in self.folder_path.iterdir()
-                if file.suffix == suffix and all(name in file.name for name in includes)
-            ]
+        with span("discover", folder=str(self.folder_path)):
+            if excludes or includes:
+                files = [
+                    file
+                    for file in self.folder_path.iterdir()
+                    if file.suffix == suffix
+                    and all(name in file.name for name in includes)
+                    and not any(excl in file.name for excl in excludes)
+                ]
+            else:
+                files = [
+                    file
+                    for file in self.folder_path.iterdir()
+                    if file.suffix == suffix and all(name in file.name for name in includes)
+                ]
+            count("files", len(files))
         if not files:
             return (
                 None,
@@ -78,21 +146,126 @@ class DataHandler:
         else:  # if only one, pick that one
             data_file = files[0]
 
-        if date_col:
-            data = pd.read_csv(data_file, sep=sep, parse_dates=[date_col], index_col=False)
-        else:
+        if usecols is not None and (date_col in usecols or "Date" in usecols):
+            # the header tells which of the loaded columns has the dates
+            header = pd.read_csv(data_file, sep=sep, nrows=0, index_col=False).columns
+            date_col = self._date_column(header, date_col)
+        if usecols is not None and chunksize:
+            self._chunk_options = (usecols, date_col, sep, chunksize)
+            return data_file, None
+        if usecols is not None:
+            with span("parse", file=data_file.name):
+                data = self._read_columns(data_file, usecols, date_col, sep)
+            if data.empty:
+                raise FileNotFoundError("No .dat file found in the folder")
+            return data_file, data
+
+        with span("parse", file=data_file.name):
             data = pd.read_csv(data_file, sep=sep, index_col=False)
-        # If original .dat file, some changes are needed in this if statement
-        if "Time" in data.columns and "Unnamed: 1" in data.columns and date_col == "Time":
-            # rename automatically split datetime column
-            data.rename(columns={"Time": "Date", "Unnamed: 1": "Time"}, inplace=True)
-            # Add a column to capture changes to the number of frozen wells
-            data["changes"] = [[0] * self.num_samples for _ in range(len(data))]
+            date_column = self._date_column(data.columns, date_col)
+            if date_column in data.columns:
+                data[date_column] = parse_dat_dates(data[date_column])
+            # If original .dat file, some changes are needed in this if statement
+            if "Time" in data.columns and "Unnamed: 1" in data.columns and date_col == "Time":
+                # rename automatically split datetime column
+                data.rename(columns={"Time": "Date", "Unnamed: 1": "Time"}, inplace=True)
+                # Add a column to capture changes to the number of frozen wells
+                data["changes"] = [[0] * self.num_samples for _ in range(len(data))]
+            if date_column and "Date" in data.columns and "Time" in data.columns:
+                data[TIMESTAMP_COL] = parse_dat_timestamps(data["Date"], data["Time"])
+            count("rows", len(data))
         if data.empty or data_file.name == "":
             raise FileNotFoundError("No .dat file found in the folder")
 
         return data_file, data
 
+    @staticmethod
+    def _date_column(columns, date_col: str | None) -> str | None:
+        """
+        Column with the dates of a file with these columns: Date in reviewed files, where
+        Time has the times of day, else date_col (Time in instrument files, before the
+        rename). None if date_col is None.
+        """
+        if not date_col:
+            return None
+        return "Date" if "Date" in columns else date_col
+
+    @staticmethod
+    def _read_columns(data_file: Path, usecols, date_col, sep) -> pd.DataFrame:
+        """
+        Load only usecols of a file, with the types of dat_dtypes, and log the memory
+        this saves compared to loading those columns with the default types.
+        """
+        usecols = list(usecols)
+        options = {"sep": sep, "usecols": usecols, "index_col": False}
+        try:
+            data = pd.read_csv(data_file, dtype=dat_dtypes(usecols), **options)[usecols]
+        except ValueError:  # an empty sample cell, which uint8 can't hold
+            data = pd.read_csv(data_file, dtype=dat_dtypes(usecols, True), **options)[usecols]
+        if date_col in usecols:
+            data[date_col] = parse_dat_dates(data[date_col])
+        count("rows", len(data))
+        n_bytes = data.memory_usage(deep=True, index=False).sum()
+        default_bytes = sum(_default_type_bytes(data[column]) for column in usecols)
+        count("bytes_saved", int(default_bytes - n_bytes))
+        logger.info(
+            "%s: loaded %d columns, %.2f MB instead of %.2f MB at the default types",
+            data_file.name,
+            len(usecols),
+            n_bytes / 1e6,
+            default_bytes / 1e6,
+        )
+        return data
+
+    def read_chunks(self):
+        """
+        Blocks of chunksize rows of the usecols of the data file, when it was not loaded
+        because of chunksize (see get_data_file). Every call reads the file from the start
+        again, so the data can be gone through more than once.
+        """
+        if self.data_file is None or not hasattr(self, "_chunk_options"):
+            raise ValueError("No data file to read in chunks (see get_data_file chunksize)")
+        return self._read_chunks(self.data_file, *self._chunk_options)
+
+    @staticmethod
+    def _read_chunks(data_file: Path, usecols, date_col, sep, chunksize):
+        """
+        Blocks of chunksize rows of usecols of a file, with the types of dat_dtypes. The
+        file is only read while iterating, so at most one block is in memory. At a block
+        with an empty sample cell, the rest of the file is read with the nullable types.
+        """
+        usecols = list(usecols)
+        n_rows = 0  # rows yielded so far, skipped when the file is opened again
+        nullable = False
+        while True:
+            start = n_rows
+            with pd.read_csv(
+                data_file,
+                sep=sep,
+                usecols=usecols,
+                dtype=dat_dtypes(usecols, nullable),
+                index_col=False,
+                chunksize=chunksize,
+                skiprows=range(1, n_rows + 1),
+            ) as reader:
+                while True:
+                    try:
+                        chunk = next(reader)
+                    except StopIteration:
+                        return
+                    except ValueError:  # an empty sample cell, which uint8 can't hold
+                        if nullable:
+                            raise
+                        nullable = True
+                        break
+                    chunk.index += start  # row numbers in the file, as in one pass
+                    if date_col in usecols:
+                        chunk[date_col] = parse_dat_dates(chunk[date_col])
+                    count("rows", len(chunk))
+                    count("chunks")
+                    n_rows += len(chunk)
+                    yield chunk[usecols]
+
     def save_to_new_file(
         self,
         save_data: pd.DataFrame | None = None,
@@ -108,7 +281,8 @@ class DataHandler:
         to create a unique filename.
 
         Args:
-            save_data: Pandas DataFrame to save. If None, uses self.data
+            save_data: Pandas DataFrame to save. If None, uses self.data without the
+            Timestamp column that loading added, so the file keeps the layout of the .dat
             save_path: Path to save the file to. If None, uses self.data_file
             prefix: String to add to the start of the file name
             sep: Separator for CSV file (default: comma)
@@ -123,9 +297,9 @@ class DataHandler:
         """
         # Validate inputs
         if save_data is None:
-            if not hasattr(self, "data"):
-                raise ValueError("No data provided and self.data not available")
-            save_data = self.data
+            if getattr(self, "data", None) is None:
+                raise ValueError("No data provided and self.data not available (or chunked)")
+            save_data = self.data.drop(columns=TIMESTAMP_COL, errors="ignore")
 
         if save_path is None:
             if not hasattr(self, "data_file"):
@@ -135,30 +309,22 @@ class DataHandler:
         if not isinstance(save_path, Path):
             raise TypeError("save_path must be a Path object")
 
-        # Create the initial save path with prefix
+        # Create the initial save path with prefix; write_new_version adds a number to
+        # the name if it already exists
         save_path = save_path.parent / f"{prefix}_{save_path.name}"
-        save_name_stem = save_path.stem  # Get the stem of the file before numbers are added to it
 
-        # Find a unique filename
-        counter = 1
-        while save_path.exists():
-            save_path = save_path.parent / f"{save_name_stem}({counter}){save_path.suffix}"
-            counter += 1
+        def write(f, _):
+            if header:
+                if isinstance(header, dict):
+                    for key, value in header.items():
+                        f.write(f"{key} = {value}\n")
+                else:
+                    f.write(f"{header}\n")
+            save_data.to_csv(f, sep=sep, index=False, lineterminator="\n")
 
         try:
-            # Ensure the parent directory exists
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-
-            # Save the data
-            with open(save_path, "w") as f:
-                if header:
-                    if isinstance(header, dict):
-                        for key, value in header.items():
-                            f.write(f"{key} = {value}\n")
-                    else:
-                        f.write(f"{header}\n")
-                save_data.to_csv(f, sep=sep, index=False, lineterminator="\n")
-            return save_path
-
+            save_file = write_new_version(save_path, write)
         except OSError as e:
             raise OSError(f"Error saving file to {save_path}: {str(e)}")
+        self.saved_files.append(save_file)
+        return save_file
@@ -1,7 +1,19 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
 
+from olaf.utils.tracing import count, span
+
+logger = logging.getLogger(__name__)
+
+# Threads for read_many: reading many small files is bound by the latency of the
+# (network) file system, not by the CPU, so more threads than cores help
+READ_THREADS = 16
+
 
 def read_with_flexible_header(
     file_path: Path,
@@ -9,24 +21,80 @@ def read_with_flexible_header(
     max_rows: int = 20,
 ):
     """ """
-    header_found = False
+    with span("parse", file=file_path.name):
+        header_lines, data = _read_with_flexible_header(file_path, expected_columns)
+        count("rows", len(data))
+    return header_lines, data
+
+
+def _read_with_flexible_header(file_path, expected_columns):
+    # The file is read once; the header lines and the data are parsed from that text
+    with open(file_path, "r") as f:
+        text = f.read()
+    header_lines = []
+    start = 0  # position of the column names in text
+    while True:
+        end = text.find("\n", start)
+        line = text[start:] if end == -1 else text[start:end]
+        if tuple(line.strip().split(",")) == expected_columns:
+            break
+        if end == -1:  # end of file: parse all of it, like pd.read_csv(file_path)
+            if line:
+                header_lines.append(line.strip())
+            logger.warning("No columns %s found in %s", expected_columns, file_path)
+            start = 0
+            break
+        header_lines.append(line.strip())
+        start = end + 1
+
+    return header_lines, pd.read_csv(io.StringIO(text[start:]))
+
+
+def read_many(
+    file_paths, reader=read_with_flexible_header, max_workers: int | None = None, **kwargs
+) -> list:
+    """
+    Read many files concurrently with a thread pool, so the waiting on the file system
+    overlaps. The results are in the order of file_paths, whatever order the reads finish
+    in. An exception in one of the reads is raised here.
+    Args:
+        file_paths: Paths of the files
+        reader: function to read one file (default: read_with_flexible_header)
+        max_workers: number of threads (default: READ_THREADS)
+        **kwargs: keyword arguments for reader, e.g. expected_columns
+
+    Returns:
+        list with the result of reader for every file
+    """
+    file_paths = list(file_paths)
+    read = partial(reader, **kwargs)
+    if len(file_paths) < 2 or max_workers == 1:
+        return [read(file) for file in file_paths]
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers or READ_THREADS, len(file_paths))
+    ) as executor:
+        return list(executor.map(read, file_paths))
+
+
+def read_header(file_path: Path, max_rows: int = 50) -> list[str]:
+    """
+    Read only the "key = value" header lines at the top of a file, without parsing the
+    data below it.
+    Args:
+        file_path: Path of the file
+        max_rows: maximum number of lines to read (default: 50)
+
+    Returns:
+        list with the header lines
+    """
     header_lines = []
-    i = 0
     with open(file_path, "r") as f:
-        skiprows = 0
-        while not header_found:
+        for _ in range(max_rows):
             line = f.readline()
-            if not line:  # end of file
-                print(f"No columns {expected_columns} found in {file_path}")
+            if " = " not in line:  # end of file or start of the data
                 break
-            elif tuple(line.strip().split(",")) == expected_columns:
-                skiprows = i
-                header_found = True
-            else:
-                header_lines.append(line.strip())
-            i += 1
-
-    return header_lines, pd.read_csv(file_path, skiprows=skiprows)
+            header_lines.append(line.strip())
+    return header_lines
 
 
 def header_to_dict(header_lines):
@@ -35,13 +103,15 @@ def header_to_dict(header_lines):
         header_lines = header_lines.splitlines()
     header_dict = {}
     for line in header_lines:
+        if not line.strip():
+            continue
         if " = " in line:
             key, value = line.split(" = ", 1)
             # Keep track of other header values (use the last file's values)
             header_dict[key] = value
         else:
             # Handle lines that don't match the expected format
-            print(f"Unexpected header line format: {line}")
+            logger.warning("Unexpected header line format: %s", line)
     return header_dict
 
 
@@ -0,0 +1,177 @@
+import sqlite3
+import time
+from pathlib import Path
+
+# Statuses of a job: waiting, being processed, and the outcomes. "skipped" marks inputs
+# that were already processed before the watcher was started.
+STATUSES = ("queued", "running", "done", "failed", "skipped")
+# A failed job is queued again up to MAX_ATTEMPTS attempts in total, RETRY_DELAY seconds
+# after the first failure and twice as long after every next one, for errors that go away
+# (e.g. a file that was still locked or a drive that was briefly offline)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60
+# Condition of the latest job of a target; older jobs are superseded by newer inputs
+_LATEST = (
+    "NOT EXISTS (SELECT 1 FROM jobs AS newer "
+    "WHERE newer.target = jobs.target AND newer.id > jobs.id)"
+)
+
+
+class JobQueue:
+    def __init__(
+        self, db_path: Path, max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY
+    ) -> None:
+        """
+        Persistent local queue of processing jobs, in a SQLite database, so nothing is
+        lost or processed twice when the watcher is stopped and started again.
+        A job is a target (an experiment, or "project" for the project stages) with a
+        hash of its input files. There is at most one job per target and input hash, so
+        enqueueing inputs that were processed before does nothing. Failed jobs are retried
+        with a backoff (see retry_failed) or on request (see requeue_failed).
+        Args:
+            db_path: Path of the SQLite database file, created if it doesn't exist
+            max_attempts: number of times a job is started before it stays failed
+            retry_delay: seconds before the first retry, doubled for every next one
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, kind TEXT, "
+                "target TEXT, input_hash TEXT, status TEXT, queued REAL, started REAL, "
+                "finished REAL, error TEXT, UNIQUE (target, input_hash))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(jobs)")]
+            if "attempts" not in columns:  # queues created before jobs were retried
+                self.connection.execute(
+                    "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def enqueue(self, kind: str, target: str, input_hash: str, status: str = "queued") -> bool:
+        """
+        Add a job, unless the target was already queued or processed with these inputs.
+        A queued job of the target with older inputs is replaced, as it would only be
+        processed to be overwritten.
+        Args:
+            kind: "experiment" or "project"
+            target: experiment name, or "project"
+            input_hash: hash of the input files of the target
+            status: "queued", or "skipped" to only record the inputs as processed
+
+        Returns:
+            True if a job was added
+        """
+        with self.connection:
+            exists = self.connection.execute(
+                "SELECT 1 FROM jobs WHERE target = ? AND input_hash = ?", (target, input_hash)
+            ).fetchone()
+            if exists:
+                return False
+            self.connection.execute(
+                "DELETE FROM jobs WHERE target = ? AND status = 'queued'", (target,)
+            )
+            self.connection.execute(
+                "INSERT INTO jobs (kind, target, input_hash, status, queued) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, target, input_hash, status, time.time()),
+            )
+        return True
+
+    def queued(self) -> list[tuple[int, str, str]]:
+        """(id, kind, target) of the queued jobs, oldest first"""
+        return self.connection.execute(
+            "SELECT id, kind, target FROM jobs WHERE status = 'queued' ORDER BY id"
+        ).fetchall()
+
+    def start(self, job_id: int) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (time.time(), job_id),
+            )
+
+    def finish(self, job_id: int, error: str | None = None) -> None:
+        """Mark a job as done, or as failed with the error message"""
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ?",
+                ("failed" if error else "done", time.time(), error, job_id),
+            )
+
+    def requeue_running(self) -> int:
+        """
+        Put jobs that were running when the watcher stopped back in the queue. The stages
+        write new file versions instead of overwriting, so running them again is safe.
+        The interrupted attempt doesn't count.
+        Returns:
+            number of requeued jobs
+        """
+        with self.connection:
+            return self.connection.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL, attempts = attempts - 1 "
+                "WHERE status = 'running'"
+            ).rowcount
+
+    def retry_failed(self) -> int:
+        """
+        Queue failed jobs again whose backoff has passed: retry_delay seconds after the
+        first failure, doubled after every next one, until max_attempts. Jobs of a target
+        with newer inputs are not retried.
+        Returns:
+            number of requeued jobs
+        """
+        with self.connection:
+            return self.connection.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'failed' AND attempts < ? "
+                f"AND finished + ? * (1 << (attempts - 1)) <= ? AND {_LATEST}",
+                (self.max_attempts, self.retry_delay, time.time()),
+            ).rowcount
+
+    def requeue_failed(self) -> int:
+        """
+        Queue all failed jobs again with max_attempts new attempts, e.g. after fixing
+        what made them fail. Jobs of a target with newer inputs are not requeued.
+        Returns:
+            number of requeued jobs
+        """
+        with self.connection:
+            return self.connection.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0 "
+                f"WHERE status = 'failed' AND {_LATEST}"
+            ).rowcount
+
+    def counts(self) -> dict:
+        """Number of jobs per status"""
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(
+            self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        )
+        return counts
+
+    def jobs(self, statuses=STATUSES, limit: int = 20) -> list[dict]:
+        """The latest jobs with one of statuses, newest first"""
+        rows = self.connection.execute(
+            "SELECT id, kind, target, status, queued, started, finished, error, attempts "
+            f"FROM jobs WHERE status IN ({', '.join('?' * len(statuses))}) "
+            "ORDER BY id DESC LIMIT ?",
+            (*statuses, limit),
+        )
+        columns = (
+            "id",
+            "kind",
+            "target",
+            "status",
+            "queued",
+            "started",
+            "finished",
+            "error",
+            "attempts",
+        )
+        return [dict(zip(columns, row)) for row in rows]
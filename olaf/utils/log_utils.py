@@ -0,0 +1,29 @@
+import logging
+import sys
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+LOG_DATE_FORMAT = "%H:%M:%S"
+
+
+def configure_logging(level: int = logging.INFO, stream=None) -> logging.Logger:
+    """
+    Send the log messages of all olaf modules to stream (default: stderr). The processing
+    classes log per-experiment summaries at INFO, problems at WARNING and per-row details
+    at DEBUG. Calling this again replaces the handler, so the level can be changed.
+    Args:
+        level: logging.DEBUG, logging.INFO, or logging.WARNING for a quiet run
+        stream: stream to write to (default: sys.stderr)
+
+    Returns:
+        the "olaf" logger
+    """
+    logger = logging.getLogger("olaf")
+    for handler in list(logger.handlers):
+        if getattr(handler, "_olaf_handler", False):
+            logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    handler._olaf_handler = True
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
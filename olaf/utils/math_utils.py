@@ -1,5 +1,9 @@
+from math import erf, sqrt
+
 import numpy as np
 
+from olaf.CONSTANTS import VOL_WELL, Z
+
 
 def inps_ml_to_L(inps_col, vol_air_filt, prop_filter_used, vol_susp):
     return (inps_col * vol_susp) / (vol_air_filt * prop_filter_used)
@@ -13,3 +17,61 @@ def rms(x):
     return np.sqrt(np.mean(np.square(x)))
 
 
+def simulate_inps_ml(
+    inps_ml, dilution, n_wells, n_draws: int, vol_well: float = VOL_WELL, rng=None
+) -> np.ndarray:
+    """
+    Draw binomial realizations of the number of frozen wells behind INPs/mL values and
+    convert them back to INPs/mL, all at once as a (draws x temps) array.
+    The mean number of INPs per well follows from inverting the formula used in
+    GraphDataCSV.convert_INPs_L: lambda = INPs/mL * (vol_well / 1000) / dilution.
+    Every well freezes with probability 1 - exp(-lambda) (Poisson), so the number of
+    frozen wells is binomially distributed. Fully frozen draws are capped at n_wells - 1,
+    because they have no finite INP estimate.
+    Args:
+        inps_ml: INPs/mL per temperature; array-like
+        dilution: dilution factor per temperature; single value or array-like
+        n_wells: number of wells per temperature; single value or array-like
+        n_draws: number of realizations to draw
+        vol_well: volume of each well in microL (default: VOL_WELL)
+        rng: numpy Generator (default: a new unseeded generator)
+
+    Returns:
+        array with shape (n_draws, len(inps_ml)) with INPs/mL; NaN where the input
+        or the dilution is not finite
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    inps_ml = np.asarray(inps_ml, dtype=float)
+    dilution = np.broadcast_to(np.asarray(dilution, dtype=float), inps_ml.shape)
+    n_wells = np.broadcast_to(np.asarray(n_wells, dtype=np.int64), inps_ml.shape)
+
+    valid = np.isfinite(inps_ml) & np.isfinite(dilution) & (dilution > 0)
+    safe_dilution = np.where(valid, dilution, 1.0)
+    mean_per_well = np.where(valid, np.clip(inps_ml, 0, None), 0) * (vol_well / 1000)
+    p_frozen = -np.expm1(-mean_per_well / safe_dilution)
+
+    n_frozen = rng.binomial(n_wells, p_frozen, size=(n_draws, inps_ml.size))
+    n_frozen = np.minimum(n_frozen, n_wells - 1)
+    draws = -np.log1p(-n_frozen / n_wells) / (vol_well / 1000) * safe_dilution
+    draws[:, ~valid] = np.nan
+    return draws
+
+
+def percentile_ci(draws: np.ndarray, central, z: float = Z) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile confidence intervals from a (draws x temps) array, with the same coverage
+    as the normal z-value used elsewhere (default: 95%).
+    Like the rest of the package, the intervals are returned as distances from the
+    central value, so they can be used as lower_CI and upper_CI columns directly.
+    Args:
+        draws: array with shape (n_draws, n_temps)
+        central: central estimate per temperature; array-like
+        z: z-value of the normal distribution, float
+
+    Returns:
+        tuple with the lower and upper confidence intervals
+    """
+    tail = 100 * 0.5 * (1 + erf(-z / sqrt(2)))
+    lower_limit, upper_limit = np.percentile(draws, [tail, 100 - tail], axis=0)
+    central = np.asarray(central, dtype=float)
+    return np.maximum(central - lower_limit, 0), np.maximum(upper_limit - central, 0)
@@ -0,0 +1,202 @@
+"""
+Local mirror of a project folder on a slow shared drive (e.g. Google Drive).
+
+On such a drive every directory listing, stat and small file open takes many
+milliseconds, and the stages do a lot of them. ProjectMirror copies only the files the
+stages read into a local cache folder, and only when their modification time or size
+changed since the last pull. The stages then run on the cache, and the files they wrote
+are copied back to the drive in one batch:
+
+    with ProjectMirror(Path("G:/Shared drives/..."), Path.home() / "olaf_cache") as local:
+        Plots(local, ...).plot_data()
+
+or olaf all experiments.toml --mirror ~/olaf_cache. The state of the last sync is kept in
+.olaf_mirror.json in the cache folder, so a later run only copies what changed.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from olaf.utils.path_utils import atomic_write_bytes
+from olaf.utils.tracing import count, span
+
+# .csv files the stages read: their own outputs, and those of the stages before them
+MIRRORED_PREFIXES = ("INPs_L", "frozen_at_temp", "blank_corrected", "combined_blank")
+MANIFEST_NAME = ".olaf_mirror.json"
+# Files are copied in parallel, as the time per file is mostly waiting on the drive
+COPY_THREADS = 8
+
+
+def is_mirrored(name: str) -> bool:
+    """Whether a file in a project folder is an input of one of the stages"""
+    if name.startswith("."):
+        return False
+    if name.endswith(".dat"):
+        return "reviewed" in name
+    if name.endswith(".csv"):
+        return name.startswith(MIRRORED_PREFIXES)
+    return name.endswith(".toml")
+
+
+def _copy(source: Path, target: Path) -> None:
+    """Copy a file with its modification time, through a temporary file next to target"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copy2(source, tmp_name)
+        os.replace(tmp_name, target)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class ProjectMirror:
+    def __init__(self, remote_folder: Path, cache_folder: Path, latency: float = 0.0) -> None:
+        """
+        Args:
+            remote_folder: project folder on the shared drive
+            cache_folder: local folder to mirror it to, created if it doesn't exist
+            latency: seconds to wait before every file system call on remote_folder, to
+            test and benchmark against a local folder as if it were a slow drive
+        """
+        self.remote_folder = remote_folder
+        self.cache_folder = cache_folder
+        self.latency = latency
+        self.remote_calls = 0
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        manifest_file = cache_folder / MANIFEST_NAME
+        manifest = json.loads(manifest_file.read_text()) if manifest_file.exists() else {}
+        # relative path: [mtime_ns, size] of the remote files when they were copied, and
+        # of all local files at the last pull or push
+        self.remote_state = manifest.get("remote", {})
+        self.local_state = manifest.get("local", {})
+
+    def __enter__(self) -> Path:
+        self.pull()
+        return self.cache_folder
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        if exc_type is None:  # don't copy back the output of a failed run
+            self.push()
+
+    def _remote_call(self) -> None:
+        self.remote_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _scan_remote(self) -> dict[str, list[int]]:
+        """Signature of the mirrored files in the remote folder and its subfolders"""
+        files = {}
+        folders = [(self.remote_folder, "")]
+        while folders:
+            folder, relative = folders.pop()
+            self._remote_call()
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir() and not relative:  # experiment folders
+                        folders.append((Path(entry.path), entry.name))
+                    elif entry.is_file() and is_mirrored(entry.name):
+                        self._remote_call()
+                        stat = entry.stat()
+                        files[f"{relative}/{entry.name}".lstrip("/")] = [
+                            stat.st_mtime_ns,
+                            stat.st_size,
+                        ]
+        return files
+
+    def _scan_local(self) -> dict[str, list[int]]:
+        """Signature of all files in the cache folder, except hidden ones"""
+        files = {}
+        for root, dirs, names in os.walk(self.cache_folder):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in names:
+                if name.startswith("."):
+                    continue
+                path = Path(root) / name
+                stat = path.stat()
+                files[path.relative_to(self.cache_folder).as_posix()] = [
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                ]
+        return files
+
+    def _copy_remote(self, source: Path, target: Path) -> None:
+        self._remote_call()
+        _copy(source, target)
+
+    def _save_manifest(self) -> None:
+        atomic_write_bytes(
+            self.cache_folder / MANIFEST_NAME,
+            json.dumps({"remote": self.remote_state, "local": self.local_state}).encode(),
+        )
+
+    def pull(self) -> int:
+        """
+        Bring the cache up to date with the remote folder: copy the mirrored files that
+        are new or changed, and remove cached files that were removed from the remote.
+        Returns:
+            number of copied files
+        """
+        with span("mirror.pull", remote=str(self.remote_folder)):
+            remote = self._scan_remote()
+            changed = [
+                relative
+                for relative, signature in remote.items()
+                if self.remote_state.get(relative) != signature
+                or not (self.cache_folder / relative).exists()
+            ]
+            with ThreadPoolExecutor(COPY_THREADS) as executor:
+                list(
+                    executor.map(
+                        lambda relative: self._copy_remote(
+                            self.remote_folder / relative, self.cache_folder / relative
+                        ),
+                        changed,
+                    )
+                )
+            for relative in set(self.remote_state) - set(remote):
+                (self.cache_folder / relative).unlink(missing_ok=True)
+            count("mirror.pulled", len(changed))
+            self.remote_state = remote
+            self.local_state = self._scan_local()
+            self._save_manifest()
+        return len(changed)
+
+    def push(self) -> list[Path]:
+        """
+        Copy the files that were added or changed in the cache since the last pull or
+        push back to the remote folder.
+        Returns:
+            list of the remote Paths that were written
+        """
+        with span("mirror.push", remote=str(self.remote_folder)):
+            local = self._scan_local()
+            changed = [
+                relative
+                for relative, signature in local.items()
+                if self.local_state.get(relative) != signature
+            ]
+            with ThreadPoolExecutor(COPY_THREADS) as executor:
+                list(
+                    executor.map(
+                        lambda relative: self._copy_remote(
+                            self.cache_folder / relative, self.remote_folder / relative
+                        ),
+                        changed,
+                    )
+                )
+            # copy2 kept the modification times, so (if the drive keeps them exactly) the
+            # next pull doesn't copy these back
+            for relative in changed:
+                if is_mirrored(Path(relative).name) and relative.count("/") <= 1:
+                    self.remote_state[relative] = local[relative]
+            count("mirror.pushed", len(changed))
+            self.local_state = local
+            self._save_manifest()
+        return [self.remote_folder / relative for relative in changed]
@@ -1,8 +1,27 @@
+import os
 import re
+import threading
+import time
+import uuid
 from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from datetime import datetime
+from pathlib import Path
+from typing import TextIO
 
 from olaf.CONSTANTS import DATE_PATTERN
+from olaf.utils.tracing import span
+
+# name(N) of a version written by write_new_version
+_VERSION_PATTERN = re.compile(r"(.*)\((\d+)\)")
+# folder: (modification time of the folder, {(stem, suffix): next version number})
+# (see _next_version)
+_versions: dict[Path, tuple[int, dict[tuple[str, str], int]]] = {}
+_versions_lock = threading.Lock()
+# seconds after which a lock file or a version reservation is taken to be left behind
+# by a crashed writer
+STALE_LOCK_SECONDS = 600
 
 
 def natural_sort_key(s: str) -> list:
@@ -58,20 +77,100 @@ def find_latest_file(file_paths):
     return latest_files[0]
 
 
-def save_df_file(clean_df, save_file, header_info, index=False):
-    counter = 0
-    output_stem = save_file.stem
-    while save_file.exists():
-        # If the file exists, append a number to the filename
+def _next_version(folder: Path, stem: str, suffix: str) -> int:
+    """
+    First version number to try for stem + suffix in folder: one more than the highest
+    version in the folder, so versions only count up and gaps left by deleted versions
+    are never filled. The counters are kept in _versions, so a new version doesn't
+    probe every existing one on a slow drive; the folder is listed again when its
+    modification time changed since the last listing or write (see _remember_version).
+    """
+    mtime = folder.stat().st_mtime_ns
+    with _versions_lock:
+        if folder not in _versions or _versions[folder][0] != mtime:
+            highest = {}
+            for name in os.listdir(folder):
+                base, extension = os.path.splitext(name)
+                match = _VERSION_PATTERN.fullmatch(base)
+                key, version = (
+                    ((match[1], extension), int(match[2])) if match else ((base, extension), 0)
+                )
+                highest[key] = max(highest.get(key, 0), version)
+            _versions[folder] = (mtime, {key: version + 1 for key, version in highest.items()})
+        return _versions[folder][1].get((stem, suffix), 0)
+
+
+def _remember_version(folder: Path, stem: str, suffix: str, version: int) -> None:
+    """
+    Count up from version in _versions after it was written, with the modification time
+    of the folder after the write, so the next version doesn't list the folder again.
+    A version another process wrote meanwhile is still found by write_new_version.
+    """
+    with _versions_lock:
+        versions = _versions.setdefault(folder, (0, {}))[1]
+        versions[(stem, suffix)] = max(versions.get((stem, suffix), 0), version + 1)
+        _versions[folder] = (folder.stat().st_mtime_ns, versions)
+
+
+def write_new_version(save_file: Path, write: Callable[[TextIO, Path], None]) -> Path:
+    """
+    Write a new version of save_file, safe for several processes writing the same name
+    at once. The name, or name(N) with a higher N, is reserved by creating the hidden
+    file .name(N).reserved with O_EXCL, so two writers never get the same one. The
+    content is written to the reserved file, which is renamed to the name once it is
+    complete, so readers never see an empty or half-written version. A reservation
+    older than STALE_LOCK_SECONDS was left by a crashed writer and is taken over.
+    N is one more than the highest version in the folder: a version that was deleted
+    is not written again, so the highest N is always the latest version.
+    Args:
+        save_file: Path of the first version, e.g. folder / "INPs_L_run.csv"
+        write: function called with the open text file and the final Path (e.g. to
+        write it in a header)
+
+    Returns:
+        Path of the written version
+    """
+    folder, stem, suffix = save_file.parent, save_file.stem, save_file.suffix
+    folder.mkdir(parents=True, exist_ok=True)
+    counter = _next_version(folder, stem, suffix)
+    while True:
+        save_file = folder / (f"{stem}({counter}){suffix}" if counter else f"{stem}{suffix}")
+        reserved = folder / f".{save_file.name}.reserved"
+        if not save_file.exists():
+            try:
+                # mode 0666 minus the umask, like open() gives a new file
+                fd = os.open(reserved, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+            except FileExistsError:
+                if _take_over_stale_file(reserved):
+                    continue
+            else:
+                # the writer that held the reservation may have renamed it just before
+                if not save_file.exists():
+                    break
+                os.close(fd)
+                reserved.unlink()
         counter += 1
-        save_file = save_file.with_name(output_stem + f"({counter})" + save_file.suffix)
+    _remember_version(folder, stem, suffix, counter)
+
+    try:
+        with span("write", file=save_file.name), os.fdopen(fd, "w") as f:
+            write(f, save_file)
+        os.replace(reserved, save_file)
+    except BaseException:
+        reserved.unlink(missing_ok=True)
+        raise
+    _remember_version(folder, stem, suffix, counter)
+    return save_file
+
 
-    with open(save_file, "w") as f:
+def save_df_file(clean_df, save_file, header_info, index=False):
+    def write(f, save_file):
         f.write(f"filename = {save_file.name}\n")
         for key, value in header_info.items():
             f.write(f"{key} = {value}\n")
         clean_df.to_csv(f, index=index, lineterminator="\n")
-    return
+
+    return write_new_version(save_file, write)
 
 
 def is_within_dates(dates, folder_name):
@@ -118,3 +217,98 @@ def sort_files_by_date(file_paths):
             number = int(number_match.group(1)) if number_match else 0
             files_by_date[date].append((file_path, number))
     return files_by_date
+
+
+def atomic_write_bytes(save_file: Path, data: bytes) -> Path:
+    """
+    Write data to save_file through a temporary file in the same folder, which is renamed
+    onto save_file once it is completely written. Readers never see a half-written file
+    and a crash leaves at most a stray .tmp file behind.
+
+    Args:
+        save_file: Path of the file to (over)write
+        data: bytes to write
+
+    Returns:
+        Path of the written file
+    """
+    tmp_file = save_file.parent / f".{save_file.name}.{uuid.uuid4().hex}.tmp"
+    # mode 0666 minus the umask, like open() gives a new file
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0)
+    fd = os.open(tmp_file, flags, 0o666)
+    try:
+        with span("write", file=save_file.name), os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_file, save_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+    return save_file
+
+
+@contextmanager
+def file_lock(lock_file: Path, timeout: float = 60.0, poll: float = 0.05) -> Iterator[Path]:
+    """
+    Hold lock_file while the block runs, so read-modify-write cycles on a shared file by
+    several processes (or threads) don't lose each other's changes. The lock is taken by
+    creating lock_file with O_EXCL, which also works on network drives, and holds a
+    token unique to this holder; it is only removed if it still holds that token.
+    A lock file older than STALE_LOCK_SECONDS is left by a crashed writer and is taken
+    over by renaming it to a unique name, so of several waiters only one removes it.
+    Args:
+        lock_file: Path of the lock file, e.g. the shared file with a .lock suffix
+        timeout: seconds to wait for the lock before raising TimeoutError
+        poll: seconds between attempts
+
+    Returns:
+        context manager that yields lock_file
+    """
+    token = f"{os.getpid()} {uuid.uuid4().hex}".encode()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _take_over_stale_file(lock_file):
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{lock_file} is held by another writer") from None
+            time.sleep(poll)
+            continue
+        with os.fdopen(fd, "wb") as f:
+            f.write(token)
+        break
+    try:
+        yield lock_file
+    finally:
+        try:
+            if lock_file.read_bytes() == token:
+                lock_file.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _take_over_stale_file(lock_file: Path) -> bool:
+    """
+    Move lock_file out of the way if it is older than STALE_LOCK_SECONDS (see file_lock,
+    and the reservations of write_new_version).
+
+    Returns:
+        whether the lock is gone (taken over or released meanwhile), so it can be retried
+    """
+    try:
+        if time.time() - lock_file.stat().st_mtime <= STALE_LOCK_SECONDS:
+            return False
+        stale_file = lock_file.with_name(f"{lock_file.name}.{uuid.uuid4().hex}.stale")
+        lock_file.rename(stale_file)
+    except FileNotFoundError:
+        return True
+    # Another waiter may have taken over the stale lock between the stat and the rename,
+    # and created a new one: that one is put back (os.link fails if a lock exists again)
+    try:
+        if time.time() - stale_file.stat().st_mtime <= STALE_LOCK_SECONDS:
+            os.link(stale_file, lock_file)
+    except OSError:
+        pass
+    stale_file.unlink(missing_ok=True)
+    return True
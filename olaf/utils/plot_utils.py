@@ -1,8 +1,14 @@
-import matplotlib.pyplot as plt
+import hashlib
+import json
+from pathlib import Path
+
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.patches import Patch
 
 from olaf.CONSTANTS import THRESHOLD_ERROR
+from olaf.utils.path_utils import atomic_write_bytes
 
 
 def plot_INPS_L(result_df, save_path, header_dict):
@@ -20,8 +26,9 @@ def plot_INPS_L(result_df, save_path, header_dict):
         save_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Plotting the INP concentrations
-    plt.figure(figsize=(10, 6))
-    plt.errorbar(
+    fig = new_figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    ax.errorbar(
         result_df["degC"][4:],
         result_df["INPS_L"][4:],
         yerr=[result_df["lower_CI"][4:], result_df["upper_CI"][4:]],
@@ -31,28 +38,28 @@ def plot_INPS_L(result_df, save_path, header_dict):
         color="darkblue",
     )
     site = header_dict["site"]
-    plt.title(
+    ax.set_title(
         f"Ice Nucleating Particles Number Concentration at {site} for "
         f"{header_dict['start_time'][:10]}"
     )
-    plt.xlabel("Temperature (degC)")
+    ax.set_xlabel("Temperature (degC)")
     if "blank" in header_dict["treatment"]:
-        plt.ylabel("INP Concentration (per filter)")
+        ax.set_ylabel("INP Concentration (per filter)")
     elif header_dict["sample_type"] != "air":
-        plt.ylabel("INP Concentration (per mL)")
+        ax.set_ylabel("INP Concentration (per mL)")
     elif "soil" in header_dict["sample_type"]:
-        plt.ylabel("INP Concentration (per g)")
+        ax.set_ylabel("INP Concentration (per g)")
     else:
-        plt.ylabel("INP Concentration (per L STP)")
-    plt.yscale("log")
-    plt.ylim(1e-4,1e4)
-    # plt.ylim(1e-4,result_df["INPS_L"].max() * 10)
-    plt.xlim(-30, 0)
-    plt.xticks(np.arange(0, -35, -5))
-    plt.gca().set_xticks(np.arange(0, -31, -1), minor=True)
-    plt.grid(True, linestyle="--", color="gray", linewidth=0.5)
-    plt.grid(True, which="major", alpha=0.5)  # Major grid lines
-    plt.grid(True, which="minor", alpha=0.1)
+        ax.set_ylabel("INP Concentration (per L STP)")
+    ax.set_yscale("log")
+    ax.set_ylim(1e-4, 1e4)
+    # ax.set_ylim(1e-4,result_df["INPS_L"].max() * 10)
+    ax.set_xlim(-30, 0)
+    ax.set_xticks(np.arange(0, -35, -5))
+    ax.set_xticks(np.arange(0, -31, -1), minor=True)
+    ax.grid(True, linestyle="--", color="gray", linewidth=0.5)
+    ax.grid(True, which="major", alpha=0.5)  # Major grid lines
+    ax.grid(True, which="minor", alpha=0.1)
     if "TBS" in site:
         legend_elements = [
             Patch(facecolor="none", edgecolor="none", label=f"Site: {site}"),
@@ -83,11 +90,10 @@ def plot_INPS_L(result_df, save_path, header_dict):
                 facecolor="none", edgecolor="none", label=f"Treatment: {header_dict['treatment']}"
             ),
         ]
-    plt.legend(
+    ax.legend(
         handles=legend_elements, markerscale=0, handlelength=0, handletextpad=0, loc="upper right"
     )
-    plt.savefig(save_path)
-    # plt.show()
+    save_figure(fig, save_path)
 
 
 def plot_blank_corrected_vs_pre_corrected_inps(
@@ -109,8 +115,9 @@ def plot_blank_corrected_vs_pre_corrected_inps(
     plot_blank_corrected_vs_pre_corrected_INPs
     """
     # Add pre-corrected data to the plot
-    plt.figure(figsize=(10, 6))
-    plt.errorbar(
+    fig = new_figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    ax.errorbar(
         df_original["degC"][4:],
         df_original["INPS_L"][4:],
         label="Pre-corrected INP Concentration",
@@ -122,7 +129,7 @@ def plot_blank_corrected_vs_pre_corrected_inps(
     # Check for -9999 in corrected data and remove before plotting
     plot_eligible_data = filter_non_error_signal(df_corrected)
     # Add blank corrected data to the plot
-    plt.errorbar(
+    ax.errorbar(
         plot_eligible_data["degC"],
         plot_eligible_data["INPS_L"],
         label="Blank corrected INP Concentration",
@@ -134,25 +141,25 @@ def plot_blank_corrected_vs_pre_corrected_inps(
     )
     # Plot formatting
     site = plot_header_info["site"]
-    plt.title(
+    ax.set_title(
         f"Ice Nucleating Particles Number Concentration at {site} for "
         f"{plot_header_info['start_time'][:10]}"
     )
-    handles, labels = plt.gca().get_legend_handles_labels()
-    plt.xlabel("Temperature (degC)")
-    plt.ylabel("INP Concentration (per L STP)")
-    plt.yscale("log")
-    plt.ylim(1e-4, 1e4)
-    # plt.ylim(
+    handles, labels = ax.get_legend_handles_labels()
+    ax.set_xlabel("Temperature (degC)")
+    ax.set_ylabel("INP Concentration (per L STP)")
+    ax.set_yscale("log")
+    ax.set_ylim(1e-4, 1e4)
+    # ax.set_ylim(
     #     df_corrected[df_corrected["lower_CI"] > 0]["lower_CI"].min() * 0.1,
     #     df_corrected["INPS_L"].max() * 3,
     # )
-    plt.xlim(-30, 0)
-    plt.xticks(np.arange(0, -35, -5))
-    plt.gca().set_xticks(np.arange(0, -31, -1), minor=True)
-    plt.grid(True, linestyle="--", color="gray", linewidth=0.5)
-    plt.grid(True, which="major", alpha=0.5)  # Major grid lines
-    plt.grid(True, which="minor", alpha=0.1)
+    ax.set_xlim(-30, 0)
+    ax.set_xticks(np.arange(0, -35, -5))
+    ax.set_xticks(np.arange(0, -31, -1), minor=True)
+    ax.grid(True, linestyle="--", color="gray", linewidth=0.5)
+    ax.grid(True, which="major", alpha=0.5)  # Major grid lines
+    ax.grid(True, which="minor", alpha=0.1)
     if "TBS" in site:
         legend_elements = [
             Patch(facecolor="none", edgecolor="none", label=f"Site: {site}"),
@@ -202,10 +209,103 @@ def plot_blank_corrected_vs_pre_corrected_inps(
             ),
         ]
     all_handles = handles + legend_elements
-    plt.legend(
+    ax.legend(
         handles=all_handles, markerscale=0, handlelength=0, handletextpad=1, loc="upper right"
     )
-    plt.savefig(save_path)
+    save_figure(fig, save_path)
+
+
+def new_figure(**fig_kwargs):
+    """
+    Create a figure on its own Agg canvas. Unlike plt.figure, the figure isn't kept by
+    pyplot, so it is freed as soon as it isn't used anymore and it works without a display.
+    Args:
+        **fig_kwargs: keyword arguments for matplotlib.figure.Figure, e.g. figsize and dpi
+
+    Returns: matplotlib Figure
+    """
+    fig = Figure(**fig_kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def save_figure(fig, save_path, **save_kwargs):
+    """
+    Save a figure made with new_figure and clear it, to release the memory of its artists.
+    Args:
+        fig: matplotlib Figure
+        save_path: path to save the figure to
+        **save_kwargs: keyword arguments for Figure.savefig, e.g. dpi and bbox_inches
+
+    Returns: save_path
+    """
+    fig.savefig(save_path, **save_kwargs)
+    fig.clear()
+    return save_path
+
+
+def content_hash(*parts):
+    """
+    sha256 hash of (nested) dicts, lists, tuples, numpy arrays and simple values, to
+    detect whether the content of a figure changed.
+    Args:
+        *parts: objects to hash
+
+    Returns: hex digest string
+    """
+    digest = hashlib.sha256()
+
+    def update(obj):
+        if isinstance(obj, np.ndarray):
+            digest.update(f"ndarray{obj.dtype}{obj.shape}".encode())
+            digest.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, dict):
+            digest.update(b"{")
+            for key in sorted(obj, key=str):
+                update(key)
+                update(obj[key])
+            digest.update(b"}")
+        elif isinstance(obj, (list, tuple)):
+            digest.update(b"[")
+            for item in obj:
+                update(item)
+            digest.update(b"]")
+        else:
+            digest.update(f"{type(obj).__name__}:{obj!r};".encode())
+
+    update(parts)
+    return digest.hexdigest()
+
+
+class PlotCache:
+    def __init__(self, plots_folder: Path) -> None:
+        """
+        Keeps track of the content hash of every saved figure in a plots folder, so
+        figures whose data and settings didn't change can be reused instead of rendered.
+        The index is stored in .plot_cache.json in the plots folder.
+        Args:
+            plots_folder: Path of the folder with the figures
+        """
+        self.plots_folder = plots_folder
+        self.index_file = plots_folder / ".plot_cache.json"
+        if self.index_file.exists():
+            self.index = json.loads(self.index_file.read_text())
+        else:
+            self.index = {}
+
+    def lookup(self, name, key):
+        """Path of the saved figure for name if its content hash equals key, else None"""
+        entry = self.index.get(name)
+        if entry and entry["key"] == key and (self.plots_folder / entry["file"]).exists():
+            return self.plots_folder / entry["file"]
+        return None
+
+    def store(self, name, key, save_file):
+        """Remember that save_file shows the content with hash key"""
+        self.index[name] = {"key": key, "file": Path(save_file).name}
+
+    def save(self):
+        atomic_write_bytes(self.index_file, json.dumps(self.index, indent=1).encode())
 
 
 def filter_non_error_signal(df_corrected):
@@ -224,6 +324,7 @@ def filter_non_error_signal(df_corrected):
     plot_eligible_data = df_corrected[~error_signal_mask]
     return plot_eligible_data
 
+
 def apply_plot_settings(ax, settings):
     """
     Apply plot settings to ax
@@ -234,89 +335,75 @@ def apply_plot_settings(ax, settings):
     Returns: none
 
     """
-    ax.grid(settings['grid']['major'])
-    ax.grid(settings['grid']['minor'])
-    ax.set_xlabel(settings['axes']['xlabel'])
-    ax.set_ylabel(settings['axes']['ylabel'])
-    ax.set_yscale(settings['axes']['yscale'])
+    ax.grid(settings["grid"]["major"])
+    ax.grid(settings["grid"]["minor"])
+    ax.set_xlabel(settings["axes"]["xlabel"])
+    ax.set_ylabel(settings["axes"]["ylabel"])
+    ax.set_yscale(settings["axes"]["yscale"])
     # Set x-axis limits
-    if 'xlim' in settings['axes']:
-        ax.set_xlim(settings['axes']['xlim'])
+    if "xlim" in settings["axes"]:
+        ax.set_xlim(settings["axes"]["xlim"])
 
     # Set y-axis limits (optional)
-    if 'ylim' in settings['axes']:
-        ax.set_ylim(settings['axes']['ylim'])
+    if "ylim" in settings["axes"]:
+        ax.set_ylim(settings["axes"]["ylim"])
 
     # Set x-axis tick positions
-    if 'xticks_major' in settings['axes']:
-        ax.set_xticks(settings['axes']['xticks_major'])
+    if "xticks_major" in settings["axes"]:
+        ax.set_xticks(settings["axes"]["xticks_major"])
 
-    if 'xticks_minor' in settings['axes']:
-        ax.set_xticks(settings['axes']['xticks_minor'], minor=True)
+    if "xticks_minor" in settings["axes"]:
+        ax.set_xticks(settings["axes"]["xticks_minor"], minor=True)
 
     # Set y-axis tick positions (optional)
-    if 'yticks_major' in settings['axes']:
-        ax.set_yticks(settings['axes']['yticks_major'])
+    if "yticks_major" in settings["axes"]:
+        ax.set_yticks(settings["axes"]["yticks_major"])
+
+    if "yticks_minor" in settings["axes"]:
+        ax.set_yticks(settings["axes"]["yticks_minor"], minor=True)
+    ax.legend(**settings["legend"])
 
-    if 'yticks_minor' in settings['axes']:
-        ax.set_yticks(settings['axes']['yticks_minor'], minor=True)
-    ax.legend(**settings['legend'])
 
 # This is used for the Plot class but can be used for anything else
 # TODO: apply general plot settings to other plot functions in plot_utils for less lines of code
 PLOT_SETTINGS = {
-        'figure': {
-            'figsize': (10, 6),
-            'dpi': 100,
-            'subplot_scale': 0.8
-        },
-        'axes': {
-            'xlabel': 'Temp (deg C)',
-            'ylabel': 'INP/L',
-            'yscale': 'log',
-            'xticks_major': np.arange(0, -35, -5),
-            'xticks_minor': np.arange(0, -31, -1),
-            'xlim': (-30, 0),
-            'ylim': (1e-4, 1e4)
-        },
-        'grid': {
-                'major': {
-                    'visible': True,
-                    'which': 'major',
-                    'linestyle': '--',
-                    'color': 'gray',
-                    'linewidth': 0.5,
-                    'alpha': 0.5
-                },
-                'minor': {
-                    'visible': True,
-                    'which': 'minor',
-                    'linestyle': '--',
-                    'color': 'gray',
-                    'linewidth': 0.5,
-                    'alpha': 0.1
-                }
-        },
-        'line': {
-            'linestyle': 'none',
-            'marker': 'o',
-            'markersize': 6,
-            'capsize': 4,
-            'capthick': 1.5,
-            'elinewidth': 1.5
-        },
-        'treatment_colors': {
-            'base': 'black',
-            'heat': 'darkred',
-            'peroxide': 'purple'
+    "figure": {"figsize": (10, 6), "dpi": 100, "subplot_scale": 0.8},
+    "axes": {
+        "xlabel": "Temp (deg C)",
+        "ylabel": "INP/L",
+        "yscale": "log",
+        "xticks_major": np.arange(0, -35, -5),
+        "xticks_minor": np.arange(0, -31, -1),
+        "xlim": (-30, 0),
+        "ylim": (1e-4, 1e4),
+    },
+    "grid": {
+        "major": {
+            "visible": True,
+            "which": "major",
+            "linestyle": "--",
+            "color": "gray",
+            "linewidth": 0.5,
+            "alpha": 0.5,
         },
-        'legend': {
-            'loc': 'best',
-            'framealpha': 0.9
+        "minor": {
+            "visible": True,
+            "which": "minor",
+            "linestyle": "--",
+            "color": "gray",
+            "linewidth": 0.5,
+            "alpha": 0.1,
         },
-        'save': {
-            'dpi': 300,
-            'bbox_inches': 'tight',
-            'format': 'png'
-        }
-    }
+    },
+    "line": {
+        "linestyle": "none",
+        "marker": "o",
+        "markersize": 6,
+        "capsize": 4,
+        "capthick": 1.5,
+        "elinewidth": 1.5,
+    },
+    "treatment_colors": {"base": "black", "heat": "darkred", "peroxide": "purple"},
+    "legend": {"loc": "best", "framealpha": 0.9},
+    "save": {"dpi": 300, "bbox_inches": "tight", "format": "png"},
+}
@@ -0,0 +1,144 @@
+import io
+import operator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from olaf.utils.path_utils import atomic_write_bytes, file_lock
+
+# Columns of the result store and how they are stored
+STORE_DTYPES = {
+    "site": "category",
+    "start_utc": "int64",
+    "end_utc": "int64",
+    "treatment": "category",
+    "treatment_flag": "int16",
+    "degC": "float64",
+    "n_INP": "float64",
+    "lower_CL": "float64",
+    "upper_CL": "float64",
+    "qc_flag": "int16",
+}
+# One experiment (filter) and treatment are replaced as a whole when appended again
+STORE_KEY = ["site", "start_utc", "treatment_flag"]
+
+FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda col, values: np.isin(col, list(values)),
+    "not in": lambda col, values: ~np.isin(col, list(values)),
+}
+
+
+class ResultStore:
+    def __init__(self, store_file: Path) -> None:
+        """
+        Campaign-wide store of final results in one columnar file (numpy .npz), so
+        analyses do not have to find and parse every final file again.
+        Every column is saved as its own array, with site and treatment as categoricals
+        (codes + categories), so loading only touches the columns that are asked for.
+        An append rewrites the whole file, so appends are serialized through a lock file
+        next to it (store_file.lock): one writer at a time, also across processes, e.g.
+        final runs of several experiments in parallel. Readers need no lock, the file
+        is replaced atomically.
+        Args:
+            store_file: Path of the .npz file, created on the first append
+        """
+        self.store_file = store_file
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Add rows to the store. Rows of an experiment and treatment (STORE_KEY) that is
+        already in the store replace the old rows, so recreating final files doesn't
+        duplicate results.
+        Args:
+            df: DataFrame with (at least) the columns in STORE_DTYPES
+        """
+        self.store_file.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.store_file.with_name(f"{self.store_file.name}.lock")):
+            self._write(self._coerce(df))
+
+    def _write(self, new_df: pd.DataFrame) -> None:
+        """Merge new_df into the stored rows and replace the file; call with the lock held"""
+        if self.store_file.exists():
+            stored_df = self.load()
+            new_keys = pd.MultiIndex.from_frame(new_df[STORE_KEY].astype(object))
+            stored_keys = pd.MultiIndex.from_frame(stored_df[STORE_KEY].astype(object))
+            stored_df = stored_df[~stored_keys.isin(new_keys)]
+            new_df = self._coerce(pd.concat([stored_df, new_df], ignore_index=True))
+
+        arrays = {}
+        for col, dtype in STORE_DTYPES.items():
+            if dtype == "category":
+                arrays[f"{col}.codes"] = new_df[col].cat.codes.to_numpy()
+                arrays[f"{col}.categories"] = new_df[col].cat.categories.to_numpy(dtype=str)
+            else:
+                arrays[col] = new_df[col].to_numpy()
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        atomic_write_bytes(self.store_file, buffer.getvalue())
+
+    def load(self, filters: list[tuple] | None = None, columns: list[str] | None = None):
+        """
+        Load (part of) the store. The filter columns are read first and the requested
+        columns are only read for the rows that pass all filters.
+        Args:
+            filters: list of (column, operator, value) tuples that all have to hold,
+            e.g. [("site", "in", {"SGP", "NSA"}), ("start_utc", ">=", 1704067200)].
+            Operators: ==, !=, <, <=, >, >=, in, not in
+            columns: columns to return (default: all)
+
+        Returns:
+            DataFrame with the selected rows and columns
+        """
+        columns = list(STORE_DTYPES) if columns is None else columns
+        if not self.store_file.exists():
+            return self._coerce(pd.DataFrame(columns=list(STORE_DTYPES)))[columns]
+
+        with np.load(self.store_file, allow_pickle=False) as npz:
+            mask = None
+            for col, op, value in filters or []:
+                if op not in FILTER_OPERATORS:
+                    raise ValueError(f"Unknown filter operator {op}; use {list(FILTER_OPERATORS)}")
+                col_mask = self._filter_column(npz, col, op, value)
+                mask = col_mask if mask is None else mask & col_mask
+
+            data = {}
+            for col in columns:
+                if STORE_DTYPES[col] == "category":
+                    codes = npz[f"{col}.codes"]
+                    codes = codes if mask is None else codes[mask]
+                    data[col] = pd.Categorical.from_codes(codes, npz[f"{col}.categories"])
+                else:
+                    values = npz[col]
+                    data[col] = values if mask is None else values[mask]
+        return pd.DataFrame(data, columns=columns)
+
+    @staticmethod
+    def _filter_column(npz, col, op, value):
+        """Evaluate one filter; categorical columns are compared on their categories"""
+        if STORE_DTYPES[col] == "category":
+            categories = npz[f"{col}.categories"]
+            # compare the (few) categories and look the result up by code
+            category_mask = np.append(FILTER_OPERATORS[op](categories, value), False)
+            codes = npz[f"{col}.codes"]
+            # code -1 (missing) picks the appended False
+            return category_mask[codes]
+        return np.asarray(FILTER_OPERATORS[op](npz[col], value))
+
+    @staticmethod
+    def _coerce(df):
+        """Select the store columns in order and give them the store dtypes"""
+        return pd.DataFrame(
+            {
+                col: df[col].astype(str).astype("category")
+                if dtype == "category"
+                else df[col].astype(dtype)
+                for col, dtype in STORE_DTYPES.items()
+            }
+        )
@@ -0,0 +1,98 @@
+"""
+The input files of the stages, and a hash of their names, sizes and modification times.
+The watcher queues a job when the hash of its inputs changes, and olaf runs skip a
+stage whose parameters and input hash are in the checkpoint log.
+"""
+
+import hashlib
+from pathlib import Path
+
+
+def files_hash(files, root: Path | None = None) -> str:
+    """
+    Hash of the names, sizes and modification times of files, with the names relative
+    to root if given (so the hash doesn't change when root is moved)
+    """
+    digest = hashlib.sha1()
+    for file in sorted(files):
+        stat = file.stat()
+        name = file.relative_to(root).as_posix() if root is not None else file
+        digest.update(f"{name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def experiment_inputs(experiment: dict) -> list[Path]:
+    """The reviewed .dat files SpacedTempCSV can pick for an experiment"""
+    folder = experiment["folder"]
+    if not folder.is_dir():
+        return []
+    return [
+        file
+        for file in folder.iterdir()
+        if file.suffix == ".dat"
+        and "reviewed" in file.name
+        and experiment["treatment"] in file.name
+    ]
+
+
+def project_inputs(project_folder: Path) -> list[Path]:
+    """The INPs_L files of all experiment folders (the inputs of the blank correction)"""
+    return [
+        file
+        for folder in project_folder.iterdir()
+        if folder.is_dir()
+        for file in folder.iterdir()
+        if file.suffix == ".csv" and file.name.startswith("INPs_L")
+    ]
+
+
+def frozen_at_temp_inputs(experiment: dict) -> list[Path]:
+    """The frozen_at_temp .csv files GraphDataCSV can pick for an experiment"""
+    folder = experiment["folder"]
+    if not folder.is_dir():
+        return []
+    return [
+        file
+        for file in folder.iterdir()
+        if file.suffix == ".csv"
+        and "frozen_at_temp" in file.name
+        and "reviewed" in file.name
+        and experiment["treatment"] in file.name
+        and not any(excl in file.name for excl in ("INPs_L", "dict"))
+    ]
+
+
+def blank_corrected_inputs(project_folder: Path) -> list[Path]:
+    """
+    The blank corrected files of all experiment folders and the combined blanks: what
+    the blank correction writes, and the final files are made from
+    """
+    return [
+        file
+        for folder in project_folder.iterdir()
+        if folder.is_dir()
+        for file in folder.iterdir()
+        if file.suffix == ".csv" and file.name.startswith("blank_corrected")
+    ] + [
+        file
+        for file in project_folder.iterdir()
+        if file.suffix == ".csv" and file.name.startswith("combined_blank")
+    ]
+
+
+def stage_inputs(stage: str, target: dict) -> list[Path]:
+    """
+    The files a stage reads, for an experiment (or the config for the project stages):
+    temp the reviewed .dat, inps the frozen_at_temp .csv, blanks the INPs_L files,
+    final the blank corrected files, and plots both
+    """
+    if stage == "temp":
+        return experiment_inputs(target)
+    if stage == "inps":
+        return frozen_at_temp_inputs(target)
+    inputs = []
+    if stage in ("blanks", "plots"):
+        inputs += project_inputs(target["project_folder"])
+    if stage in ("final", "plots"):
+        inputs += blank_corrected_inputs(target["project_folder"])
+    return inputs
@@ -0,0 +1,396 @@
+"""
+Synthetic freezing experiments, to test and benchmark the pipeline at any scale.
+
+Wells freeze following a log-linear INP spectrum (INPs/L of air) that is diluted per
+sample, plus a background spectrum of the water itself, so the number of frozen wells
+per sample behaves like a real run. The .dat files have the layout of the instrument
+(or of the reviewed files written by the GUI), and generate_project lays out a project
+tree with treatments and blanks, plus an experiments.toml for the olaf command:
+
+    python -m olaf.utils.synthetic_data /tmp/project --days 1000 --sites SGP NSA
+"""
+
+import argparse
+import struct
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from olaf.CONSTANTS import VOL_WELL
+from olaf.utils.math_utils import inps_L_to_ml
+
+# Columns of the .dat files: the instrument always writes 11 sample columns
+N_SAMPLE_COLUMNS = 11
+DEFAULT_DILUTIONS = {
+    "Sample_0": 1,
+    "Sample_1": 11,
+    "Sample_2": 121,
+    "Sample_3": 1331,
+    "Sample_4": 14641,
+    "Sample_5": float("inf"),
+}
+# Factor on the spectrum per treatment (heat and peroxide remove part of the INPs)
+TREATMENT_FACTORS = {"base": 1.0, "heat": 0.3, "peroxide": 0.05, "blank": 1.0}
+# Blanks: INPs per filter, so a much lower spectrum
+BLANK_LOG10_AT_M10 = -4.0
+
+
+def inp_spectrum(temps, log10_at_m10: float = -1.5, slope: float = 0.2) -> np.ndarray:
+    """
+    Log-linear cumulative INP spectrum.
+    Args:
+        temps: temperatures in degC
+        log10_at_m10: log10 of the concentration at -10 degC
+        slope: increase of log10(concentration) per degree of cooling
+
+    Returns:
+        concentration at temps (INPs/L of air for samples)
+    """
+    return 10 ** (log10_at_m10 + slope * (-10 - np.asarray(temps, dtype=float)))
+
+
+def simulate_frozen_wells(
+    temps,
+    dilutions: dict,
+    spectrum=inp_spectrum,
+    wells_per_sample: int = 32,
+    vol_air_filt: float = 1000,
+    proportion_filter_used: float = 1.0,
+    vol_susp: float = 10,
+    background_log10_at_m25: float = -0.5,
+    background_slope: float = 0.4,
+    rng=None,
+) -> dict:
+    """
+    Number of frozen wells per sample for every row of a temperature trace.
+    The mean number of INPs in a well is the INPs/mL of the suspension (see
+    math_utils.inps_L_to_ml) times the well volume, divided by the dilution, plus the
+    background of the water. Every well gets a random exponential threshold and freezes
+    at the first row where its cumulative number of INPs exceeds it, so wells never thaw.
+    Args:
+        temps: temperature trace in degC (one value per row)
+        dilutions: dictionary of sample column to dilution factor (inf for the background)
+        spectrum: function of the temperatures returning INPs/L of air
+        wells_per_sample: number of wells per sample
+        vol_air_filt: volume of air filtered (L)
+        proportion_filter_used: part of the filter in the suspension
+        vol_susp: volume of the suspension (mL)
+        background_log10_at_m25: log10 of the background INPs per well at -25 degC
+        background_slope: increase of log10(background) per degree of cooling
+        rng: numpy Generator (default: a new unseeded generator)
+
+    Returns:
+        dictionary of sample column to an int array with the frozen wells per row
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    # coldest temperature so far, so the INPs per well only go up
+    coldest = np.minimum.accumulate(np.asarray(temps, dtype=float))
+    inps_ml = inps_L_to_ml(spectrum(coldest), vol_air_filt, proportion_filter_used, vol_susp)
+    inps_well = inps_ml * (VOL_WELL / 1000)
+    background = 10 ** (background_log10_at_m25 + background_slope * (-25 - coldest))
+
+    frozen = {}
+    for sample, dilution in dilutions.items():
+        mean_per_well = inps_well / dilution + background
+        thresholds = np.sort(rng.exponential(size=wells_per_sample))
+        frozen[sample] = np.searchsorted(thresholds, mean_per_well, side="right")
+    return frozen
+
+
+def simulate_experiment(
+    start_time: datetime,
+    dilutions: dict | None = None,
+    wells_per_sample: int = 32,
+    start_temp: float = 23.0,
+    end_temp: float = -30.0,
+    cooling_rate: float = 0.35,
+    sample_interval: float = 1.0,
+    picture_interval: float = 60.0,
+    log10_at_m10: float = -1.5,
+    slope: float = 0.2,
+    rng=None,
+    **well_kwargs,
+) -> pd.DataFrame:
+    """
+    Simulate one freezing run in the layout of a reviewed .dat file.
+    Args:
+        start_time: time of the first row
+        dilutions: dictionary of sample column to dilution (default: DEFAULT_DILUTIONS)
+        wells_per_sample: number of wells per sample
+        start_temp: temperature at the start (degC)
+        end_temp: temperature at the end (degC)
+        cooling_rate: degC per minute; a longer run at the same rate means more rows
+        sample_interval: seconds between rows
+        picture_interval: seconds between pictures, taken from 0 degC on
+        log10_at_m10: log10 of the INP spectrum at -10 degC (see inp_spectrum)
+        slope: slope of the INP spectrum (see inp_spectrum)
+        rng: numpy Generator (default: a new unseeded generator)
+        **well_kwargs: other arguments of simulate_frozen_wells, e.g. vol_air_filt
+
+    Returns:
+        df with Date, Time, Avg_Temp, Sample_0 to Sample_10, TC_1, TC_2 and Picture
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    dilutions = DEFAULT_DILUTIONS if dilutions is None else dilutions
+
+    n_rows = int((start_temp - end_temp) / cooling_rate * 60 / sample_interval) + 1
+    seconds = np.arange(n_rows) * sample_interval + rng.uniform(0, 0.1, n_rows)
+    avg_temp = np.round(start_temp - cooling_rate * seconds / 60 + rng.normal(0, 0.003, n_rows), 3)
+    frozen = simulate_frozen_wells(
+        avg_temp,
+        dilutions,
+        lambda temps: inp_spectrum(temps, log10_at_m10, slope),
+        wells_per_sample=wells_per_sample,
+        rng=rng,
+        **well_kwargs,
+    )
+
+    # Time as hh:mm:ss:.cc, like the instrument writes it
+    centiseconds = np.round(seconds * 100).astype(np.int64) + (
+        ((start_time.hour * 60 + start_time.minute) * 60 + start_time.second) * 100
+    )
+    hours, rest = np.divmod(centiseconds, 360000)
+    minutes, rest = np.divmod(rest, 6000)
+    secs, cs = np.divmod(rest, 100)
+    times = [
+        f"{h % 24:02d}:{m:02d}:{s:02d}:.{c:02d}" for h, m, s, c in zip(hours, minutes, secs, cs)
+    ]
+
+    df = pd.DataFrame(
+        {"Date": start_time.strftime("%Y-%m-%d"), "Time": times, "Avg_Temp": avg_temp}
+    )
+    for i in range(N_SAMPLE_COLUMNS):
+        df[f"Sample_{i}"] = frozen.get(f"Sample_{i}", 0)
+    df["TC_1"] = np.round(avg_temp + 0.03 + rng.normal(0, 0.01, n_rows), 2)
+    df["TC_2"] = np.round(avg_temp - 0.03 + rng.normal(0, 0.01, n_rows), 2)
+
+    # A picture every picture_interval seconds once the wells are below 0 degC
+    pictures = np.full(n_rows, "", dtype=object)
+    below_zero = np.flatnonzero(avg_temp < 0)
+    if below_zero.size:
+        every = max(round(picture_interval / sample_interval), 1)
+        picture_rows = below_zero[0] + np.arange(0, n_rows - below_zero[0], every)
+        pictures[picture_rows] = [f"Image_{i}.png" for i in range(len(picture_rows))]
+    df["Picture"] = pictures
+    return df
+
+
+def write_dat(df: pd.DataFrame, save_file: Path, num_samples: int, reviewed=True) -> Path:
+    """
+    Write a simulated run as a .dat file.
+    Args:
+        df: df from simulate_experiment
+        save_file: Path of the .dat file
+        num_samples: number of samples in the changes column of a reviewed file
+        reviewed: write the layout of the GUI output (Date and Time columns and a changes
+        column), else the instrument layout (Time column with the date, an unnamed
+        column with the time, and m/d/y dates)
+
+    Returns:
+        save_file
+    """
+    if reviewed:
+        df = df.assign(changes=str([0] * num_samples))
+    else:
+        dates = pd.to_datetime(df["Date"]).dt.strftime("%m/%d/%y")
+        df = df.rename(columns={"Date": "Time", "Time": ""}).assign(Time=dates)
+    df.to_csv(save_file, sep="\t", index=False)
+    return save_file
+
+
+def write_images(images_folder: Path, picture_names) -> None:
+    """Write a tiny (1x1 pixel) png for every picture name, so the GUI can load them"""
+    images_folder.mkdir(parents=True, exist_ok=True)
+    png = _tiny_png()
+    for name in picture_names:
+        (images_folder / name).write_bytes(png)
+
+
+def generate_project(
+    project_folder: Path,
+    n_days: int = 5,
+    sites=("SGP",),
+    treatments=("base", "heat", "peroxide"),
+    blanks_per_day: int = 1,
+    first_date: datetime = datetime(2024, 1, 1),
+    num_samples: int = 6,
+    wells_per_sample: int = 32,
+    vol_air_filt: float = 1000,
+    images: bool = False,
+    reviewed: bool = True,
+    seed: int | None = None,
+    **experiment_kwargs,
+) -> Path:
+    """
+    Lay out a project folder with one experiment folder per site, day and treatment,
+    plus blank folders, each with a simulated .dat file (and optionally images).
+    The sample spectra vary randomly from day to day, and the treatments lower them
+    with TREATMENT_FACTORS. An experiments.toml for the olaf command is written
+    in the project folder.
+    Args:
+        project_folder: Path of the project folder, created if it doesn't exist
+        n_days: number of consecutive days
+        sites: site names
+        treatments: treatments per site and day
+        blanks_per_day: number of blank experiments per day (for the first site)
+        first_date: date of the first day
+        num_samples: number of samples (with DEFAULT_DILUTIONS)
+        wells_per_sample: number of wells per sample
+        vol_air_filt: volume of air filtered (L)
+        images: write an images folder with dummy pictures in every experiment folder
+        reviewed: write reviewed .dat files, so the pipeline can skip the GUI
+        seed: seed of the random generator, for reproducible projects
+        **experiment_kwargs: other arguments of simulate_experiment, e.g. cooling_rate
+
+    Returns:
+        Path of the experiments.toml
+    """
+    rng = np.random.default_rng(seed)
+    project_folder.mkdir(parents=True, exist_ok=True)
+    dilutions = dict(list(DEFAULT_DILUTIONS.items())[: num_samples - 1])
+    dilutions[f"Sample_{num_samples - 1}"] = float("inf")
+
+    experiments = []
+    for day in range(n_days):
+        date = first_date + timedelta(days=day)
+        runs = [(site, treatment) for site in sites for treatment in treatments]
+        runs += [(sites[0], "blank" if i == 0 else f"blank {i + 1}") for i in range(blanks_per_day)]
+        for run_idx, (site, treatment) in enumerate(runs):
+            is_blank = treatment.startswith("blank")
+            folder_name = f"{site} {date.strftime('%m.%d.%y')} {treatment}"
+            folder = project_folder / folder_name
+            folder.mkdir(exist_ok=True)
+            # the treatments of a filter share its sampling time, which differs per site
+            # (the final files are grouped by it); the runs follow each other
+            start_time = date + timedelta(hours=9, minutes=sites.index(site))
+            run_start = date + timedelta(hours=9, minutes=20 * run_idx)
+            if is_blank:
+                log10_at_m10 = BLANK_LOG10_AT_M10
+            else:
+                log10_at_m10 = (
+                    -1.5 + rng.normal(0, 0.3) + np.log10(TREATMENT_FACTORS.get(treatment, 1.0))
+                )
+
+            df = simulate_experiment(
+                run_start,
+                dilutions,
+                wells_per_sample,
+                log10_at_m10=log10_at_m10,
+                vol_air_filt=1 if is_blank else vol_air_filt,
+                rng=rng,
+                **experiment_kwargs,
+            )
+            prefix = "reviewed_" if reviewed else ""
+            write_dat(df, folder / f"{prefix}{folder_name}.dat", num_samples, reviewed)
+            if images:
+                write_images(folder / f"{folder_name} Images", df["Picture"][df["Picture"] != ""])
+
+            end_time = start_time + timedelta(hours=2)
+            experiments.append(
+                {
+                    "folder": folder_name,
+                    "site": site,
+                    "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "treatment": treatment,
+                    "vol_air_filt": 1 if is_blank else vol_air_filt,
+                }
+            )
+
+    config_file = project_folder / "experiments.toml"
+    config_file.write_text(
+        _experiments_toml(experiments, dilutions, num_samples, wells_per_sample, first_date, n_days)
+    )
+    return config_file
+
+
+def _experiments_toml(experiments, dilutions, num_samples, wells_per_sample, first_date, n_days):
+    """experiments.toml for generate_project (only the value types it needs)"""
+
+    def value(obj):
+        if isinstance(obj, str):
+            return f'"{obj}"'
+        if isinstance(obj, float) and np.isinf(obj):
+            return '"inf"'
+        if isinstance(obj, dict):
+            return "{ " + ", ".join(f"{k} = {value(v)}" for k, v in obj.items()) + " }"
+        return str(obj)
+
+    last_date = first_date + timedelta(days=n_days - 1)
+    lines = [
+        "# Generated by olaf.utils.synthetic_data",
+        "[project]",
+        'folder = "."',
+        "catalog = true",
+        "",
+        "[defaults]",
+        'user = "synthetic"',
+        'IS = "IS2"',
+        f"num_samples = {num_samples}",
+        f"wells_per_sample = {wells_per_sample}",
+        f"dilutions = {value(dilutions)}",
+        "",
+        "[plots]",
+        f'start_date = "{first_date.strftime("%m.%d.%y")}"',
+        f'end_date = "{last_date.strftime("%m.%d.%y")}"',
+        "",
+    ]
+    for experiment in experiments:
+        lines.append("[[experiment]]")
+        lines.extend(f"{key} = {value(val)}" for key, val in experiment.items())
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _tiny_png():
+    """Bytes of a valid 1x1 pixel grey png"""
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0)  # 1x1, 8 bit greyscale
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(b"\x00\x80"))
+        + chunk(b"IEND", b"")
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic OLAF project.")
+    parser.add_argument("project_folder", type=Path)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--sites", nargs="+", default=["SGP"])
+    parser.add_argument("--treatments", nargs="+", default=["base", "heat", "peroxide"])
+    parser.add_argument("--blanks-per-day", type=int, default=1)
+    parser.add_argument(
+        "--cooling-rate", type=float, default=0.35, help="degC per minute; lower means longer runs"
+    )
+    parser.add_argument("--images", action="store_true")
+    parser.add_argument(
+        "--raw", action="store_true", help="write instrument .dat files instead of reviewed ones"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config_file = generate_project(
+        args.project_folder,
+        n_days=args.days,
+        sites=tuple(args.sites),
+        treatments=tuple(args.treatments),
+        blanks_per_day=args.blanks_per_day,
+        images=args.images,
+        reviewed=not args.raw,
+        seed=args.seed,
+        cooling_rate=args.cooling_rate,
+    )
+    print(f"Generated {args.project_folder}; run it with: olaf all {config_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Running reduction of .dat rows onto the temperature grid of the frozen_at_temp files.
+
+SpacedTempCSV.create_temp_csv finds, for every grid temperature r (multiples of
+TEMP_STEP below the first freezing event), the highest number of frozen wells per sample
+in the band r - 0.01 < temp < r + 0.01, or, if no row falls in the band, in all rows
+warmer than r + 0.01. TempGridAccumulator keeps exactly the state needed for that, so
+rows can be added block by block (a long run in chunks, or a .dat that is still being
+written) with O(new rows) work, and O(grid x samples) memory:
+- the maximum per sample of the rows in the band of every grid temperature
+- the maximum per sample of the rows bucketed by the coldest grid temperature they are
+  warmer than, so "all rows warmer than r + 0.01" is a maximum over the buckets >= r
+- the first row where the trigger (least diluted) sample is frozen, and the lowest
+  temperature seen
+"""
+
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from olaf.CONSTANTS import TEMP_STEP
+
+# Half width of the band of temperatures around every grid temperature
+BAND = 0.01
+
+
+def _max_per_key(keys, values):
+    """Unique keys and the maximum (ignoring NaN) of the rows of values per key"""
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.fmax.reduceat(values[order], starts, axis=0)
+
+
+class TempGridAccumulator:
+    def __init__(self, sample_columns, trigger_column, temp_step: float = TEMP_STEP) -> None:
+        """
+        Args:
+            sample_columns: names of the sample columns, in output order
+            trigger_column: sample column whose first frozen well starts the grid (the
+            least diluted sample)
+            temp_step: grid spacing in degC. The bands are computed exactly like
+            create_temp_csv does as long as multiples of temp_step are exact binary
+            fractions, which holds for the default TEMP_STEP of 0.5
+        """
+        self.sample_columns = list(sample_columns)
+        self.trigger_index = self.sample_columns.index(trigger_column)
+        self.temp_step = temp_step
+        self.band_max: dict[int, np.ndarray] = {}
+        self.warm_max: dict[int, np.ndarray] = {}
+        self.first_row: tuple | None = None
+        self.first_frozen: tuple | None = None
+        self.min_temp = np.inf
+        self.n_rows = 0
+
+    def add(self, temps, counts) -> None:
+        """
+        Add a block of rows.
+        Args:
+            temps: 1d array with the temperature of every row
+            counts: 2d array with the frozen wells of every row, one column per sample
+        """
+        temps = np.asarray(temps, dtype=np.float64)
+        counts = np.asarray(counts, dtype=np.float64)
+        if not len(temps):
+            return
+        if self.first_row is None:
+            self.first_row = (temps[0], counts[0])
+        if self.first_frozen is None:
+            frozen = np.flatnonzero(counts[:, self.trigger_index] != 0)
+            if frozen.size:
+                self.first_frozen = (temps[frozen[0]], counts[frozen[0]])
+        self.n_rows += len(temps)
+
+        valid = ~np.isnan(temps)
+        temps, counts = temps[valid], counts[valid]
+        if not len(temps):
+            return
+        self.min_temp = min(self.min_temp, temps.min())
+
+        # Only the nearest grid temperature can have the row in its band
+        nearest = np.rint(temps / self.temp_step).astype(np.int64)
+        grid = nearest * self.temp_step
+        in_band = (temps > grid - BAND) & (temps < grid + BAND)
+        if in_band.any():
+            self._merge(self.band_max, *_max_per_key(nearest[in_band], counts[in_band]))
+
+        # Coldest grid temperature r with r + BAND < temp; the float division can be one
+        # off, so the estimate is corrected with the comparison create_temp_csv makes
+        bucket = np.floor((temps - BAND) / self.temp_step).astype(np.int64)
+        bucket += (bucket + 1) * self.temp_step + BAND < temps
+        bucket -= ~(bucket * self.temp_step + BAND < temps)
+        self._merge(self.warm_max, *_max_per_key(bucket, counts))
+
+    def add_frame(self, df: pd.DataFrame, temp_col: str = "Avg_Temp") -> None:
+        """Add the rows of a .dat DataFrame"""
+        self.add(
+            df[temp_col].to_numpy(dtype=np.float64),
+            # empty cells (NA in the nullable sample columns) are ignored like NaN
+            df[self.sample_columns].to_numpy(dtype=np.float64, na_value=np.nan),
+        )
+
+    @staticmethod
+    def _merge(state, keys, maxes):
+        for key, values in zip(keys.tolist(), maxes):
+            previous = state.get(key)
+            state[key] = values if previous is None else np.fmax(previous, values)
+
+    def start_row(self) -> tuple:
+        """
+        Temperature and frozen wells of the row that starts the grid: the first row where
+        the trigger sample is frozen, or the first row if it never froze (like
+        create_temp_csv, which uses idxmax on the trigger column)
+        """
+        return self.first_frozen if self.first_frozen is not None else self.first_row
+
+    def grid_rows(self, start_temp: float) -> tuple[list[float], np.ndarray]:
+        """
+        Grid temperatures below start_temp down to the lowest temperature seen, and the
+        highest number of frozen wells per sample at each of them.
+        Args:
+            start_temp: grid temperature to start below (the rounded first frozen
+            temperature)
+
+        Returns:
+            list of grid temperatures, and a (grid x samples) array with NaN where no
+            row was in the band or warmer
+        """
+        temps = []
+        temp = start_temp
+        while temp - self.temp_step > self.min_temp:
+            temp -= self.temp_step
+            temps.append(temp)
+
+        warm_keys = sorted(self.warm_max)
+        warm_cummax = []  # maximum over the buckets from warm_keys[i] up
+        running = np.full(len(self.sample_columns), np.nan)
+        for key in reversed(warm_keys):
+            running = np.fmax(running, self.warm_max[key])
+            warm_cummax.append(running)
+        warm_cummax.reverse()
+
+        values = np.full((len(temps), len(self.sample_columns)), np.nan)
+        for row, temp in enumerate(temps):
+            key = round(temp / self.temp_step)
+            if key in self.band_max:
+                values[row] = self.band_max[key]
+            else:
+                position = bisect_left(warm_keys, key)
+                if position < len(warm_keys):
+                    values[row] = warm_cummax[position]
+        return temps, values
@@ -0,0 +1,118 @@
+"""
+Vectorized parsing of the dates and times in the .dat files.
+
+The instrument writes the date as m/d/y (the reviewed files as y-m-d) and the time as
+hh:mm:ss:.cc, e.g. 12:51:32:.79, which no standard format matches, so pandas falls back
+to parsing every element on its own. The dates are parsed with an explicit format
+instead of inferring one, and the times are converted with integer arithmetic on their
+characters. Values that can't be read raise a ValueError instead of becoming NaT, so a
+wrong column is never silently replaced by missing values.
+"""
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%y", "%m/%d/%Y")
+# hh:mm:ss:.cc
+TIME_WIDTH = 12
+TIME_REGEX = r"^\s*(\d{1,2}):(\d{1,2}):(\d{1,2})(?::?\.(\d+))?\s*$"
+
+
+def parse_dat_dates(dates) -> pd.Series:
+    """
+    Args:
+        dates: dates as written in a .dat file (strings)
+
+    Returns:
+        datetime64[ns] Series with the dates (NaT where they are missing)
+
+    Raises:
+        ValueError: if the dates don't all have one of the DATE_FORMATS
+    """
+    dates = pd.Series(dates)
+    unread = {}
+    for date_format in DATE_FORMATS:
+        parsed = pd.to_datetime(dates, format=date_format, errors="coerce")
+        unread[date_format] = dates[parsed.isna() & dates.notna()]
+        if unread[date_format].empty:
+            return parsed.astype("datetime64[ns]")
+    closest = min(unread.values(), key=len)
+    raise ValueError(
+        f"{len(closest)} dates in none of the formats {DATE_FORMATS}, e.g. {closest.iloc[0]!r}"
+    )
+
+
+def parse_dat_times(times) -> np.ndarray:
+    """
+    Args:
+        times: times of day as written in a .dat file (hh:mm:ss:.cc strings)
+
+    Returns:
+        timedelta64[ns] array with the time since midnight (NaT where it is missing)
+
+    Raises:
+        ValueError: if a time is not in the hh:mm:ss:.cc format
+    """
+    times = pd.Series(times)
+    result = np.full(len(times), np.timedelta64("NaT"), dtype="timedelta64[ns]")
+    if not len(times):
+        return result
+
+    # Fast path: rows in the fixed width layout, converted digit by digit
+    fixed = (times.str.len() == TIME_WIDTH).to_numpy(copy=True)
+    if fixed.any():
+        chars = np.frombuffer(
+            "".join(times[fixed].tolist()).encode("ascii", "replace"), dtype=np.uint8
+        ).reshape(-1, TIME_WIDTH)
+        layout = (chars[:, [2, 5, 8]] == ord(":")).all(axis=1) & (chars[:, 9] == ord("."))
+        digits = chars[:, [0, 1, 3, 4, 6, 7, 10, 11]] - np.uint8(ord("0"))  # wraps below 0
+        valid = layout & (digits <= 9).all(axis=1)
+        digits = digits.astype(np.int64)
+        centiseconds = (
+            (
+                (digits[:, 0] * 10 + digits[:, 1]) * 3600
+                + (digits[:, 2] * 10 + digits[:, 3]) * 60
+                + digits[:, 4] * 10
+                + digits[:, 5]
+            )
+            * 100
+            + digits[:, 6] * 10
+            + digits[:, 7]
+        )
+        rows = np.flatnonzero(fixed)
+        result[rows[valid]] = (centiseconds[valid] * 10_000_000).astype("timedelta64[ns]")
+        fixed[rows[~valid]] = False
+
+    # Other widths (e.g. a one digit hour or fraction) through a regular expression
+    if not fixed.all():
+        parts = times[~fixed].str.extract(TIME_REGEX)
+        found = parts[0].notna().to_numpy()
+        unread = times[~fixed][~found].dropna()
+        if not unread.empty:
+            raise ValueError(
+                f"{len(unread)} times not in the hh:mm:ss:.cc format, e.g. {unread.iloc[0]!r}"
+            )
+        seconds = (
+            parts[0].astype(float) * 3600 + parts[1].astype(float) * 60 + parts[2].astype(float)
+        )
+        fraction = parts[3].fillna("0")
+        seconds += fraction.astype(float) / 10.0 ** fraction.str.len()
+        rows = np.flatnonzero(~fixed)
+        result[rows[found]] = np.round(seconds[found].to_numpy() * 1e9).astype("timedelta64[ns]")
+    return result
+
+
+def parse_dat_timestamps(dates, times) -> pd.Series:
+    """
+    Combine the date and time columns of a .dat file into one column.
+    Args:
+        dates: dates as strings, or already parsed (datetime64)
+        times: times of day as hh:mm:ss:.cc strings
+
+    Returns:
+        datetime64[ns] Series
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = parse_dat_dates(dates)
+    dates = pd.Series(dates).dt.normalize()
+    return (dates + parse_dat_times(times)).rename("Timestamp")
@@ -0,0 +1,202 @@
+"""
+Lightweight tracing: timing spans around stages and sub-steps, plus counters, written
+to a JSON-lines file. Tracing is off by default and then costs one attribute lookup per
+span or counter. Enable it with enable(trace_file), the olaf --trace option, or the
+OLAF_TRACE environment variable, and summarize a trace with
+
+    python -m olaf.utils.tracing trace.jsonl
+"""
+
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+TRACE_ENV_VAR = "OLAF_TRACE"
+
+
+class _Tracer:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.trace_file = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self.counters = defaultdict(int)
+
+    def stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+
+
+_tracer = _Tracer()
+
+
+def enable(trace_file: Path) -> None:
+    """Start writing spans and counters to trace_file (appended to)"""
+    disable()
+    _tracer.trace_file = Path(trace_file)
+    _tracer._file = open(trace_file, "a", buffering=1)  # noqa: SIM115, closed in disable()
+    _tracer.counters.clear()
+    _tracer.enabled = True
+
+
+def enable_from_env() -> bool:
+    """Enable tracing if OLAF_TRACE is set to a file path. Returns whether it is enabled"""
+    trace_file = os.environ.get(TRACE_ENV_VAR)
+    if trace_file and not _tracer.enabled:
+        enable(Path(trace_file))
+    return _tracer.enabled
+
+
+def disable() -> None:
+    """Write the totals of all counters and stop tracing"""
+    if not _tracer.enabled:
+        return
+    _tracer.write({"type": "counters", "pid": os.getpid(), "counters": dict(_tracer.counters)})
+    _tracer.enabled = False
+    with _tracer._lock:
+        _tracer._file.close()
+        _tracer._file = None
+
+
+def is_enabled() -> bool:
+    return _tracer.enabled
+
+
+@contextmanager
+def _span(name, attrs):
+    stack = _tracer.stack()
+    record = {
+        "type": "span",
+        "name": name,
+        "id": next(_tracer._ids),
+        "parent": stack[-1]["id"] if stack else None,
+        "pid": os.getpid(),
+        "thread": threading.get_ident(),
+        "attrs": attrs,
+        "counters": {},
+    }
+    stack.append(record)
+    start_wall = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["start"] = start_wall
+        record["duration"] = time.perf_counter() - start
+        stack.pop()
+        _tracer.write(record)
+
+
+@contextmanager
+def _no_span():
+    yield None
+
+
+_NO_SPAN = _no_span
+
+
+def span(name: str, **attrs):
+    """
+    Context manager timing a (sub-)step, e.g.
+        with span("temp.binning", rows=len(df)):
+            ...
+    Spans nest per thread; every span is written as one line when it closes.
+    """
+    if not _tracer.enabled:
+        return _NO_SPAN()
+    return _span(name, attrs)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add n to a counter, on the innermost open span and in the totals"""
+    if not _tracer.enabled:
+        return
+    with _tracer._lock:
+        _tracer.counters[name] += n
+    stack = _tracer.stack()
+    if stack:
+        counters = stack[-1]["counters"]
+        counters[name] = counters.get(name, 0) + n
+
+
+def traced(name: str):
+    """Decorator that runs a function in a span"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with _span(name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def summarize(trace_file: Path) -> dict:
+    """
+    Total time, number of calls and counters per span name in a trace file.
+    Returns:
+        dictionary of span name to {"calls", "total_s", "max_s", "counters"}, ordered by
+        total time, and "counters" with the totals of all counters
+    """
+    spans = defaultdict(lambda: {"calls": 0, "total_s": 0.0, "max_s": 0.0, "counters": {}})
+    totals = defaultdict(int)
+    with open(trace_file) as f:
+        for line in f:
+            record = json.loads(line)
+            if record["type"] == "counters":
+                for key, value in record["counters"].items():
+                    totals[key] += value
+                continue
+            summary = spans[record["name"]]
+            summary["calls"] += 1
+            summary["total_s"] += record["duration"]
+            summary["max_s"] = max(summary["max_s"], record["duration"])
+            for key, value in record["counters"].items():
+                summary["counters"][key] = summary["counters"].get(key, 0) + value
+    ordered = dict(sorted(spans.items(), key=lambda item: -item[1]["total_s"]))
+    return {"spans": ordered, "counters": dict(totals)}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m olaf.utils.tracing trace.jsonl")
+        return 1
+    summary = summarize(Path(argv[0]))
+    print(f"{'span':<32} {'calls':>7} {'total s':>10} {'max s':>9}  counters")
+    for name, span_summary in summary["spans"].items():
+        counters = ", ".join(f"{k}={v}" for k, v in span_summary["counters"].items())
+        print(
+            f"{name:<32} {span_summary['calls']:>7} {span_summary['total_s']:>10.3f} "
+            f"{span_summary['max_s']:>9.3f}  {counters}"
+        )
+    if summary["counters"]:
+        print("totals: " + ", ".join(f"{k}={v}" for k, v in summary["counters"].items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Watch a project folder and process experiments as their files appear:
+
+    olaf watch experiments.toml --workers 2
+    olaf status experiments.toml
+
+Every poll_interval seconds the watcher reloads the experiments.toml and looks at the
+files in the project (no broker or file system events, so it also works on shared
+drives):
+- a new or changed reviewed .dat file of an experiment in the config queues the temp and
+  inps stages of that experiment
+- a new or changed INPs_L file anywhere in the project queues the project stages
+  (blanks, final and plots), which run once no experiment jobs are left
+Jobs are kept in .olaf_jobs.sqlite in the project folder (see JobQueue) and run in
+worker processes. A job is identified by its target and a hash of the names, sizes and
+modification times of its input files, so starting the watcher again, or a poll that
+finds nothing new, never processes the same inputs twice.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from olaf.pipeline import EXPERIMENT_STAGES, PROJECT_STAGES, load_config, open_catalog
+from olaf.utils.job_queue import JobQueue
+from olaf.utils.stage_inputs import experiment_inputs, files_hash, project_inputs
+
+logger = logging.getLogger(__name__)
+
+PROJECT_TARGET = "project"
+# Stages a job runs: the interactive review is done by hand, and creates the input
+JOB_STAGES = {
+    "experiment": tuple(stage for stage in EXPERIMENT_STAGES if stage != "review"),
+    "project": PROJECT_STAGES,
+}
+
+
+def run_job(config_file: Path, kind: str, target: str) -> str | None:
+    """
+    Run the stages of a job; this runs in a worker process.
+    Returns:
+        None if all stages succeeded, else the error of the first failing stage
+    """
+    from olaf.cli import run_stage
+
+    config = load_config(config_file)
+    if kind == "experiment":
+        experiments = [e for e in config["experiments"] if e["name"] == target]
+        if not experiments:
+            return f"Experiment {target} is no longer in {config_file}"
+        stage_target = experiments[0]
+    else:
+        stage_target = config
+
+    catalog = open_catalog(config)
+    try:
+        for stage in JOB_STAGES[kind]:
+            result = run_stage(stage, stage_target, config, catalog, target)
+            if result["status"] != "ok":
+                return f"{stage}: {result['error']}"
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return None
+
+
+class Watcher:
+    def __init__(
+        self, config_file: Path, workers: int = 1, poll_interval: float = 30, settle: float = 10
+    ) -> None:
+        """
+        Args:
+            config_file: Path of the TOML experiment table
+            workers: number of worker processes
+            poll_interval: seconds between looking for new files
+            settle: only pick up files that were not modified for this many seconds, so
+            files that are still being copied or written are left for a later poll
+        """
+        self.config_file = config_file
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.config = load_config(config_file)
+        self.queue = JobQueue(self.config["project_folder"] / ".olaf_jobs.sqlite")
+        self._config_mtime = config_file.stat().st_mtime
+
+    def _reload_config(self) -> None:
+        """Reload the config if it changed, keeping the old one if it can't be read"""
+        mtime = self.config_file.stat().st_mtime
+        if mtime == self._config_mtime:
+            return
+        try:
+            self.config = load_config(self.config_file)
+        except Exception as e:  # noqa: BLE001, e.g. saved halfway through an edit; retry next poll
+            logger.error("Could not reload %s: %s", self.config_file, e)
+            return
+        self._config_mtime = mtime
+        logger.info("Reloaded %s", self.config_file)
+
+    def _settled(self, files) -> bool:
+        now = time.time()
+        return all(now - file.stat().st_mtime >= self.settle for file in files)
+
+    def poll(self, skip: bool = False) -> int:
+        """
+        Queue the targets with new or changed input files, and failed jobs that are due
+        for a retry.
+        Args:
+            skip: only record the current inputs as processed, without queueing them
+
+        Returns:
+            number of jobs added
+        """
+        self._reload_config()
+        status = "skipped" if skip else "queued"
+        added = 0
+        if not skip:
+            retried = self.queue.retry_failed()
+            if retried:
+                logger.info("Retrying %d failed jobs", retried)
+        for experiment in self.config["experiments"]:
+            inputs = experiment_inputs(experiment)
+            if (
+                inputs
+                and self._settled(inputs)
+                and self.queue.enqueue("experiment", experiment["name"], files_hash(inputs), status)
+            ):
+                logger.info("Queued %s", experiment["name"])
+                added += 1
+        inputs = project_inputs(self.config["project_folder"])
+        if (
+            inputs
+            and self._settled(inputs)
+            and self.queue.enqueue("project", PROJECT_TARGET, files_hash(inputs), status)
+        ):
+            logger.info("Queued the project stages (%d INPs_L files)", len(inputs))
+            added += 1
+        return added
+
+    def run(self, once: bool = False) -> dict:
+        """
+        Poll and process jobs until interrupted.
+        Args:
+            once: stop when there is nothing left to do, instead of waiting for new files
+
+        Returns:
+            number of jobs per status
+        """
+        requeued = self.queue.requeue_running()
+        if requeued:
+            logger.info("Requeued %d jobs that were interrupted", requeued)
+        running = {}  # future: (job id, kind, target)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while True:
+                    self.poll()
+                    self._dispatch(executor, running)
+                    if not running and not self.queue.queued():
+                        if once:
+                            break
+                        time.sleep(self.poll_interval)
+                        continue
+                    finished, _ = wait(
+                        running, timeout=self.poll_interval, return_when=FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        job_id, _, target = running.pop(future)
+                        try:
+                            error = future.result()
+                        except (BrokenProcessPool, OSError) as e:  # the worker process died
+                            error = f"{type(e).__name__}: {e}"
+                        self.queue.finish(job_id, error)
+                        if error:
+                            logger.error("%s failed: %s", target, error)
+                        else:
+                            logger.info("%s done", target)
+            except KeyboardInterrupt:
+                logger.info("Stopping; running jobs are queued again at the next start")
+                executor.shutdown(wait=False, cancel_futures=True)
+        return self.queue.counts()
+
+    def _dispatch(self, executor, running) -> None:
+        """
+        Start queued jobs while there are free workers. An experiment is only processed by
+        one worker at a time, and the project stages wait until no experiment jobs are
+        queued or running, as they use the output of all of them.
+        """
+        busy = {target for _, _, target in running.values()}
+        queued = self.queue.queued()
+        experiments_left = any(kind == "experiment" for _, kind, _ in queued) or any(
+            kind == "experiment" for _, kind, _ in running.values()
+        )
+        for job_id, kind, target in queued:
+            if len(running) >= self.workers:
+                return
+            if target in busy or (kind == "project" and experiments_left):
+                continue
+            self.queue.start(job_id)
+            future = executor.submit(run_job, self.config_file, kind, target)
+            running[future] = (job_id, kind, target)
+            busy.add(target)
+
+    def close(self) -> None:
+        self.queue.close()
+
+
+def format_status(queue: JobQueue, limit: int = 10) -> str:
+    """Text with the number of jobs per status, and the running, queued and failed jobs"""
+    lines = [", ".join(f"{count} {status}" for status, count in queue.counts().items())]
+    for job in queue.jobs(("running", "queued", "failed"), limit):
+        when = job["finished"] or job["started"] or job["queued"]
+        line = (
+            f"{job['status']:<8} {job['target']} "
+            f"({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(when))})"
+        )
+        if job["status"] == "failed":
+            line += f" attempt {job['attempts']} of {queue.max_attempts}"
+        if job["error"]:
+            line += f": {job['error']}"
+        lines.append(line)
+    return "\n".join(lines)
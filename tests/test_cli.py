@@ -0,0 +1,128 @@
+"""
+This module contains the tests for the olaf command line tool.
+"""
+
+import json
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from olaf.cli import main
+from olaf.pipeline import PROJECT_STAGES, STAGE_FUNCTIONS, experiment_header, load_config
+from olaf.utils.synthetic_data import generate_project
+
+EXAMPLE_CONFIG = Path(__file__).parent.parent / "olaf" / "experiments_example.toml"
+
+
+class TestCli:
+    def test_load_config(self):
+        config = load_config(EXAMPLE_CONFIG)
+        experiment = config["experiments"][0]
+        assert experiment["folder"] == config["project_folder"] / "SGP 2.21.24 base"
+        assert experiment["dilutions"]["Sample_5"] == float("inf")
+        assert experiment["num_samples"] == 6  # from [defaults]
+
+        header, vol_air_filt = experiment_header(experiment)
+        assert "site = SGP\nstart_time = 2024-02-21 10:00:00\n" in header
+        assert "\nwells_per_sample = 32\n" in header
+        assert vol_air_filt == 620.48
+
+    def test_failures_are_summarized(self, tmp_path):
+        config_file = tmp_path / "experiments.toml"
+        config_file.write_text(
+            '[project]\nfolder = "."\n\n[[experiment]]\nfolder = "NSA 01.05.24 base"\n'
+            'site = "NSA"\nstart_time = "2024-01-06 10:00:00"\nend_time = ""\n'
+            'treatment = "base"\n'
+        )
+        summary_file = tmp_path / "summary.json"
+        exit_code = main(["inps", str(config_file), "--summary", str(summary_file)])
+
+        summary = json.loads(summary_file.read_text())
+        assert exit_code == 1
+        assert summary["n_failed"] == 1
+        assert "does not match" in summary["results"][0]["error"]
+
+    def test_rerun_skips_finished_stages(self, tmp_path):
+        config_file = generate_project(tmp_path / "project", n_days=1, seed=0)
+        summary_file = tmp_path / "summary.json"
+
+        def run_temp(*options):
+            assert main(["temp", str(config_file), "--summary", str(summary_file), *options]) == 0
+            summary = json.loads(summary_file.read_text())
+            return {r["experiment"]: r["status"] for r in summary["results"]}
+
+        statuses = run_temp()
+        assert set(statuses.values()) == {"ok"}
+        assert set(run_temp().values()) == {"skipped"}
+
+        # a changed input file runs that experiment again
+        experiment = min(statuses)
+        dat_file = next((tmp_path / "project" / experiment).glob("*reviewed*.dat"))
+        dat_file.write_text(dat_file.read_text())
+        statuses = run_temp()
+        assert statuses.pop(experiment) == "ok"
+        assert set(statuses.values()) == {"skipped"}
+        assert set(run_temp("--force").values()) == {"ok"}
+
+        # deleted outputs run that experiment again, instead of leaving inps without them
+        for frozen_file in (tmp_path / "project" / experiment).glob("frozen_at_temp_*.csv"):
+            frozen_file.unlink()
+        statuses = run_temp()
+        assert statuses.pop(experiment) == "ok"
+        assert set(statuses.values()) == {"skipped"}
+        assert list((tmp_path / "project" / experiment).glob("frozen_at_temp_*.csv"))
+
+    def test_moved_project_keeps_its_checkpoints(self, tmp_path):
+        config_file = generate_project(tmp_path / "project", n_days=1, seed=0)
+        summary_file = tmp_path / "summary.json"
+
+        def run_all(config_file):
+            main(["all", str(config_file), "--summary", str(summary_file)])
+            return json.loads(summary_file.read_text())["results"]
+
+        results = run_all(config_file)
+        assert {r["status"] for r in results} == {"ok"}
+        # only the files the stages wrote are recorded as their outputs
+        final = next(r for r in results if r["stage"] == "final")
+        assert {Path(path).parent.name for path in final["outputs"]} == {"final_files"}
+        assert any(path.endswith("manifest.json") for path in final["outputs"])
+
+        (tmp_path / "project").rename(tmp_path / "moved")
+        results = run_all(tmp_path / "moved" / config_file.name)
+        assert {r["status"] for r in results} == {"skipped"}
+
+    def test_stages_after_a_failed_stage_run_again(self, tmp_path, monkeypatch):
+        config_file = generate_project(tmp_path / "project", n_days=1, seed=0)
+        summary_file = tmp_path / "summary.json"
+
+        def run_all():
+            main(["all", str(config_file), "--summary", str(summary_file)])
+            summary = json.loads(summary_file.read_text())
+            return {
+                r["stage"]: r["status"] for r in summary["results"] if r["stage"] in PROJECT_STAGES
+            }
+
+        assert run_all() == {"blanks": "ok", "final": "ok", "plots": "ok"}
+
+        # new INPs_L files, but the blank correction fails: final still has the old
+        # blank corrected files, so it is skipped, and plots runs on the new INPs_L files
+        for inps_file in (tmp_path / "project").glob("*/INPs_L_*.csv"):
+            inps_file.write_text(inps_file.read_text())
+        with monkeypatch.context() as patch:
+            patch.setitem(STAGE_FUNCTIONS, "blanks", Mock(side_effect=ValueError("no blanks")))
+            assert run_all() == {"blanks": "failed", "final": "skipped", "plots": "ok"}
+
+        # the blank correction runs again and writes new files, so final and plots run
+        # again on them instead of being skipped as done with the old ones
+        assert run_all() == {"blanks": "ok", "final": "ok", "plots": "ok"}
+        assert run_all() == {"blanks": "skipped", "final": "skipped", "plots": "skipped"}
+
+    def test_mirror_is_rejected_for_commands_not_run_on_it(self, tmp_path, capsys):
+        config_file = generate_project(tmp_path / "project", n_days=1, seed=0)
+        for command in ("review", "live", "watch"):
+            with pytest.raises(SystemExit) as exit_info:
+                main([command, str(config_file), "-e", "x", "--mirror", str(tmp_path / "m")])
+            assert exit_info.value.code == 2
+            assert f"--mirror can't be used with {command}" in capsys.readouterr().err
+        assert not (tmp_path / "m").exists()
@@ -0,0 +1,23 @@
+"""
+Headless processing modules must not load matplotlib or tkinter at import time.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["olaf.processing.graph_data_csv", "olaf.processing.blank_correction", "olaf.main"],
+)
+def test_no_gui_or_plotting_imports(module):
+    code = (
+        f"import sys, {module}; "
+        "print(sorted(m for m in ('matplotlib', 'tkinter') if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,74 @@
+"""
+This module contains the tests for the pre-flight check of a campaign.
+"""
+
+import pandas as pd
+
+from olaf.cli import main
+from olaf.pipeline import load_config
+from olaf.preflight import check_campaign, format_report
+from olaf.utils.synthetic_data import generate_project
+
+
+class TestPreflight:
+    def test_finds_problems(self, tmp_path):
+        project = tmp_path / "project"
+        config_file = generate_project(project, n_days=1, seed=0, images=True, reviewed=False)
+        assert check_campaign(load_config(config_file, strict=False)) == []
+
+        text = config_file.read_text()
+        config_file.write_text(
+            text.replace('start_time = "2024-01-01 09:00:00"\n', "", 1)  # base
+            .replace(
+                'start_time = "2024-01-01 09:00:00"', 'start_time = "2024-01-02 09:00:00"', 1
+            )  # heat
+            .replace('treatment = "peroxide"', 'treatment = "peroxide"\nwells_per_sample = 30')
+        )
+        # the blank warms up halfway through and lost a picture
+        dat_file = project / "SGP 01.01.24 blank" / "SGP 01.01.24 blank.dat"
+        dat = pd.read_csv(dat_file, sep="\t", dtype=str, keep_default_na=False)
+        dat.loc[len(dat) // 2, "Avg_Temp"] = "25.0"
+        dat.to_csv(dat_file, sep="\t", index=False)
+        next((project / "SGP 01.01.24 blank" / "SGP 01.01.24 blank Images").iterdir()).unlink()
+
+        issues = check_campaign(load_config(config_file, strict=False))
+        found = {(issue["experiment"], issue["check"], issue["severity"]) for issue in issues}
+        assert found == {
+            ("SGP 01.01.24 base", "config", "error"),
+            ("SGP 01.01.24 base", "start_time", "error"),
+            ("SGP 01.01.24 heat", "folder_date", "warning"),
+            ("SGP 01.01.24 peroxide", "wells", "warning"),
+            ("SGP 01.01.24 blank", "temperature", "warning"),
+            ("SGP 01.01.24 blank", "images", "error"),
+        }
+        report = format_report(issues, 4)
+        assert report.startswith("4 experiments checked: 3 errors, 3 warnings\nERROR")
+
+        summary_file = tmp_path / "check.json"
+        assert main(["check", str(config_file), "--summary", str(summary_file)]) == 1
+        assert len(pd.read_json(summary_file)) == 6
+
+    def test_wrong_types_are_config_errors(self, tmp_path):
+        project = tmp_path / "project"
+        config_file = generate_project(project, n_days=1, seed=0, images=True, reviewed=False)
+        text = config_file.read_text()
+        config_file.write_text(
+            text.replace('treatment = "base"', 'treatment = "base"\nnum_samples = "6"')
+            .replace('treatment = "heat"', 'treatment = "heat"\nwells_per_sample = "32"')
+            .replace('treatment = "peroxide"', 'treatment = "peroxide"\ndilutions = "1, 11"')
+        )
+
+        config = load_config(config_file, strict=False)
+        issues = check_campaign(config)
+        assert {(issue["experiment"], issue["check"]) for issue in issues} == {
+            ("SGP 01.01.24 base", "config"),
+            ("SGP 01.01.24 heat", "config"),
+            ("SGP 01.01.24 peroxide", "config"),
+        }
+        assert "num_samples '6' is not a positive integer" in issues[0]["message"]
+
+        # an experiment the checks can't handle is one error, the others are still checked
+        config["experiments"][0] = {"name": "broken"}
+        issues = check_campaign(config)
+        assert [issue["check"] for issue in issues if issue["experiment"] == "broken"] == ["check"]
+        assert len(issues) == 3
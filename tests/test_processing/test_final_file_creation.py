@@ -0,0 +1,69 @@
+"""
+This module contains the tests for combining the treatments into final files.
+"""
+
+import hashlib
+import json
+
+import pandas as pd
+
+from olaf.processing.final_file_creation import FinalFileCreation
+from olaf.utils.path_utils import save_df_file
+
+TREATMENT_DICT = {"base": 0, "heat": 1, "peroxide": 2}
+HEADER_START = "Treatment flags: 0 = untreated; 1 = heat treated; and 2 = peroxide treated\n"
+
+
+def _write_experiments(project_folder):
+    for day in range(1, 5):
+        for treatment in ("base", "heat"):
+            folder = project_folder / f"SGP 03.0{day}.24 {treatment}"
+            folder.mkdir()
+            header = {
+                "site": "SGP",
+                "start_time": f"2024-03-0{day} 10:00:00",
+                "end_time": f"2024-03-0{day + 1} 10:00:00",
+                "filter_color": "white",
+                "vol_air_filt": 1000.0,
+                "notes": "none",
+            }
+            df = pd.DataFrame(
+                {
+                    "degC": [-10.0, -15.0, -20.0][: day % 3 + 1],
+                    "dilution": 1,
+                    "INPS_L": [0.01, 0.1, 1.0][: day % 3 + 1],
+                    "lower_CI": 0.005,
+                    "upper_CI": 0.005,
+                    "qc_flag": 0,
+                }
+            )
+            save_df_file(df, folder / f"INPs_L_blank_corrected_{treatment}.csv", header)
+
+
+class TestFinalFileCreation:
+    def test_parallel_final_files_and_manifest(self, tmp_path):
+        _write_experiments(tmp_path)
+        final = FinalFileCreation(tmp_path, ("INPs_L", "blank_corrected"), ())
+
+        manifest = final.create_all_final_files(TREATMENT_DICT, HEADER_START, max_workers=4)
+
+        final_folder = tmp_path / "final_files"
+        assert json.loads((final_folder / "manifest.json").read_text()) == manifest
+        assert sorted(manifest) == [f"SGP_2024-03-0{day}_100000.csv" for day in range(1, 5)]
+        for name, entry in manifest.items():
+            content = (final_folder / name).read_bytes()
+            day = int(name[13])
+            # one row per temperature for each of the two treatments
+            assert entry["rows"] == 2 * (day % 3 + 1)
+            # the data follows the column names and the line with the times and volume
+            data_lines = content.decode().split("Treatment_flag\n")[1].splitlines()[1:]
+            assert entry["rows"] == len(data_lines)
+            assert entry["bytes"] == len(content)
+            assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+
+        # a rerun writes the same files over the old ones
+        rerun = FinalFileCreation(tmp_path, ("INPs_L", "blank_corrected"), ())
+        assert rerun.create_all_final_files(TREATMENT_DICT, HEADER_START, max_workers=4) == manifest
+        assert sorted(path.name for path in final_folder.iterdir()) == sorted(
+            [*manifest, "manifest.json"]
+        )
@@ -0,0 +1,90 @@
+"""
+This module contains the tests for the live spectrum of a running experiment.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from olaf.CONSTANTS import NUM_TO_REPLACE_D1
+from olaf.processing.graph_data_csv import GraphDataCSV
+from olaf.processing.live_spectrum import LiveSpectrum
+from olaf.processing.spaced_temp_csv import SpacedTempCSV
+from olaf.utils.synthetic_data import DEFAULT_DILUTIONS, simulate_experiment, write_dat
+
+HEADER = "site = SGP\nstart_time = 2024-01-01 09:00:00\ntreatment = base\n"
+
+
+class TestLiveSpectrum:
+    def test_chunks_match_full_file(self, tmp_path):
+        df = simulate_experiment(
+            datetime(2024, 1, 1, 9), rng=np.random.default_rng(1), cooling_rate=1.0
+        )
+        reviewed_folder = tmp_path / "SGP 01.01.24 base"
+        reviewed_folder.mkdir()
+        write_dat(df, reviewed_folder / "reviewed_SGP 01.01.24 base.dat", 6)
+        raw = write_dat(df, tmp_path / "raw.dat", 6, reviewed=False).read_bytes()
+
+        # the instrument appends to the file, also in the middle of a line
+        live_file = tmp_path / "SGP 01.01.24 base.dat"
+        live = LiveSpectrum(live_file, 6, DEFAULT_DILUTIONS, 32, "air", HEADER, 1000, 1.0, 10)
+        step = len(raw) // 5 + 7
+        n_rows = 0
+        for start in range(0, len(raw), step):
+            with open(live_file, "ab") as f:
+                f.write(raw[start : start + step])
+            n_rows += live.update()
+        assert n_rows == len(df)
+
+        expected = SpacedTempCSV(reviewed_folder, 6).create_temp_csv(
+            DEFAULT_DILUTIONS, {}, 32, "air", save=False
+        )
+        pd.testing.assert_frame_equal(live.frozen_at_temp(), expected)
+        expected_inps = GraphDataCSV(
+            reviewed_folder, 6, "air", 1000, 32, 1.0, 10, DEFAULT_DILUTIONS, data=expected
+        ).convert_INPs_L(HEADER, save=False)
+        pd.testing.assert_frame_equal(live.inps_l(), expected_inps)
+
+        assert live.run(interval=0, max_updates=1) is None  # no new rows
+        live.write(expected_inps)
+        assert live.output_file.read_text().startswith(HEADER)
+
+    def test_loaded_data_with_background_replacement(self, tmp_path, caplog):
+        df = simulate_experiment(
+            datetime(2024, 1, 1, 9), rng=np.random.default_rng(1), cooling_rate=1.0
+        )
+        write_dat(df, tmp_path / "reviewed_SGP 01.01.24 base.dat", 6)
+        data = SpacedTempCSV(tmp_path, 6).create_temp_csv(
+            DEFAULT_DILUTIONS, {}, 32, "air", save=False
+        )
+        # the DI background freezes more wells than the most diluted sample, so that
+        # sample is used as background
+        data["Sample_5"] = np.minimum(data["Sample_4"] + 1, 32)
+        assert (data["Sample_5"] > data["Sample_4"]).sum() >= NUM_TO_REPLACE_D1
+
+        with caplog.at_level("INFO"):
+            GraphDataCSV(
+                tmp_path, 6, "air", 1000, 32, 1.0, 10, DEFAULT_DILUTIONS, data=data.copy()
+            ).convert_INPs_L(HEADER, save=False)
+            GraphDataCSV(
+                tmp_path,
+                6,
+                "air",
+                1000,
+                32,
+                1.0,
+                10,
+                DEFAULT_DILUTIONS,
+                data=data.copy(),
+                data_file=tmp_path / "run.dat",
+            ).convert_INPs_L(HEADER, save=False)
+        assert f"{tmp_path.name}: DI found to be higher" in caplog.text
+        assert "run.dat: DI found to be higher" in caplog.text
+
+    def test_nothing_frozen_yet(self, tmp_path):
+        df = simulate_experiment(datetime(2024, 1, 1, 9), rng=np.random.default_rng(1))
+        live_file = write_dat(df[df["Avg_Temp"] > 0], tmp_path / "run.dat", 6, reviewed=False)
+        live = LiveSpectrum(live_file, 6, DEFAULT_DILUTIONS, 32, "air", HEADER, 1000, 1.0, 10)
+        assert live.run(interval=0, max_updates=2) is None
+        assert not live.output_file.exists()
@@ -0,0 +1,186 @@
+"""
+This module contains the tests for rendering the INP plots.
+"""
+
+import copy
+
+import numpy as np
+from matplotlib.image import imread
+
+from olaf.processing import plots as plots_module
+from olaf.processing.plots import Plots, _render_date_figures, load_inp_files
+from olaf.utils.plot_utils import PLOT_SETTINGS
+
+
+def _write_inps_files(project_folder, values):
+    for folder, value in values.items():
+        month, day, year = folder.split()[1].split(".")
+        (project_folder / folder).mkdir(exist_ok=True)
+        (project_folder / folder / f"INPs_L_frozen_at_temp_reviewed_{folder}.csv").write_text(
+            f"site = SGP\nstart_time = 20{year}-{month}-{day} 10:00:00\ntreatment = base\n"
+            f"degC,dilution,INPS_L,lower_CI,upper_CI\n-10.0,1,{value},0.01,0.01\n"
+        )
+
+
+def _old_partition(plots, df, date_version, site_comparison, tbs, settings):
+    """The errorbars per date as plot_data selected them before Plots._partition"""
+    site_col = "altitude_range" if tbs else "site"
+    partition = {}
+    for date in df[date_version].unique():
+        date_data = df[df[date_version] == date]
+        series = []
+        site = ""
+        for site in date_data[site_col].unique():
+            site_data = date_data[date_data[site_col] == site] if site_comparison else date_data
+            marker = plots.get_marker(site)
+            for treatment in site_data["treatment"].unique():
+                treatment_data = site_data[site_data["treatment"] == treatment]
+                series.append(
+                    {
+                        "x": treatment_data["degC"].to_numpy(),
+                        "y": treatment_data["INPS_L"].to_numpy(),
+                        "yerr": treatment_data[["lower_CI", "upper_CI"]].to_numpy().T,
+                        "label": f"{site} - {treatment}"
+                        if site_comparison and site != "default"
+                        else treatment,
+                        "color": None if tbs else settings["treatment_colors"].get(treatment),
+                        "marker": marker,
+                    }
+                )
+        partition[date] = (series, str(site))
+    return partition
+
+
+class TestPlots:
+    def test_no_date_limits(self, tmp_path):
+        for folder in ("SGP 02.21.24 base", "SGP 03.01.30 base"):
+            (tmp_path / folder).mkdir()
+            (tmp_path / folder / f"INPs_L_frozen_at_temp_reviewed_{folder}.csv").write_text(
+                "degC,dilution,INPS_L,lower_CI,upper_CI\n-10.0,1,0.1,0.01,0.01\n"
+            )
+        plots = Plots(tmp_path, ("INPs_L",), ("blank",), None, None, 3, {}, "overview")
+
+        files = plots.find_file_paths(("INPs_L",), ("blank",), None, None)
+        assert [file.parent.name for file in files] == ["SGP 02.21.24 base", "SGP 03.01.30 base"]
+        files = plots.find_file_paths(("INPs_L",), ("blank",), "01.01.25", None)
+        assert [file.parent.name for file in files] == ["SGP 03.01.30 base"]
+
+    def test_rendering_processes_use_the_given_settings(self, tmp_path):
+        settings = copy.deepcopy(PLOT_SETTINGS)
+        settings["figure"]["figsize"] = (2, 1)
+        settings["save"] = {"dpi": 50, "format": "png"}
+        series = [
+            {
+                "x": np.array([-10.0, -20.0]),
+                "y": np.array([1.0, 10.0]),
+                "yerr": np.array([[0.1, 1.0], [0.1, 1.0]]),
+                "label": "SGP base",
+                "color": "black",
+                "marker": "o",
+            }
+        ]
+        jobs = [
+            (date, series, tmp_path / f"{date}.png", settings)
+            for date in ("2024-02-21", "2024-02-22")
+        ]
+
+        save_files = _render_date_figures(jobs, max_workers=2)
+
+        assert [file.name for file in save_files] == ["2024-02-21.png", "2024-02-22.png"]
+        assert all(imread(file).shape[:2] == (50, 100) for file in save_files)
+
+    def test_campaign_plots_use_the_given_settings(self, tmp_path):
+        for folder in ("SGP 02.21.24 base", "SGP 02.22.24 base"):
+            (tmp_path / folder).mkdir()
+            (tmp_path / folder / f"INPs_L_frozen_at_temp_reviewed_{folder}.csv").write_text(
+                "degC,dilution,INPS_L,lower_CI,upper_CI\n"
+                "-10.0,1,0.1,0.01,0.01\n-15.0,1,1.0,0.1,0.1\n-20.0,1,10.0,1.0,1.0\n"
+            )
+        settings = copy.deepcopy(PLOT_SETTINGS)
+        settings["figure"]["figsize"] = (4, 5)
+        settings["save"] = {"dpi": 20, "format": "png"}
+        plots = Plots(tmp_path, ("INPs_L",), ("blank",), None, None, 3, {}, "overview")
+
+        plots.plot_campaign(temperatures=(-15,), settings=settings)
+
+        envelope = next((tmp_path / "plots").glob("overview_envelope_*.png"))
+        timeseries = next((tmp_path / "plots").glob("overview_timeseries_*.png"))
+        assert imread(envelope).shape[:2] == (100, 80)
+        assert imread(timeseries).shape[:2] == (60, 120)
+        assert PLOT_SETTINGS["figure"]["figsize"] != (4, 5)
+
+    def test_unchanged_dates_reuse_their_figures(self, tmp_path, monkeypatch):
+        rendered = []
+
+        def render(jobs, max_workers=None):
+            rendered.append(sorted(str(date) for date, *_ in jobs))
+            return _render_date_figures(jobs, max_workers=1)
+
+        monkeypatch.setattr(plots_module, "_render_date_figures", render)
+        settings = copy.deepcopy(PLOT_SETTINGS)
+        settings["save"] = {"dpi": 20, "format": "png"}
+        values = {"SGP 02.21.24 base": 0.1, "SGP 02.22.24 base": 0.2}
+
+        def plot_data(settings):
+            plots = Plots(tmp_path, ("INPs_L",), ("blank",), None, None, 3, {}, "overview")
+            plots.plot_data(settings=settings)
+
+        _write_inps_files(tmp_path, values)
+        plot_data(settings)
+        plot_data(settings)
+        _write_inps_files(tmp_path, {"SGP 02.22.24 base": 0.3})
+        plot_data(settings)
+        settings["save"]["dpi"] = 25
+        plot_data(settings)
+
+        # new data and new settings are rendered, the rest is reused
+        assert [len(dates) for dates in rendered] == [2, 0, 1, 2]
+        assert rendered[2] == ["SGP 2024-02-22 10:00:00"]
+
+    def test_partition_matches_the_boolean_filters(self, tmp_path):
+        files = []
+        for site, altitudes in (("TBS", "0, 100"), ("TBS", "100, 300"), ("SGP", None)):
+            for treatment, value in (("base", 1.0), ("heat", 0.5)):
+                header = f"site = {site}\nstart_time = 2024-02-21 10:00:00\n"
+                header += f"treatment = {treatment}\n"
+                if altitudes:
+                    lower, upper = altitudes.split(", ")
+                    header += f"lower_altitude = {lower}\nupper_altitude = {upper}\n"
+                file = tmp_path / f"INPs_L_{site}_{altitudes}_{treatment}.csv"
+                file.write_text(
+                    header + "degC,dilution,INPS_L,lower_CI,upper_CI\n"
+                    f"-10.0,1,{value},0.01,0.01\n-15.0,1,{value * 10},0.1,0.1\n"
+                )
+                files.append(file)
+        columns = ("degC", "dilution", "INPS_L", "lower_CI", "upper_CI")
+        settings = copy.deepcopy(PLOT_SETTINGS)
+
+        for site_comparison in (False, True):
+            for tbs in (False, True):
+                df = load_inp_files(files, columns)
+                date_version = "site_date"
+                if site_comparison:
+                    date_version = "date_time"
+                    df[date_version] = df[date_version].astype(str).str[0:10]
+                new = Plots(tmp_path, (), (), None, None, 3, {}, "overview")._partition(
+                    df, date_version, site_comparison, tbs, settings
+                )
+                old = _old_partition(
+                    Plots(tmp_path, (), (), None, None, 3, {}, "overview"),
+                    df,
+                    date_version,
+                    site_comparison,
+                    tbs,
+                    settings,
+                )
+
+                assert list(new) == list(old)
+                for date, (series, site) in new.items():
+                    old_series, old_site = old[date]
+                    assert site == old_site
+                    assert len(series) == len(old_series)
+                    for line, old_line in zip(series, old_series):
+                        for key in ("x", "y", "yerr"):
+                            np.testing.assert_array_equal(line[key], old_line[key])
+                        for key in ("label", "color", "marker"):
+                            assert line[key] == old_line[key]
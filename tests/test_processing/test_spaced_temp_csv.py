@@ -49,7 +49,56 @@ class TestSpacedTempCSV:
         processor = SpacedTempCSV(input_path, num_samples=6, includes=("test1", "reviewed"))
 
         # Call the create_temp_csv function
-        generated_output_file = processor.create_temp_csv(dict_samples_to_dilution, save=False)
+        generated_output_file = processor.create_temp_csv(
+            dict_samples_to_dilution, {}, 32, "air", save=False
+        )
 
         # Compare the generated output with the expected output
         pd.testing.assert_frame_equal(generated_output_file, expected_output_data)
+
+    def test_loads_only_needed_columns(self, setup_files):
+        input_path, _ = setup_files
+        processor = SpacedTempCSV(input_path, num_samples=6, includes=("test1", "reviewed"))
+        assert list(processor.data.columns) == ["Avg_Temp"] + [f"Sample_{i}" for i in range(6)]
+        assert processor.data["Avg_Temp"].dtype == "float64"
+        assert (processor.data.dtypes.iloc[1:] == "uint8").all()
+
+    def test_empty_sample_cells(self, setup_files, tmp_path):
+        dict_samples_to_dilution = {f"Sample_{i}": 11 ** (5 - i) for i in range(6)}
+        input_path, expected_output_data = setup_files
+        dat_file = input_path / "test1_reviewed_sgp ment 02.21.24 a base.dat"
+        lines = dat_file.read_text().splitlines(keepends=True)
+        # an empty Sample_3 cell in a warm row, between rows without frozen wells, in the
+        # fifth block of 100 rows
+        cells = lines[452].split("\t")
+        cells[6] = ""
+        lines[452] = "\t".join(cells)
+        (tmp_path / dat_file.name).write_text("".join(lines))
+
+        processor = SpacedTempCSV(tmp_path, num_samples=6, includes=("test1", "reviewed"))
+        assert processor.data["Sample_3"].dtype == "UInt8"
+        assert processor.data["Sample_3"].isna().sum() == 1
+        for chunksize in (None, 100):
+            processor = SpacedTempCSV(
+                tmp_path, num_samples=6, includes=("test1", "reviewed"), chunksize=chunksize
+            )
+            generated_output_file = processor.create_temp_csv(
+                dict_samples_to_dilution, {}, 32, "air", save=False
+            )
+            pd.testing.assert_frame_equal(generated_output_file, expected_output_data)
+
+    @pytest.mark.parametrize("chunksize", [37, 1000, 100_000])
+    def test_create_temp_csv_chunked(self, setup_files, chunksize):
+        dict_samples_to_dilution = {f"Sample_{i}": 11 ** (5 - i) for i in range(6)}
+        input_path, expected_output_data = setup_files
+        processor = SpacedTempCSV(
+            input_path, num_samples=6, includes=("test1", "reviewed"), chunksize=chunksize
+        )
+        assert processor.data is None  # nothing is read yet
+        for _ in range(2):  # the file is read again for every call
+            generated_output_file = processor.create_temp_csv(
+                dict_samples_to_dilution, {}, 32, "air", save=False
+            )
+            pd.testing.assert_frame_equal(generated_output_file, expected_output_data)
+        with pytest.raises(ValueError):
+            processor.save_to_new_file()
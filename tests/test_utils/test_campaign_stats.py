@@ -0,0 +1,42 @@
+"""
+This module contains the tests for the streaming campaign statistics.
+"""
+
+import numpy as np
+import pandas as pd
+
+from olaf.utils.campaign_stats import SpectrumEnvelope, values_at_temperatures
+
+
+class TestCampaignStats:
+    def test_envelope_matches_percentiles(self):
+        rng = np.random.default_rng(1)
+        degC = np.arange(-5, -25.5, -0.5)
+        spectra = [10 ** (rng.normal(0, 0.5) - degC / 10) for _ in range(200)]
+        envelope = SpectrumEnvelope()
+        for spectrum in spectra:
+            envelope.add(degC, spectrum)
+
+        result = envelope.percentiles((25, 50, 75)).set_index("degC")
+        expected = np.percentile(np.log10(spectra), [25, 50, 75], axis=0)
+        for idx, column in enumerate(["p25", "p50", "p75"]):
+            found = np.log10(result.loc[degC, column].to_numpy())
+            # within one bin (plus the interpolation of np.percentile)
+            np.testing.assert_allclose(found, expected[idx], atol=0.05)
+        assert envelope.n_spectra == 200
+        assert np.isnan(result.loc[-30.0, "p50"])
+
+    def test_envelope_counts_spectra_added_at_once(self):
+        degC = np.array([-10.0, -20.0])
+        envelope = SpectrumEnvelope()
+        envelope.add(degC, [1.0, 10.0])
+        envelope.add(np.tile(degC, 3), [1.0, 10.0, 2.0, 20.0, 3.0, 30.0], n_spectra=3)
+
+        assert envelope.n_spectra == 4
+        assert envelope.percentiles().set_index("degC").loc[-20.0, "count"] == 4
+
+    def test_values_at_temperatures(self):
+        df = pd.DataFrame({"degC": [-14.5, -15.0, -20.0], "INPS_L": [1.0, 2.0, 3.0]})
+        values = values_at_temperatures(df, (-15, -20, -25))
+        np.testing.assert_array_equal(values[:2], [2.0, 3.0])
+        assert np.isnan(values[2])
@@ -0,0 +1,86 @@
+"""
+This module contains the tests for the MetadataCatalog class.
+"""
+
+import pytest
+
+from olaf.utils.catalog import MetadataCatalog
+
+
+def write_inps_file(path, site, start_time, treatment):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        f"site = {site}\nstart_time = {start_time}\nend_time = {start_time}\n"
+        f"treatment = {treatment}\nvol_air_filt = 1000\n"
+        "degC,dilution,INPS_L,lower_CI,upper_CI\n-10.0,1,0.1,0.01,0.01\n"
+    )
+
+
+class TestMetadataCatalog:
+    @pytest.fixture
+    def project(self, tmp_path):
+        project = tmp_path / "project"
+        write_inps_file(
+            project / "SGP 02.21.24 base" / "INPs_L_frozen_at_temp_reviewed_a base.csv",
+            "SGP",
+            "2024-02-21 10:00:00",
+            "base",
+        )
+        write_inps_file(
+            project / "SGP 02.21.24 heat" / "INPs_L_frozen_at_temp_reviewed_a heat.csv",
+            "SGP",
+            "2024-02-21 10:00:00",
+            "heat",
+        )
+        write_inps_file(
+            project / "NSA 03.01.24 base" / "INPs_L_frozen_at_temp_reviewed_b base.csv",
+            "NSA",
+            "2024-03-01 09:00:00",
+            "base",
+        )
+        write_inps_file(
+            project / "NSA 03.01.24 base" / "INPs_L_frozen_at_temp_reviewed_b base(1).csv",
+            "NSA",
+            "2024-03-01 09:00:00",
+            "base",
+        )
+        return project
+
+    def test_query(self, project, tmp_path):
+        catalog = MetadataCatalog(tmp_path / "catalog.sqlite")
+        assert catalog.index_project(project) == 4
+        assert catalog.index_project(project) == 0  # nothing changed
+
+        assert [f.name for f in catalog.query(treatment="heat")] == [
+            "INPs_L_frozen_at_temp_reviewed_a heat.csv"
+        ]
+        files = catalog.query(sites={"NSA"}, start="2024-03-01", end="2024-03-02")
+        assert [f.name for f in files] == ["INPs_L_frozen_at_temp_reviewed_b base(1).csv"]
+        assert len(catalog.query(excludes=("heat",))) == 2
+        assert catalog.header(files[0])["vol_air_filt"] == "1000"
+
+    def test_removed_files_leave_the_catalog(self, project, tmp_path):
+        catalog = MetadataCatalog(tmp_path / "catalog.sqlite")
+        catalog.index_project(project)
+        (project / "SGP 02.21.24 heat" / "INPs_L_frozen_at_temp_reviewed_a heat.csv").unlink()
+        catalog.index_project(project)
+
+        assert catalog.query(treatment="heat") == []
+
+    def test_sibling_projects_stay_apart(self, project, tmp_path):
+        sibling = tmp_path / "project2"
+        write_inps_file(
+            sibling / "ENA 04.01.24 base" / "INPs_L_frozen_at_temp_reviewed_c base.csv",
+            "ENA",
+            "2024-04-01 09:00:00",
+            "base",
+        )
+        catalog = MetadataCatalog(tmp_path / "catalog.sqlite")
+        catalog.index_project(project)
+        catalog.index_project(sibling)
+        catalog.index_project(project)  # must not remove the files of project2
+
+        assert len(catalog.query(project_folder=project)) == 3
+        assert [f.parent.name for f in catalog.query(project_folder=sibling)] == [
+            "ENA 04.01.24 base"
+        ]
@@ -0,0 +1,67 @@
+"""
+This module contains the tests for the log of finished units of olaf runs.
+"""
+
+import sqlite3
+
+from olaf.utils.checkpoint import CheckpointLog
+
+
+class TestCheckpointLog:
+    def test_only_done_units_are_done(self, tmp_path):
+        log = CheckpointLog(tmp_path / "checkpoints.sqlite")
+        log.start("a", "temp", "hash1")
+        assert not log.is_done("a", "temp", "hash1")  # e.g. the run crashed
+        log.finish("a", "temp", "hash1", 1.5)
+        log.start("a", "inps", "hash1")
+        log.finish("a", "inps", "hash1", 0.1, "ValueError: bad file")
+        log.start("b", "temp", "hash2")
+        log.close()
+
+        # the log survives a restart
+        log = CheckpointLog(tmp_path / "checkpoints.sqlite")
+        assert log.is_done("a", "temp", "hash1")
+        assert not log.is_done("a", "temp", "hash3")  # other parameters or inputs
+        assert not log.is_done("a", "inps", "hash1")
+        assert log.counts() == {"running": 1, "done": 1, "failed": 1}
+
+        # a retry of the failed unit replaces its entry
+        log.start("a", "inps", "hash1")
+        log.finish("a", "inps", "hash1", 0.1)
+        assert log.is_done("a", "inps", "hash1")
+        assert log.counts() == {"running": 1, "done": 2, "failed": 0}
+        log.close()
+
+    def test_unit_with_deleted_outputs_is_not_done(self, tmp_path):
+        log = CheckpointLog(tmp_path / "checkpoints.sqlite")
+        outputs = [tmp_path / "a" / "frozen_at_temp_1.csv", tmp_path / "a" / "frozen_1.png"]
+        outputs[0].parent.mkdir()
+        for output in outputs:
+            output.write_text("x")
+        log.start("a", "temp", "hash1")
+        log.finish("a", "temp", "hash1", 1.5, outputs=outputs)
+        assert log.is_done("a", "temp", "hash1")
+
+        outputs[0].unlink()
+        assert not log.is_done("a", "temp", "hash1")
+        log.close()
+
+    def test_log_without_outputs_is_migrated(self, tmp_path):
+        connection = sqlite3.connect(tmp_path / "checkpoints.sqlite")
+        with connection:
+            connection.execute(
+                "CREATE TABLE units (experiment TEXT, stage TEXT, param_hash TEXT, status TEXT, "
+                "started REAL, finished REAL, seconds REAL, error TEXT, "
+                "PRIMARY KEY (experiment, stage, param_hash))"
+            )
+            connection.execute(
+                "INSERT INTO units VALUES ('a', 'temp', 'hash1', 'done', 0, 1, 1, NULL)"
+            )
+        connection.close()
+
+        log = CheckpointLog(tmp_path / "checkpoints.sqlite")
+        assert log.is_done("a", "temp", "hash1")  # nothing recorded to check
+        log.start("a", "inps", "hash1")
+        log.finish("a", "inps", "hash1", 0.1, outputs=[tmp_path / "INPs_L_1.csv"])
+        assert not log.is_done("a", "inps", "hash1")
+        log.close()
@@ -0,0 +1,43 @@
+"""
+This module contains the tests for reading the result files with their headers.
+"""
+
+import time
+
+import pytest
+
+from olaf.utils.df_utils import read_many, read_with_flexible_header
+
+
+def _write_result(file, site, n_rows):
+    rows = "".join(f"{-5 - i * 0.5},1,{i + 1.0},0.1,0.2\n" for i in range(n_rows))
+    file.write_text(
+        f"site = {site}\nstart_time = 2024-01-01 09:00:00\n"
+        f"degC,dilution,INPS_L,lower_CI,upper_CI\n{rows}"
+    )
+    return file
+
+
+class TestDfUtils:
+    def test_read_with_flexible_header(self, tmp_path):
+        file = _write_result(tmp_path / "INPs_L_a.csv", "SGP", 3)
+        header_lines, df = read_with_flexible_header(file)
+        assert header_lines == ["site = SGP", "start_time = 2024-01-01 09:00:00"]
+        assert list(df.columns) == ["degC", "dilution", "INPS_L", "lower_CI", "upper_CI"]
+        assert df["INPS_L"].tolist() == [1.0, 2.0, 3.0]
+
+    def test_read_many_keeps_order(self, tmp_path):
+        files = [_write_result(tmp_path / f"INPs_L_{i}.csv", f"site{i}", i + 1) for i in range(6)]
+
+        def slow_first(file):  # the first files finish last
+            time.sleep(0.02 * (6 - int(file.stem[-1])))
+            return read_with_flexible_header(file)
+
+        results = read_many(files, slow_first, max_workers=6)
+        assert [header[0] for header, _ in results] == [f"site = site{i}" for i in range(6)]
+        assert [len(df) for _, df in results] == [1, 2, 3, 4, 5, 6]
+        assert read_many([]) == []
+
+    def test_read_many_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            read_many([tmp_path / "a.csv", tmp_path / "b.csv"])
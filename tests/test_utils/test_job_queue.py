@@ -0,0 +1,102 @@
+"""
+This module contains the tests for the job queue and the watcher that fills it.
+"""
+
+import os
+
+from olaf.utils.job_queue import JobQueue
+from olaf.utils.synthetic_data import generate_project
+from olaf.watcher import Watcher
+
+
+class TestJobQueue:
+    def test_enqueue_is_idempotent(self, tmp_path):
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+        assert queue.enqueue("experiment", "a", "hash1")
+        assert not queue.enqueue("experiment", "a", "hash1")
+        # newer inputs replace the queued job
+        assert queue.enqueue("experiment", "a", "hash2")
+        [(job_id, kind, target)] = queue.queued()
+        assert (kind, target) == ("experiment", "a")
+
+        queue.start(job_id)
+        assert queue.requeue_running() == 1
+        queue.start(job_id)
+        queue.finish(job_id, "temp: ValueError: bad file")
+        assert not queue.enqueue("experiment", "a", "hash2")
+        assert queue.counts()["failed"] == 1
+        assert queue.jobs(("failed",))[0]["error"] == "temp: ValueError: bad file"
+        queue.close()
+
+        # the queue survives a restart
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+        assert queue.counts() == {"queued": 0, "running": 0, "done": 0, "failed": 1, "skipped": 0}
+        queue.close()
+
+    def test_failed_jobs_are_retried(self, tmp_path):
+        queue = JobQueue(tmp_path / "jobs.sqlite", max_attempts=2, retry_delay=0)
+        queue.enqueue("experiment", "a", "hash1")
+        for _ in range(2):
+            [(job_id, _, _)] = queue.queued()
+            queue.start(job_id)
+            queue.finish(job_id, "temp: PermissionError: file is locked")
+            assert queue.counts()["failed"] == 1
+            queue.retry_failed()
+        # out of attempts
+        assert queue.queued() == []
+        assert queue.jobs(("failed",))[0]["attempts"] == 2
+
+        assert queue.requeue_failed() == 1
+        [(job_id, _, _)] = queue.queued()
+        queue.start(job_id)
+        queue.finish(job_id)
+        assert queue.counts()["done"] == 1
+        queue.close()
+
+    def test_retry_backoff_and_newer_inputs(self, tmp_path):
+        queue = JobQueue(tmp_path / "jobs.sqlite", retry_delay=3600)
+        queue.enqueue("experiment", "a", "hash1")
+        [(job_id, _, _)] = queue.queued()
+        queue.start(job_id)
+        queue.finish(job_id, "temp: ValueError: bad file")
+        assert queue.retry_failed() == 0  # not before the delay
+
+        # the failed job of the old inputs is not retried once there are new inputs
+        queue.enqueue("experiment", "a", "hash2")
+        queue.retry_delay = 0
+        assert queue.retry_failed() == 0
+        assert queue.requeue_failed() == 0
+        assert [target for _, _, target in queue.queued()] == ["a"]
+        queue.close()
+
+
+class TestWatcher:
+    def test_processes_new_and_changed_files_once(self, tmp_path):
+        config_file = generate_project(
+            tmp_path, n_days=1, treatments=("base",), seed=1, cooling_rate=1.0
+        )
+        watcher = Watcher(config_file, poll_interval=0, settle=0)
+        try:
+            counts = watcher.run(once=True)
+            # two experiments, then the project stages on their INPs_L files
+            assert counts["done"] == 3 and counts["failed"] == 0
+            assert list((tmp_path / "SGP 01.01.24 base").glob("INPs_L_*.csv"))
+            assert list(tmp_path.glob("final_files/*.csv"))
+
+            assert watcher.poll() == 0  # nothing new
+
+            dat_file = next((tmp_path / "SGP 01.01.24 base").glob("reviewed_*.dat"))
+            os.utime(dat_file, (dat_file.stat().st_atime, dat_file.stat().st_mtime - 5))
+            assert watcher.poll() == 1
+            assert [target for _, _, target in watcher.queue.queued()] == ["SGP 01.01.24 base"]
+        finally:
+            watcher.close()
+
+    def test_skip_existing(self, tmp_path):
+        config_file = generate_project(tmp_path, n_days=1, treatments=("base",), seed=1)
+        watcher = Watcher(config_file, poll_interval=0, settle=0)
+        try:
+            assert watcher.poll(skip=True) == 2
+            assert watcher.run(once=True)["skipped"] == 2
+        finally:
+            watcher.close()
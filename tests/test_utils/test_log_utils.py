@@ -0,0 +1,54 @@
+"""
+This module contains the tests for the logging setup and the per-file blank correction
+summaries.
+"""
+
+import io
+import logging
+
+import pandas as pd
+
+from olaf.CONSTANTS import ERROR_SIGNAL
+from olaf.processing.blank_correction import BlankCorrector
+from olaf.utils.log_utils import configure_logging
+
+
+def _final_check(df_corrected, df_inps):
+    corrector = BlankCorrector.__new__(BlankCorrector)
+    return corrector._final_check(df_corrected, df_inps)
+
+
+class TestLogUtils:
+    def test_quiet_mode(self):
+        stream = io.StringIO()
+        configure_logging(logging.WARNING, stream=stream)
+        try:
+            logging.getLogger("olaf.processing.test").info("summary")
+            logging.getLogger("olaf.processing.test").warning("problem")
+        finally:
+            configure_logging(logging.INFO, stream=io.StringIO())
+        assert "summary" not in stream.getvalue()
+        assert "problem" in stream.getvalue()
+        assert len(logging.getLogger("olaf").handlers) == 1
+
+    def test_final_check_details_only_at_debug(self, caplog):
+        df_inps = pd.DataFrame(
+            {
+                "degC": [-10.0, -10.5, -11.0],
+                "INPS_L": [1.0, 3.0, 5.0],
+                "lower_CI": [0.1, 0.1, 0.1],
+                "upper_CI": [0.1, 0.1, 0.1],
+            }
+        )
+        df_corrected = df_inps.copy()
+        df_corrected["INPS_L"] = [0.5, 2.0, 1.5]  # all below the CI, and non-monotonic
+
+        with caplog.at_level(logging.INFO, logger="olaf"):
+            result = _final_check(df_corrected.copy(), df_inps)
+        assert caplog.records == []
+        assert (result["INPS_L"] == ERROR_SIGNAL).all()
+
+        with caplog.at_level(logging.DEBUG, logger="olaf"):
+            _final_check(df_corrected.copy(), df_inps)
+        assert len(caplog.records) == 3
+        assert all(record.levelno == logging.DEBUG for record in caplog.records)
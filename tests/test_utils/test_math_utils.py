@@ -0,0 +1,71 @@
+"""
+This module contains the tests for the Monte Carlo functions in math_utils.
+"""
+
+import numpy as np
+import pandas as pd
+
+from olaf.processing.blank_correction import BlankCorrector
+from olaf.utils.math_utils import percentile_ci, simulate_inps_ml
+
+
+class TestMonteCarlo:
+    def test_simulate_inps_ml_shape_and_center(self):
+        rng = np.random.default_rng(0)
+        inps_ml = np.array([0.0, 5.0, 50.0, np.nan])
+        draws = simulate_inps_ml(inps_ml, [1, 1, 11, 1], 32, 5000, rng=rng)
+
+        assert draws.shape == (5000, 4)
+        assert np.all(draws[:, 0] == 0)
+        assert np.all(np.isnan(draws[:, 3]))
+        # The median of the realizations stays close to the value they are drawn from
+        np.testing.assert_allclose(np.median(draws[:, 1:3], axis=0), [5.0, 50.0], rtol=0.2)
+
+    def test_percentile_ci_is_non_negative(self):
+        rng = np.random.default_rng(1)
+        draws = rng.normal(10, 1, size=(10000, 3))
+        lower, upper = percentile_ci(draws, [10, 10, 10])
+
+        np.testing.assert_allclose(lower, 1.96, rtol=0.1)
+        np.testing.assert_allclose(upper, 1.96, rtol=0.1)
+        lower, upper = percentile_ci(draws, [100, 100, 100])
+        assert np.all(lower >= 0) and np.all(upper == 0)
+
+    def test_monte_carlo_ci_blank_correction(self):
+        index = pd.Index([-10.0, -15.0, -20.0], name="degC")
+        df_sample = pd.DataFrame({"INPS_L": [0.01, 0.1, 1.0], "dilution": [1, 1, 11]}, index)
+        df_blank = pd.DataFrame(
+            {"INPS_L": [0.001, 0.01, 0.02], "dilution": [(1,), (1,), (1, 11)], "blank_count": 3},
+            index,
+        )
+        params = (1000.0, 1.0, 10.0)
+        lower, upper = BlankCorrector._monte_carlo_ci(
+            df_sample, df_blank, params, params, 32, 2000, np.random.default_rng(2)
+        )
+
+        assert lower.shape == upper.shape == (3,)
+        assert np.all(np.isfinite(lower)) and np.all(upper > 0)
+
+    def test_monte_carlo_ci_uses_the_wells_of_sample_and_blank(self):
+        index = pd.Index([-10.0, -15.0], name="degC")
+        df_sample = pd.DataFrame({"INPS_L": [0.1, 1.0], "dilution": [1, 1]}, index)
+        df_blank = pd.DataFrame({"INPS_L": [0.05, 0.5], "dilution": [(1,), (1,)]}, index)
+        params = (100.0, 1.0, 10.0)
+
+        def ci(wells, blank_wells):
+            return BlankCorrector._monte_carlo_ci(
+                df_sample,
+                df_blank,
+                params,
+                params,
+                wells,
+                2000,
+                np.random.default_rng(3),
+                blank_wells_per_sample=blank_wells,
+            )
+
+        few_lower, few_upper = ci(8, 8)
+        many_lower, many_upper = ci(96, 96)
+        assert np.all(few_upper > many_upper) and np.all(few_lower > many_lower)
+        _, blank_upper = ci(96, 8)
+        assert np.all(blank_upper > many_upper)
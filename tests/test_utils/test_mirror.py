@@ -0,0 +1,48 @@
+"""
+This module contains the tests for the local mirror of a project folder.
+"""
+
+from olaf.cli import run
+from olaf.utils.mirror import ProjectMirror, is_mirrored
+from olaf.utils.synthetic_data import generate_project
+
+
+class TestMirror:
+    def test_is_mirrored(self):
+        assert is_mirrored("reviewed_SGP 01.01.24 base.dat")
+        assert not is_mirrored("SGP 01.01.24 base.dat")
+        assert is_mirrored("INPs_L_frozen_at_temp_reviewed_SGP 01.01.24 base(1).csv")
+        assert is_mirrored("blank_corrected_10%_error_threshold_INPs_L_x.csv")
+        assert not is_mirrored("dilution_dict_reviewed_SGP 01.01.24 base.csv")
+        assert not is_mirrored(".olaf_catalog.sqlite")
+
+    def test_run_on_mirror_of_slow_folder(self, tmp_path):
+        remote = tmp_path / "remote"
+        config_file = generate_project(
+            remote, n_days=1, treatments=("base",), images=True, seed=1, cooling_rate=1.0
+        )
+        cache = tmp_path / "cache"
+        # the remote folder stands in for a shared drive with 2 ms per call
+        mirror = ProjectMirror(remote, cache, latency=0.002)
+        assert mirror.pull() == 3  # two reviewed .dat files and the experiments.toml
+        assert not list(cache.rglob("*.png"))  # the images aren't needed
+
+        summary = run("all", config_file, project_folder=cache)
+        assert summary["n_failed"] == 0
+        assert not list(remote.glob("*/INPs_L_*.csv"))  # nothing written remotely yet
+
+        pushed = mirror.push()
+        assert remote / "final_files" in {file.parent for file in pushed}
+        assert len(list(remote.glob("*/INPs_L_*.csv"))) == 2
+
+        # a new mirror of the same cache finds everything up to date
+        mirror = ProjectMirror(remote, cache, latency=0.002)
+        assert mirror.pull() == 0
+        assert mirror.push() == []
+        calls = mirror.remote_calls
+
+        removed = next(remote.glob("SGP 01.01.24 blank/INPs_L_*.csv"))
+        removed.unlink()
+        assert mirror.pull() == 0
+        assert not (cache / removed.relative_to(remote)).exists()
+        assert mirror.remote_calls - calls < calls  # only listing and stats, no copies
@@ -0,0 +1,143 @@
+"""
+This module contains the tests for writing new versions of the output files.
+"""
+
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from olaf.utils.path_utils import (
+    STALE_LOCK_SECONDS,
+    atomic_write_bytes,
+    file_lock,
+    find_latest_file,
+    save_df_file,
+    write_new_version,
+)
+
+
+def _write_version(save_file, text):
+    return write_new_version(save_file, lambda f, path: f.write(f"{path.name}\n{text}\n"))
+
+
+class TestPathUtils:
+    def test_write_new_version_numbers(self, tmp_path):
+        (tmp_path / "INPs_L_run(2).csv").write_text("old")
+        (tmp_path / "INPs_L_other.csv").write_text("old")
+        first = _write_version(tmp_path / "INPs_L_run.csv", "a")
+        second = _write_version(tmp_path / "INPs_L_run.csv", "b")
+        assert [first.name, second.name] == ["INPs_L_run(3).csv", "INPs_L_run(4).csv"]
+        assert _write_version(tmp_path / "INPs_L_new.csv", "c").name == "INPs_L_new.csv"
+        assert second.read_text() == "INPs_L_run(4).csv\nb\n"
+        assert find_latest_file(list(tmp_path.glob("INPs_L_run*.csv"))) == second
+        assert not list(tmp_path.glob(".*"))
+
+    def test_concurrent_writers_get_own_versions(self, tmp_path):
+        save_file = tmp_path / "combined_blank.csv"
+        with ThreadPoolExecutor(8) as pool:
+            threads = list(pool.map(_write_version, [save_file] * 40, range(40)))
+        with ProcessPoolExecutor(4) as pool:
+            processes = list(pool.map(_write_version, [save_file] * 8, range(40, 48)))
+        files = threads + processes
+        assert len(set(files)) == 48
+        assert sorted(int(f.read_text().split()[1]) for f in files) == list(range(48))
+        assert all(f.read_text().split()[0] == f.name for f in files)
+
+    def test_failed_write_frees_the_name(self, tmp_path):
+        def fail(f, path):
+            f.write("partial")
+            raise ValueError("no data")
+
+        with pytest.raises(ValueError):
+            write_new_version(tmp_path / "a.csv", fail)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_stale_reservation_is_taken_over(self, tmp_path):
+        # a writer that crashed while writing a(1).csv left its reservation behind
+        (tmp_path / "a.csv").write_text("old")
+        reserved = tmp_path / ".a(1).csv.reserved"
+        reserved.write_text("partial")
+        assert _write_version(tmp_path / "a.csv", "b").name == "a(2).csv"
+
+        old = time.time() - STALE_LOCK_SECONDS - 10
+        os.utime(reserved, (old, old))
+        (tmp_path / "a(2).csv").unlink()
+        assert _write_version(tmp_path / "a.csv", "c").name == "a(1).csv"
+        assert not list(tmp_path.glob(".*"))
+
+    def test_versions_written_by_others_are_seen(self, tmp_path):
+        assert _write_version(tmp_path / "a.csv", "a").name == "a.csv"
+        (tmp_path / "a(5).csv").write_text("other process")
+        assert _write_version(tmp_path / "a.csv", "b").name == "a(6).csv"
+        # deleted versions are not written again, only the highest counts
+        for version in (5, 6):
+            (tmp_path / f"a({version}).csv").unlink()
+        (tmp_path / "a(2).csv").write_text("other process")
+        assert _write_version(tmp_path / "a.csv", "c").name == "a(3).csv"
+
+    def test_version_is_hidden_until_written(self, tmp_path):
+        def write(f, path):
+            # readers looking for the latest version don't see this one yet
+            assert not path.exists()
+            assert list(tmp_path.glob("*.csv")) == [tmp_path / "a.csv"]
+            f.write("new")
+
+        (tmp_path / "a.csv").write_text("old")
+        save_file = write_new_version(tmp_path / "a.csv", write)
+        assert save_file.read_text() == "new"
+        umask = os.umask(0)
+        os.umask(umask)
+        assert stat.S_IMODE(save_file.stat().st_mode) == 0o666 & ~umask
+
+    def test_save_df_file_header(self, tmp_path):
+        df = pd.DataFrame({"degC": [-10.0], "INPS_L": [1.5]})
+        save_file = save_df_file(df, tmp_path / "blank_corrected.csv", {"site": "SGP"})
+        assert save_file.read_text() == (
+            "filename = blank_corrected.csv\nsite = SGP\ndegC,INPS_L\n-10.0,1.5\n"
+        )
+
+    def test_atomic_write_bytes_mode(self, tmp_path):
+        umask = os.umask(0)
+        os.umask(umask)
+        save_file = atomic_write_bytes(tmp_path / "manifest.json", b"{}")
+        assert save_file.read_bytes() == b"{}"
+        # like a file written with open(), not the 0600 of the temporary file
+        assert stat.S_IMODE(save_file.stat().st_mode) == 0o666 & ~umask
+        assert not list(tmp_path.glob(".*.tmp"))
+
+    def test_lock_is_only_removed_by_its_holder(self, tmp_path):
+        lock_file = tmp_path / "store.lock"
+        with file_lock(lock_file):
+            # taken over by another writer while this one was (too) slow
+            lock_file.write_bytes(b"other holder")
+        assert lock_file.read_bytes() == b"other holder"
+        with file_lock(tmp_path / "other.lock"):
+            pass
+        assert list(tmp_path.iterdir()) == [lock_file]
+
+    def test_one_waiter_takes_over_a_stale_lock(self, tmp_path):
+        lock_file = tmp_path / "store.lock"
+        lock_file.write_bytes(b"crashed writer")
+        old = time.time() - STALE_LOCK_SECONDS - 10
+        os.utime(lock_file, (old, old))
+        holders, max_holders = [], []
+        holders_lock = threading.Lock()
+
+        def hold(_):
+            with file_lock(lock_file, timeout=10, poll=0.001):
+                with holders_lock:
+                    holders.append(1)
+                    max_holders.append(len(holders))
+                time.sleep(0.005)
+                with holders_lock:
+                    holders.pop()
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(hold, range(24)))
+        assert len(max_holders) == 24 and max(max_holders) == 1
+        assert list(tmp_path.iterdir()) == []
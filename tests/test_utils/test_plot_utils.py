@@ -0,0 +1,36 @@
+"""
+This module contains the tests for the content hashes and the cache of saved figures.
+"""
+
+import copy
+
+import numpy as np
+
+from olaf.utils.plot_utils import PLOT_SETTINGS, PlotCache, content_hash
+
+
+class TestPlotCache:
+    def test_content_hash(self):
+        values = np.array([1.0, 10.0])
+        settings = copy.deepcopy(PLOT_SETTINGS)
+        key = content_hash("2024-02-21", values, settings)
+
+        assert content_hash("2024-02-21", values.copy(), copy.deepcopy(settings)) == key
+        assert content_hash("2024-02-21", np.array([1.0, 11.0]), settings) != key
+        assert content_hash("2024-02-21", values.astype("float32"), settings) != key
+        settings["save"]["dpi"] = 50
+        assert content_hash("2024-02-21", values, settings) != key
+
+    def test_lookup_after_reload(self, tmp_path):
+        cache = PlotCache(tmp_path)
+        (tmp_path / "2024-02-21_created_on-1.png").write_bytes(b"png")
+        cache.store("2024-02-21", "key", tmp_path / "2024-02-21_created_on-1.png")
+        cache.store("2024-02-22", "key", tmp_path / "2024-02-22_created_on-1.png")
+        cache.save()
+
+        cache = PlotCache(tmp_path)
+        assert cache.lookup("2024-02-21", "key") == tmp_path / "2024-02-21_created_on-1.png"
+        assert cache.lookup("2024-02-21", "other key") is None
+        # the figure was deleted (or never written)
+        assert cache.lookup("2024-02-22", "key") is None
+        assert cache.lookup("2024-02-23", "key") is None
@@ -0,0 +1,67 @@
+"""
+This module contains the tests for the ResultStore class.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from olaf.utils.result_store import ResultStore
+
+
+def make_results(site, start_utc, treatment, treatment_flag, n_inp):
+    return pd.DataFrame(
+        {
+            "site": site,
+            "start_utc": start_utc,
+            "end_utc": start_utc + 3600,
+            "treatment": treatment,
+            "treatment_flag": treatment_flag,
+            "degC": [-10.0, -15.0, -20.0],
+            "n_INP": n_inp,
+            "lower_CL": [0.0, 0.0, 0.0],
+            "upper_CL": [1.0, 1.0, 1.0],
+            "qc_flag": [0, 0, 1],
+        }
+    )
+
+
+class TestResultStore:
+    def test_append_replaces_same_experiment(self, tmp_path):
+        store = ResultStore(tmp_path / "results.npz")
+        store.append(make_results("SGP", 1000, "base", 0, [0.1, 1.0, 10.0]))
+        store.append(make_results("NSA", 2000, "heat", 1, [0.2, 2.0, 20.0]))
+        store.append(make_results("SGP", 1000, "base", 0, [0.3, 3.0, 30.0]))
+
+        loaded = store.load()
+        assert len(loaded) == 6
+        assert isinstance(loaded["site"].dtype, pd.CategoricalDtype)
+        assert loaded.loc[loaded["site"] == "SGP", "n_INP"].tolist() == [0.3, 3.0, 30.0]
+
+    def test_load_with_filters(self, tmp_path):
+        store = ResultStore(tmp_path / "results.npz")
+        store.append(make_results("SGP", 1000, "base", 0, [0.1, 1.0, 10.0]))
+        store.append(make_results("NSA", 2000, "heat", 1, [0.2, 2.0, 20.0]))
+
+        loaded = store.load(
+            filters=[("site", "in", {"NSA", "ENA"}), ("degC", "<=", -15.0)],
+            columns=["treatment", "n_INP"],
+        )
+        assert list(loaded.columns) == ["treatment", "n_INP"]
+        assert loaded["n_INP"].tolist() == [2.0, 20.0]
+        assert store.load(filters=[("site", "==", "ENA")]).empty
+
+    def test_concurrent_appends_keep_all_rows(self, tmp_path):
+        store_file = tmp_path / "results.npz"
+
+        def append(i):
+            ResultStore(store_file).append(
+                make_results(f"S{i}", 1000 * i, "base", 0, [0.1, 1.0, 10.0])
+            )
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(append, range(16)))
+
+        loaded = ResultStore(store_file).load()
+        assert len(loaded) == 16 * 3
+        assert not store_file.with_name("results.npz.lock").exists()
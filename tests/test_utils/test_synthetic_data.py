@@ -0,0 +1,58 @@
+"""
+This module contains the tests for the synthetic experiment generator.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from olaf.cli import main
+from olaf.pipeline import load_config, run_inps, run_temp
+from olaf.utils.synthetic_data import generate_project, simulate_experiment
+
+
+class TestSyntheticData:
+    def test_frozen_wells_only_increase(self):
+        df = simulate_experiment(datetime(2024, 1, 1, 9), rng=np.random.default_rng(0))
+        samples = df[[f"Sample_{i}" for i in range(6)]].to_numpy()
+        assert (np.diff(samples, axis=0) >= 0).all()
+        assert samples.max() <= 32
+        assert df["Picture"].str.startswith("Image_").sum() > 0
+
+    def test_least_diluted_sample_freezes_first(self):
+        # the wells of each sample freeze at random, so row by row a diluted sample can be
+        # ahead; over the run the least diluted sample has more frozen wells
+        for seed in range(5):
+            df = simulate_experiment(datetime(2024, 1, 1, 9), rng=np.random.default_rng(seed))
+            assert df["Sample_0"].mean() > df["Sample_4"].mean()
+            assert df["Sample_0"].median() >= df["Sample_4"].median()
+
+    def test_project_runs_through_pipeline(self, tmp_path):
+        config_file = generate_project(
+            tmp_path, n_days=1, treatments=("base",), images=True, seed=1, cooling_rate=1.0
+        )
+        config = load_config(config_file)
+        assert [e["name"] for e in config["experiments"]] == [
+            "SGP 01.01.24 base",
+            "SGP 01.01.24 blank",
+        ]
+        assert any((tmp_path / "SGP 01.01.24 base" / "SGP 01.01.24 base Images").iterdir())
+
+        experiment = config["experiments"][0]
+        run_temp(experiment)
+        run_inps(experiment)
+        assert list(experiment["folder"].glob("INPs_L_frozen_at_temp_reviewed_*.csv"))
+
+    def test_one_final_file_per_site_and_day(self, tmp_path):
+        # the final files are grouped by start time, so every site needs its own
+        config_file = generate_project(
+            tmp_path, n_days=2, sites=("SGP", "NSA"), treatments=("base", "heat"), seed=2
+        )
+        assert main(["all", str(config_file)]) == 0
+        final_files = sorted(f.name for f in (tmp_path / "final_files").glob("*.csv"))
+        assert final_files == [
+            "NSA_2024-01-01_090100.csv",
+            "NSA_2024-01-02_090100.csv",
+            "SGP_2024-01-01_090000.csv",
+            "SGP_2024-01-02_090000.csv",
+        ]
@@ -0,0 +1,73 @@
+"""
+This module contains the tests for parsing the dates and times of the .dat files.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from olaf.utils.data_handler import DataHandler
+from olaf.utils.synthetic_data import simulate_experiment, write_dat
+from olaf.utils.time_utils import parse_dat_dates, parse_dat_times, parse_dat_timestamps
+
+
+class TestTimeUtils:
+    def test_parse_dat_dates(self):
+        assert parse_dat_dates(["2024-06-10", "2024-06-11"]).tolist() == [
+            pd.Timestamp("2024-06-10"),
+            pd.Timestamp("2024-06-11"),
+        ]
+        assert parse_dat_dates(["06/10/24", "12/31/24"]).tolist() == [
+            pd.Timestamp("2024-06-10"),
+            pd.Timestamp("2024-12-31"),
+        ]
+        assert parse_dat_dates(["2024-06-10"]).dtype == "datetime64[ns]"
+        with pytest.raises(ValueError, match="12:51:32:.79"):
+            parse_dat_dates(["12:51:32:.79"])
+
+    def test_parse_dat_times(self):
+        times = parse_dat_times(["12:51:32:.79", "00:00:00:.00", "9:05:01:.5", None])
+        assert times.dtype == "timedelta64[ns]"
+        assert times[0] == pd.Timedelta(hours=12, minutes=51, seconds=32.79)
+        assert times[1] == pd.Timedelta(0)
+        assert times[2] == pd.Timedelta(hours=9, minutes=5, seconds=1.5)
+        assert np.isnat(times[3])
+        with pytest.raises(ValueError, match="bad"):
+            parse_dat_times(["12:51:32:.79", "bad"])
+
+    def test_timestamps_match_pandas(self):
+        df = simulate_experiment(
+            pd.Timestamp("2024-06-10 09:00:00"), cooling_rate=3, rng=np.random.default_rng(0)
+        )
+        expected = pd.to_datetime(df["Date"] + " " + df["Time"].str.replace(":.", "."))
+        timestamps = parse_dat_timestamps(df["Date"], df["Time"])
+        assert timestamps.dtype == "datetime64[ns]"
+        assert np.array_equal(timestamps.to_numpy(), expected.to_numpy())
+
+    def test_data_handler_timestamps(self, tmp_path):
+        df = simulate_experiment(
+            pd.Timestamp("2024-06-10 09:00:00"), cooling_rate=3, rng=np.random.default_rng(0)
+        )
+        write_dat(df, tmp_path / "run.dat", 3, reviewed=False)
+        handler = DataHandler(tmp_path, 3)
+        assert handler.data["Date"].dtype == "datetime64[ns]"
+        assert (handler.data["Date"] == pd.Timestamp("2024-06-10")).all()
+        assert handler.data["Timestamp"].dtype == "datetime64[ns]"
+        assert handler.data["Timestamp"].iloc[0].floor("s") == pd.Timestamp("2024-06-10 09:00:00")
+
+    def test_data_handler_reviewed_file(self, tmp_path):
+        # the reviewer loads a reviewed file again with the default date_col (Time)
+        folder = Path(__file__).parents[1] / "test_data" / "SGP 2.21.24 base"
+        handler = DataHandler(folder, 6, includes=("base",))
+        assert handler.data["Date"].dtype == "datetime64[ns]"
+        assert handler.data["Time"].iloc[0] == "12:51:32:.79"
+        assert handler.data["Timestamp"].iloc[0] == pd.Timestamp("2024-06-10 12:51:32.79")
+        assert handler.data["Timestamp"].notna().all()
+
+        # saving it again gives the same file
+        save_file = handler.save_to_new_file(
+            save_path=tmp_path / handler.data_file.name, prefix="reviewed", sep="\t"
+        )
+        assert save_file.read_text() == handler.data_file.read_text()
@@ -0,0 +1,62 @@
+"""
+This module contains the tests for the tracing spans and counters.
+"""
+
+import json
+
+import pytest
+
+from olaf.utils import tracing
+
+
+class TestTracing:
+    def test_disabled_writes_nothing(self, tmp_path):
+        assert not tracing.is_enabled()
+        with tracing.span("step") as record:
+            tracing.count("rows", 3)
+        assert record is None
+
+    def test_spans_and_counters(self, tmp_path):
+        trace_file = tmp_path / "trace.jsonl"
+        tracing.enable(trace_file)
+        try:
+            with tracing.span("stage", experiment="a"):
+                tracing.count("files")
+                with tracing.span("parse"):
+                    tracing.count("rows", 10)
+                    tracing.count("rows", 5)
+            with pytest.raises(ValueError), tracing.span("failing"):
+                raise ValueError("bad file")
+        finally:
+            tracing.disable()
+
+        records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+        spans = {record["name"]: record for record in records if record["type"] == "span"}
+        assert spans["parse"]["parent"] == spans["stage"]["id"]
+        assert spans["parse"]["counters"] == {"rows": 15}
+        assert spans["stage"]["counters"] == {"files": 1}
+        assert spans["stage"]["attrs"] == {"experiment": "a"}
+        assert spans["failing"]["error"] == "ValueError: bad file"
+        assert records[-1] == {
+            "type": "counters",
+            "pid": records[-1]["pid"],
+            "counters": {"files": 1, "rows": 15},
+        }
+
+        summary = tracing.summarize(trace_file)
+        assert summary["spans"]["parse"]["calls"] == 1
+        assert summary["counters"] == {"files": 1, "rows": 15}
+
+    def test_traced(self, tmp_path):
+        @tracing.traced("double")
+        def double(x):
+            return 2 * x
+
+        trace_file = tmp_path / "trace.jsonl"
+        tracing.enable(trace_file)
+        try:
+            assert double(2) == 4
+        finally:
+            tracing.disable()
+        assert double(3) == 6
+        assert list(tracing.summarize(trace_file)["spans"]) == ["double"]